@@ -0,0 +1,166 @@
+from decimal import Decimal
+
+import numpy as np
+
+from app.amortization_calculator import (
+    calc_amortization_schedule, calc_monthly_payment, calc_monthly_summary, round_to_nearest_cent
+)
+
+
+# Products closer than this (relative) to a half cent are resolved with Decimal arithmetic
+_HALF_CENT_TOLERANCE = 1e-12
+# Loans of this many cents or more are calculated by the scalar calculator, beyond float64's
+# exact integers and on the way to overflowing int64
+_MAX_BATCH_CENTS = 2**53
+
+
+def _to_cents(amount) -> int:
+    cents = Decimal(amount) * 100
+    if cents != cents.to_integral_value():
+        raise ValueError(f"amount {amount} is not a whole number of cents")
+    return int(cents)
+
+
+_SCHEDULE_KEYS = ('monthly_payment', 'monthly_accrued_interest', 'remaining_balance')
+
+
+class _BatchState:
+    """
+    Balances of many loans stepped forward one month at a time, in cents.
+    """
+
+    def __init__(self, amounts, annual_interest_rates, numbers_of_months):
+        terms = np.asarray(numbers_of_months, dtype=np.int64)
+        if terms.ndim != 1 or len(amounts) != len(terms) or len(annual_interest_rates) != len(terms):
+            raise ValueError("amounts, annual_interest_rates and numbers_of_months must be 1-D and of equal length")
+        if len(terms) and terms.min() <= 0:
+            raise ValueError("numbers_of_months must be positive")
+        N = len(terms)
+        self.terms = terms
+        self.principal = np.fromiter((_to_cents(P) for P in amounts), dtype=np.int64, count=N)
+        self.payment = np.fromiter((_to_cents(round_to_nearest_cent(calc_monthly_payment(P, r, n)))
+                                    for P, r, n in zip(amounts, annual_interest_rates, terms.tolist())),
+                                   dtype=np.int64, count=N)
+        self.decimal_rates = [Decimal(r) / 12 for r in annual_interest_rates]
+        self.rates = np.array([float(i) for i in self.decimal_rates], dtype=np.float64)
+        self.balance = self.principal.copy()
+        self.max_term = int(terms.max()) if N else 0
+
+    def step(self, active):
+        """
+        Accrue one month of interest and apply the monthly payment for the active loans.
+        Returns the interest accrued, inactive loans accrue nothing and keep a zero balance.
+        """
+        accrued = self.balance * self.rates
+        whole = np.floor(accrued)
+        fraction = accrued - whole
+        interest = whole.astype(np.int64) + (fraction >= 0.5)
+        # float64 cannot tell which side of a half cent these land on, defer to Decimal
+        for k in np.flatnonzero(active & (np.abs(fraction - 0.5) <= _HALF_CENT_TOLERANCE * np.abs(accrued))):
+            exact = round_to_nearest_cent(Decimal(int(self.balance[k])) / 100 * self.decimal_rates[k])
+            interest[k] = _to_cents(exact)
+        interest = np.where(active, interest, 0)
+        self.balance = np.where(active, self.balance - (self.payment - interest), 0)
+        return interest
+
+
+def _large_loans(amounts) -> list[int]:
+    return [k for k, P in enumerate(amounts) if _to_cents(P) >= _MAX_BATCH_CENTS]
+
+
+def _split_large_loans(batch_fn, large, amounts, annual_interest_rates, numbers_of_months, *args):
+    """
+    Run batch_fn over all loans but the large ones, returning the positions of those and its result.
+    """
+    if len(amounts) != len(annual_interest_rates) or len(amounts) != len(numbers_of_months):
+        raise ValueError("amounts, annual_interest_rates and numbers_of_months must be 1-D and of equal length")
+    large = set(large)
+    small = [k for k in range(len(amounts)) if k not in large]
+    batch = batch_fn([amounts[k] for k in small], [annual_interest_rates[k] for k in small],
+                     [numbers_of_months[k] for k in small], *args)
+    return small, batch
+
+
+def calc_amortization_schedules_batch(amounts, annual_interest_rates, numbers_of_months):
+    """
+    Calculate amortization schedules for many loans at once.
+
+    Returns a dict of 2-D int64 arrays of shape (number of loans, longest loan term) holding
+    'monthly_payment', 'monthly_accrued_interest' and 'remaining_balance' in cents, plus a
+    boolean 'mask' that is True for months within each loan's term (other entries are 0).
+    Rounding and the last payment adjustment match calc_amortization_schedule exactly.
+    Loans too large for int64 cents are calculated one by one, the arrays then hold Python ints.
+    """
+    large = _large_loans(amounts)
+    if large:
+        small, batch = _split_large_loans(calc_amortization_schedules_batch, large,
+                                          amounts, annual_interest_rates, numbers_of_months)
+        T = max(int(n) for n in numbers_of_months)
+        result = {key: np.zeros((len(amounts), T), dtype=object) for key in _SCHEDULE_KEYS}
+        result['mask'] = np.arange(T)[np.newaxis, :] < np.asarray(numbers_of_months, dtype=np.int64)[:, np.newaxis]
+        for key in _SCHEDULE_KEYS:
+            result[key][small, :batch[key].shape[1]] = batch[key]
+        for k in large:
+            schedule = calc_amortization_schedule(amounts[k], annual_interest_rates[k], numbers_of_months[k])
+            for key in _SCHEDULE_KEYS:
+                result[key][k, :len(schedule)] = [_to_cents(row[key]) for row in schedule]
+        return result
+    state = _BatchState(amounts, annual_interest_rates, numbers_of_months)
+    N, T = len(state.terms), state.max_term
+
+    months = np.arange(T, dtype=np.int64)
+    mask = months[np.newaxis, :] < state.terms[:, np.newaxis]
+    monthly_payment = np.where(mask, state.payment[:, np.newaxis], 0)
+    monthly_accrued_interest = np.zeros((N, T), dtype=np.int64)
+    remaining_balance = np.zeros((N, T), dtype=np.int64)
+
+    for t in range(T):
+        monthly_accrued_interest[:, t] = state.step(mask[:, t])
+        remaining_balance[:, t] = state.balance
+
+    # the last monthly payment is adjusted to ensure zero closing balance
+    last = np.arange(N), state.terms - 1
+    monthly_payment[last] += remaining_balance[last]
+    remaining_balance[last] = 0
+    return {
+        'monthly_payment': monthly_payment,
+        'monthly_accrued_interest': monthly_accrued_interest,
+        'remaining_balance': remaining_balance,
+        'mask': mask,
+    }
+
+
+def calc_monthly_summaries_batch(amounts, annual_interest_rates, numbers_of_months, month):
+    """
+    Calculate loan summaries for many loans at a given month in one pass.
+
+    Loans whose term ends before the given month are summarized at their last month.
+    Returns a dict of 1-D int64 arrays 'remaining_balance', 'aggregate_principal_paid'
+    and 'aggregate_interest_paid' in cents, matching calc_monthly_summary.
+    Loans too large for int64 cents are calculated one by one, the arrays then hold Python ints.
+    """
+    if month <= 0:
+        raise ValueError("month must be positive")
+    large = _large_loans(amounts)
+    if large:
+        small, batch = _split_large_loans(calc_monthly_summaries_batch, large,
+                                          amounts, annual_interest_rates, numbers_of_months, month)
+        result = {key: np.zeros(len(amounts), dtype=object) for key in batch}
+        for key in batch:
+            result[key][small] = batch[key]
+        for k in large:
+            n = int(numbers_of_months[k])
+            summary = calc_monthly_summary(amounts[k], annual_interest_rates[k], n, min(month, n))
+            for key in result:
+                result[key][k] = _to_cents(summary[key])
+        return result
+    state = _BatchState(amounts, annual_interest_rates, numbers_of_months)
+    aggregate_interest_paid = np.zeros(len(state.terms), dtype=np.int64)
+    for t in range(min(month, state.max_term)):
+        aggregate_interest_paid += state.step(t < state.terms)
+    remaining_balance = np.where(state.terms <= month, 0, state.balance)
+    return {
+        'remaining_balance': remaining_balance,
+        'aggregate_principal_paid': state.principal - remaining_balance,
+        'aggregate_interest_paid': aggregate_interest_paid,
+    }
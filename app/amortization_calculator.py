@@ -1,4 +1,7 @@
-from decimal import Decimal, ROUND_HALF_UP
+from array import array
+from collections.abc import Mapping, Sequence
+from decimal import Decimal, ROUND_HALF_UP, getcontext
+from itertools import islice
 
 
 ONE_CENT = Decimal('0.01')
@@ -18,40 +21,656 @@ def calc_monthly_payment(principal_amount, annual_interest_rate, number_of_month
     return P * (i + i / ((1 + i)**n - 1))
 
 
-def calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months):
+def iter_amortization_schedule(principal_amount, annual_interest_rate, number_of_months, rate_changes=None,
+                               start=1, balance=None):
     """
-    Calculate amortization schedule.
-    Monthly payments and interest accruals are rounded to the nearest cent.
-    The last monthly payment is adjusted to ensure zero closing balance.
+    Lazily generate amortization schedule rows, see calc_amortization_schedule.
+    Rows from a rate change in `start` on are generated given the balance the month before.
     """
+    if start != 1 and not (rate_changes and start in rate_changes):
+        raise ValueError("schedules are generated from the first month or from a rate change")
     A = round_to_nearest_cent(calc_monthly_payment(principal_amount, annual_interest_rate, number_of_months))
     i = Decimal(annual_interest_rate) / 12
-    balance = Decimal(principal_amount)
-    result = []
-    for n in range(1, number_of_months+1):
+    balance = Decimal(principal_amount) if balance is None else Decimal(balance)
+    for n in range(start, number_of_months+1):
+        if rate_changes and n in rate_changes:
+            A = round_to_nearest_cent(calc_monthly_payment(balance, rate_changes[n], number_of_months - n + 1))
+            i = Decimal(rate_changes[n]) / 12
         monthly_accrued_interest = round_to_nearest_cent(balance * i)
         principal_payment = A - monthly_accrued_interest
         balance -= principal_payment
-        result.append({
+        row = {
             'month': n,
             'monthly_payment': A,
             'monthly_accrued_interest': monthly_accrued_interest,
             'remaining_balance': balance
-        })
-    last_row = result[-1]
-    if last_row['remaining_balance'] != 0:
-        last_row['monthly_payment'] += last_row['remaining_balance']
-        last_row['remaining_balance'] = Decimal(0)
-    return result
+        }
+        if n == number_of_months and balance != 0:
+            row['monthly_payment'] += balance
+            row['remaining_balance'] = Decimal(0)
+        yield row
+
+
+ROW_KEYS = ('month', 'monthly_payment', 'monthly_accrued_interest', 'remaining_balance')
+
+
+def format_cents(cents: int) -> str:
+    """
+    str() of the Decimal with the given number of cents, without creating it.
+    """
+    sign = '-' if cents < 0 else ''
+    whole, fraction = divmod(abs(cents), 100)
+    return f"{sign}{whole}.{fraction:02d}"
+
+
+def _column(values):
+    # read-only views slice in O(1); values beyond 64 bits only occur with sub-cent amounts
+    try:
+        return memoryview(array('q', values)).toreadonly()
+    except OverflowError:
+        return tuple(values)
+
+
+def _extend_column(prefix, values):
+    # copies the prefix's buffer rather than its values one by one
+    if isinstance(prefix, memoryview):
+        column = array('q')
+        column.frombytes(prefix.tobytes())
+        try:
+            column.extend(values)
+            return memoryview(column).toreadonly()
+        except OverflowError:
+            pass
+    return _column([*prefix, *values])
+
+
+class ScheduleRow(Mapping):
+    """
+    Lazy, read-only view of one month of a Schedule, behaving like the row dicts it replaces.
+    """
+    __slots__ = ('_schedule', '_index')
+
+    def __init__(self, schedule, index):
+        self._schedule = schedule
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._schedule._value(key, self._index)
+
+    def __iter__(self):
+        return iter(ROW_KEYS)
+
+    def __len__(self):
+        return len(ROW_KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class Schedule(Sequence):
+    """
+    Amortization schedule stored as integer columns rather than a list of row dicts.
+
+    Amounts are kept as integers of 10**-scale, cents unless the principal amount has finer
+    precision, and turned back into the exact Decimals the row dicts held when a row is read.
+    Indexing and slicing are O(1), slices share the columns; prefix sums are built on first use.
+    """
+    __slots__ = ('months', 'scale', 'number_of_months', 'closed', 'negative_zero_interest', 'negative_zero_payments',
+                 '_payments', '_interest', '_balances', '_interest_paid', '_principal_paid')
+
+    def __init__(self, months, payments, interest, balances, scale, number_of_months, closed,
+                 negative_zero_interest=frozenset(), negative_zero_payments=frozenset()):
+        self.months = months
+        self.scale = scale
+        # the loan's last month, and whether its payment absorbed a rounding residual
+        self.number_of_months = number_of_months
+        self.closed = closed
+        # months whose interest on a slightly negative balance rounded to -0.00
+        self.negative_zero_interest = negative_zero_interest
+        # months whose payment, re-amortized from a slightly negative balance, rounded to -0.00
+        self.negative_zero_payments = negative_zero_payments
+        self._payments = payments
+        self._interest = interest
+        self._balances = balances
+        self._interest_paid = None
+        self._principal_paid = None
+
+    # finer principal amounts, e.g. from binary floats, are kept as a list of row dicts, see calc_amortization_schedule
+    MAX_SCALE = 6
+
+    @classmethod
+    def scale_for(cls, principal_amount) -> int | None:
+        scale = max(2, -Decimal(principal_amount).as_tuple().exponent)
+        return scale if scale <= cls.MAX_SCALE else None
+
+    @classmethod
+    def from_rows(cls, rows, scale, number_of_months):
+        unit, cent = Decimal(10) ** scale, Decimal(100)
+        payments, interest, balances = [], [], []
+        negative_zero_interest, negative_zero_payments = [], []
+        payment = payment_units = row = None
+        for row in rows:
+            # every payment of a rate is the same Decimal, but the last
+            if row['monthly_payment'] is not payment:
+                payment = row['monthly_payment']
+                payment_units = int(payment * unit)
+            payments.append(payment_units)
+            if payment.is_signed() and not payment:
+                negative_zero_payments.append(row['month'])
+            accrued_interest = row['monthly_accrued_interest']
+            interest.append(int(accrued_interest * cent))
+            if accrued_interest.is_signed() and not accrued_interest:
+                negative_zero_interest.append(row['month'])
+            balances.append(int(row['remaining_balance'] * unit))
+        closed = row is not None and row['remaining_balance'].as_tuple().exponent == 0
+        return cls(range(1, len(payments) + 1), _column(payments), _column(interest), _column(balances),
+                   scale, number_of_months, closed, frozenset(negative_zero_interest),
+                   frozenset(negative_zero_payments))
+
+    def __len__(self):
+        return len(self.months)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Schedule(self.months[index], self._payments[index], self._interest[index],
+                            self._balances[index], self.scale, self.number_of_months, self.closed,
+                            self.negative_zero_interest, self.negative_zero_payments)
+        if index < 0:
+            index += len(self.months)
+        if not 0 <= index < len(self.months):
+            raise IndexError('schedule index out of range')
+        return ScheduleRow(self, index)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"<Schedule months {self.months.start}..{self.months.stop - 1}>"
+
+    def __sizeof__(self):
+        # the columns are counted in full even for a slice sharing them
+        return object.__sizeof__(self) + sum(
+            column.obj.__sizeof__() if isinstance(column, memoryview) else column.__sizeof__()
+            for column in (self._payments, self._interest, self._balances, self._interest_paid,
+                           self._principal_paid)
+            if column is not None)
+
+    def __reduce__(self):
+        # memoryviews do not pickle, the arrays they view do
+        columns = [array('q', column.tobytes()) if isinstance(column, memoryview) else column
+                   for column in (self._payments, self._interest, self._balances)]
+        return _unpickle_schedule, (self.months, *columns, self.scale, self.number_of_months, self.closed,
+                                    self.negative_zero_interest, self.negative_zero_payments)
+
+    def _is_adjusted_last_row(self, index):
+        return self.closed and self.months[index] == self.number_of_months
+
+    def _value(self, key, index):
+        if key == 'month':
+            return self.months[index]
+        if key == 'monthly_accrued_interest':
+            interest = Decimal(self._interest[index]).scaleb(-2)
+            if not interest and self.months[index] in self.negative_zero_interest:
+                return interest.copy_negate()
+            return interest
+        if key == 'monthly_payment':
+            payment = Decimal(self._payments[index]).scaleb(-self.scale)
+            if not payment and self.months[index] in self.negative_zero_payments:
+                payment = payment.copy_negate()
+            if self.scale != 2 and not self._is_adjusted_last_row(index):
+                payment = payment.quantize(ONE_CENT)
+            return payment
+        if key == 'remaining_balance':
+            if self._is_adjusted_last_row(index):
+                return Decimal(0)
+            return Decimal(self._balances[index]).scaleb(-self.scale)
+        raise KeyError(key)
+
+    def format_column(self, key) -> list[str]:
+        """
+        str() of every value of a column, as in the row dicts, formatting cents directly.
+        """
+        if key == 'month':
+            return [str(month) for month in self.months]
+        if self.scale != 2 or key not in ('monthly_payment', 'remaining_balance', 'monthly_accrued_interest'):
+            return [str(self._value(key, index)) for index in range(len(self))]
+        column = {'monthly_payment': self._payments, 'monthly_accrued_interest': self._interest,
+                  'remaining_balance': self._balances}[key]
+        values = [format_cents(value) for value in column]
+        if key == 'remaining_balance' and values and self._is_adjusted_last_row(len(values) - 1):
+            values[-1] = '0'
+        negative_zero = {'monthly_payment': self.negative_zero_payments,
+                         'monthly_accrued_interest': self.negative_zero_interest}.get(key)
+        if negative_zero:
+            for index, month in enumerate(self.months):
+                if month in negative_zero and not column[index]:
+                    values[index] = '-0.00'
+        return values
+
+    def interest_paid(self, count) -> Decimal:
+        """
+        Interest accrued over the first `count` months of the schedule.
+        """
+        if self._interest_paid is None:
+            self._interest_paid = self._prefix_sums(self._interest)
+        return Decimal(self._interest_paid[count]).scaleb(-2)
+
+    def principal_paid(self, count) -> Decimal:
+        """
+        Principal repaid over the first `count` months of the schedule.
+        """
+        if self._principal_paid is None:
+            factor = 10 ** (self.scale - 2)
+            self._principal_paid = self._prefix_sums(
+                payment - interest * factor for payment, interest in zip(self._payments, self._interest))
+        return Decimal(self._principal_paid[count]).scaleb(-self.scale)
+
+    @staticmethod
+    def _prefix_sums(values):
+        sums = [0]
+        for value in values:
+            sums.append(sums[-1] + value)
+        return _column(sums)
+
+
+def _unpickle_schedule(months, payments, interest, balances, *args):
+    columns = [memoryview(column).toreadonly() if isinstance(column, array) else column
+               for column in (payments, interest, balances)]
+    return Schedule(months, *columns, *args)
+
+
+ENGINES = ('integer', 'decimal')
+
+
+def integer_engine_scale(principal_amount, annual_interest_rate, rate_changes=None) -> int | None:
+    """
+    Scale of the integer engine's balances for the given loan, None when only Decimal handles it.
+    """
+    rates = [annual_interest_rate, *(rate_changes.values() if rate_changes else ())]
+    if Decimal(principal_amount).is_signed() or not all(Decimal(rate).is_finite() for rate in rates):
+        return None
+    return Schedule.scale_for(principal_amount)
+
+
+def iter_amortization_cents(principal_amount, annual_interest_rate, number_of_months, scale, start=1, balance=None,
+                            extra_payments=None, payment=None):
+    """
+    Integer arithmetic counterpart of iter_amortization_schedule, yielding each month's accrued
+    interest in cents, whether it is Decimal's -0.00, and the remaining balance in units of
+    10**-scale before the last payment adjustment.
+    Months from `start` on are generated given the balance the month before, by default the principal amount.
+    Extra principal payments, in units of 10**-scale by month, are made after the monthly payment
+    up to the remaining balance. The monthly payment, in the same units, is calculated unless given.
+
+    Decimal rounds balance * i to the context precision before rounding it to the cent.
+    Rounding the exact integer product once agrees unless it lies within that first rounding
+    of a half cent, those months are recomputed with Decimal.
+    """
+    factor = 10 ** (scale - 2)
+    if payment is None:
+        A = round_to_nearest_cent(calc_monthly_payment(principal_amount, annual_interest_rate, number_of_months))
+        payment = int(A * 100) * factor
+    i = Decimal(annual_interest_rate) / 12
+    negative_rate, digits, exponent = i.as_tuple()
+    rate = int(''.join(map(str, digits)))
+    # cents are the product's digits beyond `shift`
+    shift = scale - 2 - exponent
+    divisor, multiplier = (10 ** shift, 1) if shift > 0 else (1, 10 ** -shift)
+    half = (divisor + 1) // 2
+    precision = getcontext().prec
+    limit = 10 ** precision
+    if balance is None:
+        balance = int(Decimal(principal_amount).scaleb(scale))
+    bound = window = -1
+    for month in range(start, number_of_months + 1):
+        if not -bound <= balance <= bound:
+            # products of balances up to `bound` lose at most `window` to Decimal's precision
+            bound = 2 * abs(balance) + 1
+            window = 10 ** max(0, len(str(bound * rate)) - precision)
+        negative = (balance < 0) != negative_rate
+        product = -balance * rate if balance < 0 else balance * rate
+        cents, remainder = divmod(product * multiplier, divisor)
+        if remainder >= half:
+            cents += 1
+        elif product >= limit and half - remainder <= window:
+            cents = abs(int(round_to_nearest_cent(Decimal(balance).scaleb(-scale) * i) * 100))
+        interest = -cents if negative else cents
+        balance -= payment - interest * factor
+        if extra_payments and month in extra_payments and balance > 0:
+            balance -= min(extra_payments[month], balance)
+        yield interest, negative and not cents, balance
+
+
+def iter_adjustable_rate_cents(principal_amount, annual_interest_rate, number_of_months, scale, rate_changes,
+                               start=1, balance=None, payment=None, extra_payments=None,
+                               negative_zero_payment=False):
+    """
+    iter_amortization_cents across rate changes, re-amortizing the payment over the remaining months
+    whenever the rate changes, yielding the month, its monthly payment and whether that is -0.00
+    before each row. Starting after the first month, the balance the month before is given, and unless
+    the rate changes at `start` the payment that month as well.
+    """
+    rate = annual_interest_rate
+    for month in sorted(rate_changes):
+        if month <= start:
+            rate = rate_changes[month]
+    resets = sorted(month for month in rate_changes if start < month <= number_of_months)
+    if start == 1 and balance is None:
+        balance = int(Decimal(principal_amount).scaleb(scale))
+    factor = 10 ** (scale - 2)
+    for segment_start, segment_end in zip([start, *resets], [*resets, number_of_months + 1]):
+        if segment_start in rate_changes:
+            rate = rate_changes[segment_start]
+            A = round_to_nearest_cent(calc_monthly_payment(Decimal(balance).scaleb(-scale), rate,
+                                                           number_of_months - segment_start + 1))
+            payment = int(A * 100) * factor
+            # re-amortizing a slightly negative balance
+            negative_zero_payment = A.is_signed() and not A
+        elif payment is None:
+            A = round_to_nearest_cent(calc_monthly_payment(principal_amount, rate, number_of_months))
+            payment = int(A * 100) * factor
+        rows = iter_amortization_cents(principal_amount, rate, number_of_months, scale, segment_start, balance,
+                                       extra_payments, payment)
+        for month, (interest, negative_zero, balance) in zip(range(segment_start, segment_end), rows):
+            yield month, payment, negative_zero_payment, interest, negative_zero, balance
+
+
+def calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months, engine='integer',
+                               rate_changes=None) -> Schedule | list[dict]:
+    """
+    Calculate amortization schedule.
+    Monthly payments and interest accruals are rounded to the nearest cent.
+    The last monthly payment is adjusted to ensure zero closing balance.
+
+    Adjustable-rate loans pass their rate changes, mapping months to the annual interest rate
+    from then on; the monthly payment is re-amortized over the remaining months at each of them.
+
+    The integer engine computes the same schedule as the decimal one in integer cents.
+
+    Returns a Schedule, or a list of the row dicts for principal amounts finer than Schedule.MAX_SCALE
+    decimal places, e.g. binary floats; both are sequences of row mappings.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+    if rate_changes and any(not 1 <= month <= number_of_months for month in rate_changes):
+        raise ValueError(f"rates must change in months 1..{number_of_months}")
+    scale = integer_engine_scale(principal_amount, annual_interest_rate, rate_changes)
+    if engine == 'integer' and scale is not None:
+        if rate_changes:
+            return _calc_adjustable_schedule(principal_amount, annual_interest_rate, number_of_months, scale,
+                                             rate_changes)
+        return _calc_integer_schedule(principal_amount, annual_interest_rate, number_of_months, scale)
+    rows = iter_amortization_schedule(principal_amount, annual_interest_rate, number_of_months, rate_changes)
+    scale = Schedule.scale_for(principal_amount)
+    if scale is None:
+        return list(rows)
+    return Schedule.from_rows(rows, scale, number_of_months)
+
+
+def _calc_integer_schedule(principal_amount, annual_interest_rate, number_of_months, scale,
+                           start=1, end=None, checkpoint=(0, None)):
+    # months start to end, from the balance after the checkpoint's month
+    end = number_of_months if end is None else end
+    after, balance = checkpoint
+    A = round_to_nearest_cent(calc_monthly_payment(principal_amount, annual_interest_rate, number_of_months))
+    payment = int(A * 100) * 10 ** (scale - 2)
+    interest, balances, negative_zero_interest = [], [], []
+    rows = iter_amortization_cents(principal_amount, annual_interest_rate, number_of_months, scale,
+                                   after + 1, balance)
+    for month, (cents, negative_zero, balance) in enumerate(islice(rows, start - after - 1, end - after), start):
+        interest.append(cents)
+        balances.append(balance)
+        if negative_zero:
+            negative_zero_interest.append(month)
+    payments = [payment] * len(balances)
+    closed = end == number_of_months and bool(balances) and balances[-1] != 0
+    if closed:
+        payments[-1] += balances[-1]
+        balances[-1] = 0
+    return Schedule(range(start, start + len(balances)), _column(payments), _column(interest), _column(balances),
+                    scale, number_of_months, closed, frozenset(negative_zero_interest))
+
+
+def _calc_adjustable_schedule(principal_amount, annual_interest_rate, number_of_months, scale, rate_changes,
+                              start=1, balance=None, prefix=None):
+    # months start to number_of_months after those of the prefix schedule, from the balance before start
+    payments, interest, balances, negative_zero_interest, negative_zero_payments = [], [], [], [], []
+    for month, payment, negative_zero_payment, cents, negative_zero, remaining in iter_adjustable_rate_cents(
+            principal_amount, annual_interest_rate, number_of_months, scale, rate_changes, start, balance):
+        payments.append(payment)
+        interest.append(cents)
+        balances.append(remaining)
+        if negative_zero:
+            negative_zero_interest.append(month)
+        if negative_zero_payment:
+            negative_zero_payments.append(month)
+    closed = bool(balances) and balances[-1] != 0
+    if closed:
+        payments[-1] += balances[-1]
+        balances[-1] = 0
+        # the adjusted payment is no longer zero
+        negative_zero_payments = [m for m in negative_zero_payments if m != number_of_months]
+    if prefix is None:
+        return Schedule(range(1, number_of_months + 1), _column(payments), _column(interest), _column(balances),
+                        scale, number_of_months, closed, frozenset(negative_zero_interest),
+                        frozenset(negative_zero_payments))
+    return Schedule(range(1, number_of_months + 1), _extend_column(prefix._payments, payments),
+                    _extend_column(prefix._interest, interest), _extend_column(prefix._balances, balances),
+                    scale, number_of_months, closed,
+                    frozenset([*(m for m in prefix.negative_zero_interest if m < start), *negative_zero_interest]),
+                    frozenset([*(m for m in prefix.negative_zero_payments if m < start), *negative_zero_payments]))
+
+
+def reamortize_schedule(schedule, principal_amount, annual_interest_rate, rate_changes, month) -> Schedule:
+    """
+    Schedule of an adjustable-rate loan after its rate changes in `month`, from `schedule`, its full
+    schedule from calc_amortization_schedule with the rate changes before. Months before `month`
+    are reused from it and only the rest is recalculated, at the new rate and re-amortized payment.
+    """
+    scale = integer_engine_scale(principal_amount, annual_interest_rate, rate_changes)
+    if not isinstance(schedule, Schedule) or scale != schedule.scale or len(schedule) != schedule.number_of_months \
+            or schedule.months.start != 1:
+        raise ValueError("rate changes are applied to full schedules of the integer engine")
+    if month not in rate_changes or any(not 1 <= m <= schedule.number_of_months for m in rate_changes):
+        raise ValueError(f"rates must change in months 1..{schedule.number_of_months}, including month {month}")
+    balance = schedule._balances[month - 2] if month > 1 else None
+    return _calc_adjustable_schedule(principal_amount, annual_interest_rate, schedule.number_of_months, scale,
+                                     rate_changes, month, balance, schedule[:month - 1])
+
+
+class ScheduleCheckpoints:
+    """
+    Remaining balances of a loan's schedule every `interval` months, from which any window
+    of the schedule is recalculated in O(interval + window) months rather than O(term).
+    """
+    __slots__ = ('principal_amount', 'annual_interest_rate', 'number_of_months', 'scale', 'interval', 'balances')
+
+    def __init__(self, principal_amount, annual_interest_rate, number_of_months, scale, interval, balances):
+        self.principal_amount = principal_amount
+        self.annual_interest_rate = annual_interest_rate
+        self.number_of_months = number_of_months
+        self.scale = scale
+        self.interval = interval
+        # balances[k] is the balance after month k * interval
+        self.balances = balances
 
+    def __sizeof__(self):
+        balances = self.balances.obj if isinstance(self.balances, memoryview) else self.balances
+        return object.__sizeof__(self) + balances.__sizeof__()
 
-def calc_monthly_summary(principal_amount, annual_interest_rate, number_of_months, month):
-    schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months)
+    def window(self, start, end) -> Schedule:
+        """
+        Months start to end, inclusive, exactly as in the full schedule.
+        """
+        if not 1 <= start <= end <= self.number_of_months:
+            raise ValueError(f"window {start}..{end} outside of months 1..{self.number_of_months}")
+        checkpoint = (start - 1) // self.interval
+        return _calc_integer_schedule(self.principal_amount, self.annual_interest_rate, self.number_of_months,
+                                      self.scale, start, end,
+                                      (checkpoint * self.interval, self.balances[checkpoint]))
+
+
+def calc_schedule_checkpoints(principal_amount, annual_interest_rate, number_of_months,
+                              interval=12) -> ScheduleCheckpoints | None:
+    """
+    Calculate the schedule's balances every `interval` months with the integer engine,
+    None for loans only the decimal engine handles.
+    """
+    scale = integer_engine_scale(principal_amount, annual_interest_rate)
+    if scale is None:
+        return None
+    balances = [int(Decimal(principal_amount).scaleb(scale))]
+    rows = iter_amortization_cents(principal_amount, annual_interest_rate, number_of_months, scale)
+    for month, (_, _, balance) in enumerate(rows, 1):
+        if month % interval == 0:
+            balances.append(balance)
+    return ScheduleCheckpoints(principal_amount, annual_interest_rate, number_of_months, scale, interval,
+                               _column(balances))
+
+
+def simulate_extra_payments(schedule, principal_amount, annual_interest_rate, extra_payments,
+                            rate_changes=None) -> dict:
+    """
+    Schedule of a loan with extra principal payments (month -> amount), from `schedule`, the loan's
+    full schedule from calc_amortization_schedule. Months before the first extra payment are
+    reused from it, the rest is recalculated; from then on the loan ends once it is paid off.
+    Adjustable-rate loans pass their rate changes, payments are re-amortized from the lower balance.
+
+    Returns the new 'schedule', the 'extra_payments' made, at most the remaining balance,
+    and the 'months_saved' and 'interest_saved' compared to `schedule`.
+    """
+    scale = integer_engine_scale(principal_amount, annual_interest_rate, rate_changes)
+    if not isinstance(schedule, Schedule) or scale != schedule.scale or len(schedule) != schedule.number_of_months \
+            or schedule.months.start != 1:
+        raise ValueError("extra payments are simulated on full schedules of the integer engine")
+    number_of_months = schedule.number_of_months
+    extra, units = {}, {}
+    for month, amount in extra_payments.items():
+        # recurring payments repeat the same amount
+        if amount not in units:
+            units[amount] = int(Decimal(amount).scaleb(scale))
+        if units[amount]:
+            extra[month] = units[amount]
+    if any(not 1 <= month <= number_of_months for month in extra):
+        raise ValueError(f"extra payments must be made in months 1..{number_of_months}")
+    if not extra:
+        return {'schedule': schedule, 'extra_payments': {}, 'months_saved': 0, 'interest_saved': Decimal('0.00')}
+    first = min(extra)
+    factor = 10 ** (scale - 2)
+    balance = schedule._balances[first - 2] if first > 1 else int(Decimal(principal_amount).scaleb(scale))
+    if rate_changes:
+        # the month before the first extra payment is never the adjusted last one
+        payment = schedule._payments[first - 2] if first > 1 else None
+        rows = iter_adjustable_rate_cents(principal_amount, annual_interest_rate, number_of_months, scale,
+                                          rate_changes, first, balance, payment, extra,
+                                          first - 1 in schedule.negative_zero_payments)
+    else:
+        A = round_to_nearest_cent(calc_monthly_payment(principal_amount, annual_interest_rate, number_of_months))
+        payment = int(A * 100) * factor
+        rows = ((month, payment, False, *row) for month, row in enumerate(
+            iter_amortization_cents(principal_amount, annual_interest_rate, number_of_months, scale,
+                                    first, balance, extra), first))
+    payments, interest, balances, made, negative_zero_interest, negative_zero_payments = [], [], [], {}, [], []
+    month = first - 1
+    for month, payment, negative_zero_payment, cents, negative_zero, remaining in rows:
+        regular = balance - (payment - cents * factor)
+        if remaining != regular:
+            made[month] = Decimal(regular - remaining).scaleb(-scale)
+        payments.append(payment)
+        interest.append(cents)
+        balances.append(remaining)
+        if negative_zero:
+            negative_zero_interest.append(month)
+        if negative_zero_payment:
+            negative_zero_payments.append(month)
+        balance = remaining
+        if balance <= 0:
+            break
+    closed = balance != 0
+    if closed:
+        payments[-1] += balance
+        balances[-1] = 0
+        # the adjusted payment is no longer zero
+        negative_zero_payments = [m for m in negative_zero_payments if m != month]
+    simulated = Schedule(range(1, month + 1), _extend_column(schedule._payments[:first - 1], payments),
+                         _extend_column(schedule._interest[:first - 1], interest),
+                         _extend_column(schedule._balances[:first - 1], balances), scale, month, closed,
+                         frozenset([*(m for m in schedule.negative_zero_interest if m < first),
+                                    *negative_zero_interest]),
+                         frozenset([*(m for m in schedule.negative_zero_payments if m < first),
+                                    *negative_zero_payments]))
+    return {
+        'schedule': simulated,
+        'extra_payments': made,
+        'months_saved': number_of_months - month,
+        'interest_saved': schedule.interest_paid(number_of_months) - schedule.interest_paid(first - 1)
+                          - Decimal(sum(interest)).scaleb(-2),
+    }
+
+
+def calc_monthly_summary(principal_amount, annual_interest_rate, number_of_months, month, engine='integer'):
+    """
+    Calculate loan summary for a given month without building the full schedule.
+    Interest accruals are rounded to the nearest cent every month, so the balance
+    is path dependent; the recurrence is walked only up to the requested month.
+    Zero-interest loans take the closed form directly.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+    scale = integer_engine_scale(principal_amount, annual_interest_rate)
+    if engine == 'integer' and scale is not None and annual_interest_rate != 0 and 0 < month <= number_of_months:
+        return _calc_integer_summary(principal_amount, annual_interest_rate, number_of_months, month, scale)
+    A = round_to_nearest_cent(calc_monthly_payment(principal_amount, annual_interest_rate, number_of_months))
+    i = Decimal(annual_interest_rate) / 12
+    balance = Decimal(principal_amount)
+    if i == 0:
+        balance -= month * A
+        aggregate_interest_paid = round_to_nearest_cent(0)
+    else:
+        aggregate_interest_paid = 0
+        for _ in range(month):
+            monthly_accrued_interest = round_to_nearest_cent(balance * i)
+            balance -= A - monthly_accrued_interest
+            aggregate_interest_paid += monthly_accrued_interest
+    if month == number_of_months and balance != 0:
+        balance = Decimal(0)
+    return {
+        'remaining_balance': balance,
+        'aggregate_principal_paid': principal_amount - balance,
+        'aggregate_interest_paid': aggregate_interest_paid
+    }
+
+
+def _calc_integer_summary(principal_amount, annual_interest_rate, number_of_months, month, scale):
+    aggregate_interest_paid = balance = 0
+    for interest, _, balance in islice(
+            iter_amortization_cents(principal_amount, annual_interest_rate, number_of_months, scale), month):
+        aggregate_interest_paid += interest
+    balance = Decimal(0) if month == number_of_months and balance != 0 else Decimal(balance).scaleb(-scale)
+    return {
+        'remaining_balance': balance,
+        'aggregate_principal_paid': principal_amount - balance,
+        'aggregate_interest_paid': Decimal(aggregate_interest_paid).scaleb(-2)
+    }
+
+
+def calc_monthly_summary_from_schedule(schedule, principal_amount, month):
+    """
+    Calculate loan summary for a given month from an already calculated schedule.
+    """
     month_row = schedule[month-1]
+    if isinstance(schedule, Schedule):
+        aggregate_interest_paid = schedule.interest_paid(month)
+    else:
+        aggregate_interest_paid = sum(r['monthly_accrued_interest'] for r in schedule[:month])
     return {
         'remaining_balance': month_row['remaining_balance'],
         'aggregate_principal_paid': principal_amount - month_row['remaining_balance'],
-        'aggregate_interest_paid': sum(r['monthly_accrued_interest'] for r in schedule[:month])
+        'aggregate_interest_paid': aggregate_interest_paid
     }
 
 
@@ -61,4 +680,5 @@ if __name__ == "__main__":
 
     # four-year, $30,000 auto loan at 3% interest
     print(calc_monthly_payment(30000.0, 0.03, 48))
-    print(json.dumps(jsonable_encoder(calc_amortization_schedule(30000.0, 0.03, 48)), indent=2))
+    print(json.dumps(jsonable_encoder([dict(row) for row in calc_amortization_schedule(30000.0, 0.03, 48)]),
+                     indent=2))
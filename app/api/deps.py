@@ -1,33 +1,39 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator
 from typing import Annotated
 
-import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
-from sqlmodel import Session
+from sqlalchemy.orm import contains_eager
+from sqlmodel import exists, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
 from app.core.config import settings
-from app.core.db import engine
-from app.models import TokenPayload, User
+from app.core.db import async_engine
+from app.core.token_cache import token_cache
+from app.models import Loan, LoanRateChange, LoanShare, TokenPayload, User
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
 
-def get_db() -> Generator[Session, None, None]:
-    with Session(engine) as session:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
 
 
-SessionDep = Annotated[Session, Depends(get_db)]
+SessionDep = Annotated[AsyncSession, Depends(get_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+async def get_current_user(session: SessionDep, token: TokenDep) -> User:
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+    import jwt
+    from jwt.exceptions import InvalidTokenError
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
@@ -38,11 +44,12 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
+    user = await session.get(User, token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    token_cache.put(token, user, exp=payload.get("exp"))
     return user
 
 
@@ -55,3 +62,33 @@ def get_current_active_superuser(current_user: CurrentUser) -> User:
             status_code=403, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+async def authorize_profiling(authorization: str) -> User:
+    """
+    Check a request's Authorization header belongs to an active superuser, for ProfilingMiddleware.
+    """
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        return get_current_active_superuser(await get_current_user(session, token))
+
+
+async def get_accessible_loan(session: SessionDep, current_user: CurrentUser, id: int) -> Loan:
+    """
+    Load a loan the current user owns or has been shared, with its rate changes, in a single indexed query.
+    Missing and inaccessible loans are indistinguishable to the caller.
+    """
+    statement = select(Loan).outerjoin(LoanRateChange, LoanRateChange.loan_id == Loan.id) \
+        .options(contains_eager(Loan.rate_changes)).where(Loan.id == id).order_by(LoanRateChange.month)
+    if not current_user.is_superuser:
+        is_shared = exists().where(LoanShare.loan_id == Loan.id, LoanShare.user_id == current_user.id)
+        statement = statement.where(or_(Loan.owner_id == current_user.id, is_shared))
+    loan = (await session.exec(statement)).unique().first()
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+    return loan
+
+
+AccessibleLoan = Annotated[Loan, Depends(get_accessible_loan)]
@@ -1,10 +1,11 @@
 from fastapi import APIRouter
 
-from app.api.routes import login, users, loans
+from app.api.routes import login, users, loans, profiles
 
 api_router = APIRouter()
 
 api_router.include_router(login.router, tags=["login"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(loans.router, prefix="/loans", tags=["loans"])
+api_router.include_router(profiles.router, prefix="/profiles", tags=["profiles"])
 #api_router.include_router(utils.router, prefix="/utils", tags=["utils"])
@@ -1,67 +1,335 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from decimal import Decimal
-from typing import Annotated, Any
+from typing import Annotated, Any, Literal
 
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from sqlmodel import func, or_, select
 
-from app.api.deps import CurrentUser, SessionDep
-from app.models import Loan, LoanCreate, LoanPublic, LoansPublic
-from app.amortization_calculator import calc_amortization_schedule, calc_monthly_summary
-from app.crud import get_user_by_email, create_loan_share
+from app import crud_async
+from app.api.deps import AccessibleLoan, CurrentUser, SessionDep
+from app.core.config import settings
+from app.core.profiling import run_in_threadpool
+from app.models import (
+    Loan, LoanBulkError, LoanCreate, LoanPublic, LoansBulkCreated, LoansPublic, LoanShare, LoanScheduleRowPublic,
+    LoanRateChange, LoanRateChangeIn, LoanRateChangePublic
+)
+from app.amortization_calculator import (
+    Schedule, calc_monthly_payment, calc_monthly_summary, calc_monthly_summary_from_schedule,
+    iter_amortization_schedule, round_to_nearest_cent, simulate_extra_payments
+)
+from app.core.schedule_cache import schedule_cache, schedule_key
 
 
 router = APIRouter()
 
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+
 @router.post("/", response_model=LoanPublic)
-def create_loan(
+async def create_loan(
     *, session: SessionDep, current_user: CurrentUser, loan_in: LoanCreate
 ) -> Any:
     """
     Create new loan.
     """
-    loan = Loan.model_validate(loan_in, update={"owner_id": current_user.id})
-    session.add(loan)
-    session.commit()
-    session.refresh(loan)
-    return loan
+    return await crud_async.create_loan(session=session, loan_in=loan_in, owner_id=current_user.id)
+
+
+def parse_bulk_items(body: bytes, content_type: str) -> list:
+    try:
+        if content_type.startswith(NDJSON_MEDIA_TYPE):
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Malformed JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Expected a list of loans")
+    return items
+
+
+@router.post("/bulk", response_model=LoansBulkCreated, openapi_extra={"requestBody": {
+    "required": True,
+    "content": {
+        "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/LoanCreate"}}},
+        NDJSON_MEDIA_TYPE: {"schema": {"$ref": "#/components/schemas/LoanCreate"}},
+    },
+}})
+async def create_loans(
+    request: Request, session: SessionDep, current_user: CurrentUser,
+        errors: Annotated[Literal["reject", "report"], Query(title="invalid item handling")] = "reject"
+) -> Any:
+    """
+    Create many loans in a single transaction, from a JSON array or NDJSON (one loan per line).
+
+    With `errors=reject` (default) nothing is created if any item is invalid; with
+    `errors=report` the valid items are created and the invalid ones reported.
+    """
+    items = parse_bulk_items(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > settings.LOAN_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {settings.LOAN_BULK_MAX_ITEMS} loans per request")
+    loans_in, item_errors = [], []
+    for index, item in enumerate(items):
+        try:
+            loans_in.append(LoanCreate.model_validate(item))
+        except ValidationError as exc:
+            item_errors.append(LoanBulkError(index=index, errors=exc.errors(include_url=False, include_context=False)))
+    if item_errors and errors == "reject":
+        raise HTTPException(status_code=422, detail=jsonable_encoder(item_errors))
+    ids = await crud_async.create_loans(session=session, loans_in=loans_in, owner_id=current_user.id)
+    return LoansBulkCreated(ids=ids, errors=item_errors)
+
+
+def encode_cursor(loan_id: int) -> str:
+    return urlsafe_b64encode(str(loan_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
 
 
 @router.get("/", response_model=LoansPublic)
-def fetch_loans(
+async def fetch_loans(
     session: SessionDep, current_user: CurrentUser,
         limit: Annotated[int, Query(title="limit", gt=0, le=10000)] = 100,
-        skip: int = 0
+        skip: int = 0,
+        cursor: Annotated[str | None, Query(title="next_cursor of the previous page")] = None,
+        include_count: bool = True
 ) -> Any:
     """
     Fetch all loans owned by current user.
+
+    Pages are ordered by loan id. Prefer following `next_cursor` over `skip`, which
+    has to scan past all skipped loans. Set `include_count=false` to skip counting the total.
     """
-    loans = session.query(Loan).filter(Loan.owner_id == current_user.id) \
-        .offset(skip).limit(limit).all()
-    return LoansPublic(data=loans, count=len(loans))
+    statement = select(Loan).where(Loan.owner_id == current_user.id)
+    if cursor is not None:
+        statement = statement.where(Loan.id > decode_cursor(cursor))
+    else:
+        statement = statement.offset(skip)
+    # one extra row tells whether there is a next page
+    statement = statement.order_by(Loan.id).limit(limit + 1)
+    loans = (await session.exec(statement)).all()
+    next_cursor = None
+    if len(loans) > limit:
+        loans = loans[:limit]
+        next_cursor = encode_cursor(loans[-1].id)
+    count = None
+    if include_count:
+        count_statement = select(func.count()).select_from(Loan).where(Loan.owner_id == current_user.id)
+        count = (await session.exec(count_statement)).one()
+    return LoansPublic(data=loans, count=count, next_cursor=next_cursor)
 
 
-class LoanScheduleRow(BaseModel):
+class PortfolioLoanSummary(BaseModel):
+    loan_id: int
+    remaining_balance: Decimal
+    aggregate_interest_paid: Decimal
+    aggregate_principal_paid: Decimal
+
+
+class PortfolioSummary(BaseModel):
     month: int
-    monthly_payment: Decimal
+    data: list[PortfolioLoanSummary]
+    count: int
     remaining_balance: Decimal
+    aggregate_interest_paid: Decimal
+    aggregate_principal_paid: Decimal
+
+
+def cents_to_decimal(cents) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
+
+
+@router.get("/portfolio/summary", response_model=PortfolioSummary)
+async def fetch_portfolio_summary(session: SessionDep, current_user: CurrentUser,
+                                  month: Annotated[int, Query(title="month number", gt=0, le=12*100)]) -> Any:
+    """
+    Get summaries of all loans owned by or shared with current user for a given month,
+    with portfolio totals. Loans whose term ends before the month are fully paid.
+    """
+    shared_loan_ids = select(LoanShare.loan_id).where(LoanShare.user_id == current_user.id)
+    accessible = or_(Loan.owner_id == current_user.id, Loan.id.in_(shared_loan_ids))
+    statement = select(Loan.id, Loan.amount, Loan.annual_interest_rate, Loan.loan_term) \
+        .where(accessible).order_by(Loan.id)
+    loans = (await session.exec(statement)).all()
+    ids, amounts, rates, terms = zip(*loans) if loans else ((), (), (), ())
+    statement = select(LoanRateChange).join(Loan, Loan.id == LoanRateChange.loan_id).where(accessible)
+    rate_changes = {}
+    for rate_change in await session.exec(statement):
+        rate_changes.setdefault(rate_change.loan_id, {})[rate_change.month] = rate_change.annual_interest_rate
+    positions = {loan_id: k for k, loan_id in enumerate(ids)}
+    rate_changes = {positions[loan_id]: loan_rate_changes for loan_id, loan_rate_changes in rate_changes.items()}
+    summaries = await run_in_threadpool(calc_portfolio_summaries, amounts, rates, terms, month, rate_changes)
+    keys = ('remaining_balance', 'aggregate_interest_paid', 'aggregate_principal_paid')
+    data = [
+        PortfolioLoanSummary(loan_id=loan_id, **{key: cents_to_decimal(summaries[key][k]) for key in keys})
+        for k, loan_id in enumerate(ids)
+    ]
+    return PortfolioSummary(month=month, data=data, count=len(data),
+                            **{key: cents_to_decimal(summaries[key].sum()) for key in keys})
+
+
+def calc_portfolio_summaries(amounts, rates, terms, month, rate_changes: dict) -> dict:
+    """
+    calc_monthly_summaries_batch of the loans, those with rate changes (by position) summarized from their schedules.
+    """
+    # numpy is imported on first use rather than with the app
+    from app.amortization_batch import calc_monthly_summaries_batch
+    summaries = calc_monthly_summaries_batch(amounts, rates, terms, month)
+    for k, loan_rate_changes in rate_changes.items():
+        schedule = schedule_cache.get_schedule(amounts[k], rates[k], terms[k], loan_rate_changes)
+        summary = calc_monthly_summary_from_schedule(schedule, amounts[k], min(month, terms[k]))
+        for key, value in summary.items():
+            summaries[key][k] = int(Decimal(value).scaleb(2))
+    return summaries
+
+
+def loan_rate_changes(loan: Loan) -> dict[int, Decimal]:
+    """
+    The loan's rate changes by month, loaded along with it by AccessibleLoan.
+    """
+    return {rate_change.month: rate_change.annual_interest_rate for rate_change in loan.rate_changes}
+
+
+# Part of every ETag, to be bumped when the calculation or the serialization of responses changes
+ETAG_VERSION = 2
+
+
+def loan_etag(loan: Loan, *parts) -> str:
+    """
+    Strong ETag of a response determined by the loan's terms, rate changes included, and the given parts,
+    e.g. the month. Loans with equivalent terms share ETags, as they share schedule cache entries,
+    whether their responses are calculated or read from materialized rows.
+    """
+    key = (ETAG_VERSION,
+           *schedule_key(loan.amount, loan.annual_interest_rate, loan.loan_term, loan_rate_changes(loan)), *parts)
+    return '"%s"' % hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def closing_balance(loan: Loan, rate_changes: dict, previous: dict | None, last: dict) -> Decimal:
+    """
+    remaining_balance of a materialized row of the loan's last month as calculated: Decimal(0) when
+    the last payment was adjusted to close the loan, else 0.00. Stored rows only hold 0.00, the adjustment
+    shows in the last payment differing from the regular one, that of the month before or a re-amortized one.
+    """
+    if previous is None or loan.loan_term in rate_changes:
+        balance = loan.amount if previous is None else previous['remaining_balance']
+        rate = rate_changes.get(loan.loan_term, loan.annual_interest_rate)
+        payment = round_to_nearest_cent(calc_monthly_payment(balance, rate, 1))
+    else:
+        payment = previous['monthly_payment']
+    return last['remaining_balance'] if last['monthly_payment'] == payment else Decimal(0)
+
+
+async def get_previous_row(session: SessionDep, loan: Loan, month: int) -> dict | None:
+    row = await crud_async.get_loan_schedule_row(session=session, loan_id=loan.id, month=month - 1)
+    return None if row is None else row.model_dump()
 
 
-@router.get("/{id}/schedule", response_model=list[LoanScheduleRow])
-def fetch_loan_schedule(session: SessionDep, current_user: CurrentUser, id: int):
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def encode_schedule_json(schedule) -> bytes:
     """
-    Get loan schedule by ID.
+    Encode schedule rows byte for byte as the list[LoanScheduleRowPublic] response model would,
+    decimals as their str(), without validating every row into a model first.
     """
-    loan = session.get(Loan, id)
-    if current_user.is_superuser:
-        if not loan:
-            raise HTTPException(status_code=404, detail="Loan not found")
+    if isinstance(schedule, Schedule):
+        rows = zip(schedule.months, schedule.format_column('monthly_payment'),
+                   schedule.format_column('remaining_balance'))
     else:
-        if not loan or (loan.owner_id != current_user.id
-                        and current_user.id not in [user.id for user in loan.shared_users]):
-            raise HTTPException(status_code=404, detail="Loan not found")
-    schedule = calc_amortization_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term)
-    return schedule
+        rows = ((row['month'], row['monthly_payment'], row['remaining_balance']) for row in schedule)
+    return ("[" + ",".join(
+        f'{{"month":{month},"monthly_payment":"{payment}","remaining_balance":"{balance}"}}'
+        for month, payment, balance in rows
+    ) + "]").encode()
+
+
+def iter_schedule_ndjson(schedule):
+    for row in schedule:
+        yield json.dumps({
+            'month': row['month'],
+            'monthly_payment': str(row['monthly_payment']),
+            'remaining_balance': str(row['remaining_balance']),
+        }, separators=(',', ':')) + '\n'
+
+
+def iter_schedule_csv(schedule):
+    yield 'month,monthly_payment,remaining_balance\r\n'
+    for row in schedule:
+        yield f"{row['month']},{row['monthly_payment']},{row['remaining_balance']}\r\n"
+
+
+@router.get("/{id}/schedule", response_model=list[LoanScheduleRowPublic],
+            responses={200: {"content": {NDJSON_MEDIA_TYPE: {}, CSV_MEDIA_TYPE: {}}}})
+async def fetch_loan_schedule(session: SessionDep, loan: AccessibleLoan,
+                              start: Annotated[int | None, Query(title="first month", gt=0)] = None,
+                              end: Annotated[int | None, Query(title="last month", gt=0)] = None,
+                              accept: Annotated[str | None, Header()] = None,
+                              if_none_match: Annotated[str | None, Header()] = None):
+    """
+    Get loan schedule by ID, optionally only months `start` to `end`.
+
+    Send `Accept: application/x-ndjson` or `Accept: text/csv` to stream the rows instead.
+    """
+    start = 1 if start is None else start
+    end = loan.loan_term if end is None else end
+    if end > loan.loan_term:
+        raise HTTPException(status_code=422, detail="month number exceeds loan term")
+    if start > end:
+        raise HTTPException(status_code=422, detail="start month is after end month")
+    window = () if (start, end) == (1, loan.loan_term) else (start, end)
+    media_type = None
+    if accept and NDJSON_MEDIA_TYPE in accept:
+        media_type = NDJSON_MEDIA_TYPE
+    elif accept and CSV_MEDIA_TYPE in accept:
+        media_type = CSV_MEDIA_TYPE
+    headers = {"ETag": loan_etag(loan, "schedule", media_type, *window),
+               "Cache-Control": settings.LOAN_RESPONSE_CACHE_CONTROL, "Vary": "Accept"}
+    if etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=304, headers=headers)
+    rate_changes = loan_rate_changes(loan)
+    schedule = None
+    if settings.MATERIALIZE_SCHEDULES:
+        schedule = await crud_async.get_loan_schedule(session=session, loan_id=loan.id, start=start, end=end)
+        if schedule is not None and end == loan.loan_term:
+            previous = schedule[-2] if len(schedule) > 1 else await get_previous_row(session, loan, end)
+            schedule[-1]['remaining_balance'] = closing_balance(loan, rate_changes, previous, schedule[-1])
+    if schedule is None and window:
+        # a window costs at most SCHEDULE_CHECKPOINT_INTERVAL months more than its own
+        schedule = await run_in_threadpool(schedule_cache.get_window, loan.amount, loan.annual_interest_rate,
+                                           loan.loan_term, start, end, rate_changes)
+    if media_type is not None:
+        # stream from the cache when possible, without populating it
+        if schedule is None:
+            schedule = schedule_cache.get(loan.amount, loan.annual_interest_rate, loan.loan_term, rate_changes)
+        if schedule is None:
+            schedule = iter_amortization_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term,
+                                                  rate_changes)
+        if media_type == NDJSON_MEDIA_TYPE:
+            return StreamingResponse(iter_schedule_ndjson(schedule), media_type=media_type, headers=headers)
+        return StreamingResponse(iter_schedule_csv(schedule), media_type=media_type, headers=headers)
+    if schedule is None:
+        schedule = await run_in_threadpool(schedule_cache.get_schedule,
+                                           loan.amount, loan.annual_interest_rate, loan.loan_term, rate_changes)
+    # response_model only documents the shape, the rows are encoded directly
+    return Response(encode_schedule_json(schedule), media_type="application/json", headers=headers)
 
 
 class LoanSummary(BaseModel):
@@ -71,33 +339,137 @@ class LoanSummary(BaseModel):
 
 
 @router.get("/{id}/summary", response_model=LoanSummary)
-def fetch_loan_summary(session: SessionDep, current_user: CurrentUser, id: int,
-                       month: Annotated[int, Query(title="month number", gt=0)]) -> Any:
+async def fetch_loan_summary(session: SessionDep, loan: AccessibleLoan, response: Response,
+                             month: Annotated[int, Query(title="month number", gt=0)],
+                             if_none_match: Annotated[str | None, Header()] = None) -> Any:
     """
     Get loan summary for a given month.
     """
-    loan = session.get(Loan, id)
-    if current_user.is_superuser:
-        if not loan:
-            raise HTTPException(status_code=404, detail="Loan not found")
-    else:
-        if not loan or (loan.owner_id != current_user.id
-                        and current_user.id not in [user.id for user in loan.shared_users]):
-            raise HTTPException(status_code=404, detail="Loan not found")
     if month > loan.loan_term:
         raise HTTPException(status_code=422, detail="month number exceeds loan term")
-    return calc_monthly_summary(loan.amount, loan.annual_interest_rate, loan.loan_term, month)
+    headers = {"ETag": loan_etag(loan, "summary", month), "Cache-Control": settings.LOAN_RESPONSE_CACHE_CONTROL}
+    if etag_matches(headers["ETag"], if_none_match):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    if settings.MATERIALIZE_SCHEDULES:
+        row = await crud_async.get_loan_schedule_row(session=session, loan_id=loan.id, month=month)
+        if row is not None:
+            remaining_balance = row.remaining_balance
+            if month == loan.loan_term:
+                remaining_balance = closing_balance(loan, loan_rate_changes(loan),
+                                                    await get_previous_row(session, loan, month), row.model_dump())
+            return {
+                'remaining_balance': remaining_balance,
+                'aggregate_principal_paid': loan.amount - remaining_balance,
+                'aggregate_interest_paid': row.aggregate_interest_paid
+            }
+    rate_changes = loan_rate_changes(loan)
+    if rate_changes:
+        schedule = await run_in_threadpool(schedule_cache.get_schedule, loan.amount, loan.annual_interest_rate,
+                                           loan.loan_term, rate_changes)
+        return await run_in_threadpool(calc_monthly_summary_from_schedule, schedule, loan.amount, month)
+    # a cached schedule answers directly; otherwise avoid building one just for a summary
+    schedule = schedule_cache.get(loan.amount, loan.annual_interest_rate, loan.loan_term)
+    if schedule is not None:
+        return await run_in_threadpool(calc_monthly_summary_from_schedule, schedule, loan.amount, month)
+    return await run_in_threadpool(calc_monthly_summary, loan.amount, loan.annual_interest_rate, loan.loan_term,
+                                   month, settings.AMORTIZATION_ENGINE)
+
+
+class ExtraPayment(BaseModel):
+    month: int = Field(gt=0)
+    amount: Decimal = Field(gt=0, decimal_places=2)
+
+
+class LoanSimulationIn(BaseModel):
+    extra_payments: list[ExtraPayment] = Field(default=[], max_length=12*100)
+    # made every month from recurring_from_month on, in addition to extra_payments
+    recurring_extra_payment: Decimal | None = Field(default=None, gt=0, decimal_places=2)
+    recurring_from_month: int = Field(default=1, gt=0)
+
+
+class LoanSimulation(BaseModel):
+    months_saved: int
+    interest_saved: Decimal
+    extra_payments: list[ExtraPayment]
+    schedule: list[LoanScheduleRowPublic]
+
+
+def encode_simulation_json(simulation: dict) -> bytes:
+    """
+    Encode a simulation byte for byte as the LoanSimulation response model would, see encode_schedule_json.
+    """
+    extra_payments = ",".join(f'{{"month":{month},"amount":"{amount}"}}'
+                              for month, amount in sorted(simulation['extra_payments'].items()))
+    return (f'{{"months_saved":{simulation["months_saved"]},"interest_saved":"{simulation["interest_saved"]}",'
+            f'"extra_payments":[{extra_payments}],"schedule":').encode() \
+        + encode_schedule_json(simulation['schedule']) + b"}"
+
+
+def simulate_loan(loan: Loan, extra_payments: dict, rate_changes: dict | None = None) -> dict:
+    schedule = schedule_cache.get_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term, rate_changes)
+    return simulate_extra_payments(schedule, loan.amount, loan.annual_interest_rate, extra_payments, rate_changes)
+
+
+@router.post("/{id}/simulate", response_model=LoanSimulation)
+async def simulate_loan_extra_payments(loan: AccessibleLoan, simulation_in: LoanSimulationIn):
+    """
+    Simulate extra principal payments on a loan, returning its schedule with them,
+    the extra payments made and the months and interest they save.
+    Only the months from the first extra payment on are recalculated.
+    """
+    extra_payments = {}
+    for extra_payment in simulation_in.extra_payments:
+        if extra_payment.month > loan.loan_term:
+            raise HTTPException(status_code=422, detail="month number exceeds loan term")
+        extra_payments[extra_payment.month] = extra_payments.get(extra_payment.month, 0) + extra_payment.amount
+    if simulation_in.recurring_extra_payment is not None:
+        if simulation_in.recurring_from_month > loan.loan_term:
+            raise HTTPException(status_code=422, detail="month number exceeds loan term")
+        for month in range(simulation_in.recurring_from_month, loan.loan_term + 1):
+            extra_payments[month] = extra_payments.get(month, 0) + simulation_in.recurring_extra_payment
+    simulation = await run_in_threadpool(simulate_loan, loan, extra_payments, loan_rate_changes(loan))
+    # response_model only documents the shape, like the schedule's
+    return Response(encode_simulation_json(simulation), media_type="application/json")
+
+
+@router.get("/{id}/rate-changes", response_model=list[LoanRateChangePublic])
+async def fetch_loan_rate_changes(loan: AccessibleLoan) -> Any:
+    """
+    Get the rate changes of an adjustable-rate loan, in month order.
+    """
+    return loan.rate_changes
+
+
+@router.post("/{id}/rate-changes", response_model=list[LoanRateChangePublic])
+async def change_loan_rate(session: SessionDep, current_user: CurrentUser, loan: AccessibleLoan,
+                           rate_change_in: LoanRateChangeIn) -> Any:
+    """
+    Change a loan's annual interest rate from a month on, replacing any change in that month.
+    The monthly payment is re-amortized over the remaining months from then on.
+    Returns all the loan's rate changes.
+    """
+    if not current_user.is_superuser and loan.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="The user doesn't have enough privileges")
+    if rate_change_in.month > loan.loan_term:
+        raise HTTPException(status_code=422, detail="month number exceeds loan term")
+    old_rate_changes = loan_rate_changes(loan)
+    rate_changes = await crud_async.set_loan_rate_change(session=session, loan=loan, rate_change_in=rate_change_in)
+    # only the months from the change on of a cached schedule are recalculated
+    await run_in_threadpool(schedule_cache.reamortize, loan.amount, loan.annual_interest_rate, loan.loan_term,
+                            old_rate_changes, rate_changes, rate_change_in.month)
+    return [LoanRateChangePublic(month=month, annual_interest_rate=rate) for month, rate in rate_changes.items()]
 
 
 @router.put("/{id}/share")
-def share_loan(session: SessionDep, current_user: CurrentUser, id: int,
-               email: Annotated[str, Query(title="user email")]) -> Any:
+async def share_loan(session: SessionDep, current_user: CurrentUser, id: int,
+                     email: Annotated[str, Query(title="user email")]) -> Any:
     """
     Grant read access to a loan to another user.
     """
-    loan = session.get(Loan, id)
+    loan = await session.get(Loan, id)
     if not loan or (not current_user.is_superuser and (loan.owner_id != current_user.id)):
         return
-    user = get_user_by_email(session=session, email=email)
+    user = await crud_async.get_user_by_email(session=session, email=email)
     if user and user.id != current_user.id:
-        create_loan_share(session=session, loan_id=loan.id, user_id=user.id)
+        await crud_async.create_loan_share(session=session, loan_id=loan.id, user_id=user.id)
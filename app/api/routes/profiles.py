@@ -0,0 +1,20 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.api.deps import get_current_active_superuser
+from app.core.profiling import profile_store
+
+
+router = APIRouter()
+
+
+@router.get("/{id}", dependencies=[Depends(get_current_active_superuser)])
+async def fetch_profile(id: str) -> Any:
+    """
+    Fetch the report of a request profiled with the X-Profile header.
+    """
+    report = profile_store.get(id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
@@ -0,0 +1,25 @@
+"""
+Materialize schedules of existing loans, see Settings.MATERIALIZE_SCHEDULES.
+
+    python -m app.backfill_schedules [--chunk-size N]
+"""
+import argparse
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine, init_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=100, help="loans per transaction")
+    args = parser.parse_args()
+    with Session(engine) as session:
+        init_db(session)
+        count = crud.backfill_loan_schedules(session=session, chunk_size=args.chunk_size)
+    print(f"backfilled {count} loan schedules")
+
+
+if __name__ == "__main__":
+    main()
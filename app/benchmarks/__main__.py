@@ -0,0 +1,88 @@
+"""
+Run the calculator, endpoint, serialization, metrics overhead and startup benchmarks,
+optionally saving the results as JSON and comparing them against a saved baseline.
+
+    python -m app.benchmarks [--only calculator|endpoints|serialization|metrics|startup]
+                             [--save results.json] [--compare baseline.json] [--threshold 0.1]
+
+Exits with status 1 when compared against a baseline and any benchmark got slower than
+the threshold allows.
+"""
+import argparse
+import importlib
+import json
+import platform
+import sys
+import timeit
+from datetime import datetime, timezone
+
+
+def measure(fn, repeat=5, min_time=0.2) -> float:
+    """
+    Best seconds per call over several repeats.
+    """
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+GROUPS = ("calculator", "endpoints", "serialization", "metrics", "startup")
+
+
+def run(groups) -> dict:
+    results = {}
+    for group in groups:
+        module = importlib.import_module(f"app.benchmarks.{group}")
+        for name, fn in module.benchmarks().items():
+            results[name] = measure(fn)
+            print(f"{name:50} {results[name] * 1e6:12.1f} us", flush=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Print the change of every benchmark relative to the baseline,
+    returning the names of those slower by more than the threshold.
+    """
+    regressions = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        change = seconds / baseline[name] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:50} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", choices=GROUPS, help="run only one group of benchmarks")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results against this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, default 0.1 (10%%)")
+    args = parser.parse_args(argv)
+
+    results = run([args.only] if args.only else GROUPS)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "created": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print(f"\ncompared to {args.compare}")
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
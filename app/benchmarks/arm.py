@@ -0,0 +1,70 @@
+"""
+Apply an index rate change to a book of adjustable-rate loans: re-amortizing the tail of their
+schedules from the next reset on, against recalculating their full schedules.
+
+    python -m app.benchmarks.arm [number_of_loans]
+"""
+import random
+import sys
+import time
+from decimal import Decimal
+
+from app.amortization_calculator import calc_amortization_schedule, reamortize_schedule
+
+
+# 5/1 ARMs: fixed for five years, then reset every year to the index plus the loan's margin
+FIXED_MONTHS = 60
+RESET_MONTHS = 12
+INDEX = Decimal("0.0450")
+NEW_INDEX = Decimal("0.0525")
+
+
+def random_book(count, seed=0):
+    """
+    Loans as (amount, initial rate, term, margin, month of their next reset), with the resets so far set.
+    """
+    rng = random.Random(seed)
+    book = []
+    for _ in range(count):
+        amount = Decimal(rng.randint(5_000_000, 100_000_000)) / 100
+        margin = Decimal(rng.randint(150, 300)) / 10000
+        term = rng.choice([360, 480])
+        next_reset = rng.randrange(FIXED_MONTHS + 1, term, RESET_MONTHS)
+        rate_changes = {month: INDEX + margin for month in range(FIXED_MONTHS + 1, next_reset, RESET_MONTHS)}
+        book.append((amount, INDEX + margin - Decimal("0.0100"), term, margin, next_reset, rate_changes))
+    return book
+
+
+def main(count=1000):
+    book = random_book(count)
+    schedules = [calc_amortization_schedule(P, r, n, rate_changes=rate_changes)
+                 for P, r, n, _, _, rate_changes in book]
+    changed = [{**rate_changes, next_reset: NEW_INDEX + margin}
+               for _, _, _, margin, next_reset, rate_changes in book]
+
+    start = time.perf_counter()
+    for (P, r, n, _, next_reset, _), schedule, rate_changes in zip(book, schedules, changed):
+        reamortize_schedule(schedule, P, r, rate_changes, next_reset)
+    tail = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for (P, r, n, *_), rate_changes in zip(book, changed):
+        calc_amortization_schedule(P, r, n, rate_changes=rate_changes)
+    full = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for (P, r, n, *_), rate_changes in zip(book, changed):
+        calc_amortization_schedule(P, r, n, 'decimal', rate_changes)
+    decimal = time.perf_counter() - start
+
+    months = sum(n - next_reset + 1 for _, _, n, _, next_reset, _ in book)
+    print(f"{count} loans, {months / count:.0f} of {sum(loan[2] for loan in book) / count:.0f} months "
+          f"recalculated on average")
+    print(f"tail re-amortization: {tail:.3f} s ({count / tail:,.0f} loans/s)")
+    print(f"full recalculation:   {full:.3f} s ({count / full:,.0f} loans/s)")
+    print(f"full, decimal engine: {decimal:.3f} s ({count / decimal:,.0f} loans/s)")
+    print(f"speedup:              {full / tail:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
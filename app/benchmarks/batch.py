@@ -0,0 +1,42 @@
+"""
+Compare the NumPy batch engine with looping the scalar calculator.
+
+    python -m app.benchmarks.batch [number_of_loans]
+"""
+import random
+import sys
+import time
+from decimal import Decimal
+
+from app.amortization_batch import calc_amortization_schedules_batch
+from app.amortization_calculator import calc_amortization_schedule
+
+
+def random_loans(count, seed=0):
+    rng = random.Random(seed)
+    amounts = [Decimal(rng.randint(100_000, 100_000_000)) / 100 for _ in range(count)]
+    rates = [Decimal(rng.randint(0, 1200)) / 10000 for _ in range(count)]
+    terms = [rng.choice([60, 120, 180, 240, 360]) for _ in range(count)]
+    return amounts, rates, terms
+
+
+def main(count=2000):
+    amounts, rates, terms = random_loans(count)
+
+    start = time.perf_counter()
+    for P, r, n in zip(amounts, rates, terms):
+        calc_amortization_schedule(P, r, n)
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calc_amortization_schedules_batch(amounts, rates, terms)
+    batch = time.perf_counter() - start
+
+    print(f"{count} loans")
+    print(f"scalar loop: {scalar:.3f} s ({count / scalar:,.0f} loans/s)")
+    print(f"batch:       {batch:.3f} s ({count / batch:,.0f} loans/s)")
+    print(f"speedup:     {scalar / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,30 @@
+from decimal import Decimal
+
+from app.amortization_calculator import (
+    calc_amortization_schedule, calc_monthly_payment, calc_monthly_summary, simulate_extra_payments
+)
+
+
+AMOUNT = Decimal('200000.00')
+RATE = Decimal('0.0647')
+# up to the 100 year limit of LoanBase.loan_term
+TERMS = (12, 60, 360, 1200)
+
+
+def benchmarks() -> dict:
+    result = {}
+    for term in TERMS:
+        result[f"calc_monthly_payment[{term}]"] = lambda term=term: calc_monthly_payment(AMOUNT, RATE, term)
+        result[f"calc_amortization_schedule[{term}]"] = \
+            lambda term=term: calc_amortization_schedule(AMOUNT, RATE, term)
+        result[f"calc_monthly_summary[{term}, last month]"] = \
+            lambda term=term: calc_monthly_summary(AMOUNT, RATE, term, term)
+        result[f"calc_amortization_schedule[{term}, decimal]"] = \
+            lambda term=term: calc_amortization_schedule(AMOUNT, RATE, term, 'decimal')
+        result[f"calc_monthly_summary[{term}, last month, decimal]"] = \
+            lambda term=term: calc_monthly_summary(AMOUNT, RATE, term, term, 'decimal')
+        schedule = calc_amortization_schedule(AMOUNT, RATE, term)
+        result[f"simulate_extra_payments[{term}, one in last quarter]"] = \
+            lambda term=term, schedule=schedule: simulate_extra_payments(
+                schedule, AMOUNT, RATE, {term * 3 // 4: Decimal('10000.00')})
+    return result
@@ -0,0 +1,68 @@
+"""
+Compare requests/sec of the async database path with the former sync, threadpool based one
+under concurrent load.
+
+    python -m app.benchmarks.concurrency [requests] [concurrency]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.db import async_engine, engine, init_db
+from app.models import Loan, LoanCreate
+from app import crud
+
+
+app = FastAPI()
+
+
+@app.get("/sync/{id}")
+def fetch_loan_sync(id: int):
+    with Session(engine) as session:
+        loan = session.get(Loan, id)
+        if not loan:
+            raise HTTPException(status_code=404)
+        return {"id": loan.id, "loan_term": loan.loan_term}
+
+
+@app.get("/async/{id}")
+async def fetch_loan_async(id: int):
+    async with AsyncSession(async_engine) as session:
+        loan = await session.get(Loan, id)
+        if not loan:
+            raise HTTPException(status_code=404)
+        return {"id": loan.id, "loan_term": loan.loan_term}
+
+
+async def run(path, loan_ids, requests, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = iter(range(requests))
+
+        async def worker():
+            for n in queue:
+                response = await client.get(f"{path}/{loan_ids[n % len(loan_ids)]}")
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+def main(requests=2000, concurrency=64):
+    with Session(engine) as session:
+        init_db(session)
+        loan_in = LoanCreate(amount=200000, annual_interest_rate='0.05', loan_term=360)
+        loan_ids = [crud.create_loan(session=session, loan_in=loan_in, owner_id=1).id for _ in range(100)]
+    for path in ("/sync", "/async"):
+        rate = asyncio.run(run(path, loan_ids, requests, concurrency))
+        print(f"{path:7} {requests} requests, concurrency {concurrency}: {rate:,.0f} req/s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
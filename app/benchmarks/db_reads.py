@@ -0,0 +1,64 @@
+"""
+Read queries/sec against the in-memory database's single static connection and a file-backed
+database in WAL mode with a connection pool, from an increasing number of threads.
+
+    python -m app.benchmarks.db_reads [queries per thread] [max threads]
+"""
+import sys
+import tempfile
+import threading
+import time
+
+from sqlmodel import Session, SQLModel, insert, select
+
+from app.core.db import make_engine
+from app.models import Loan, User
+
+
+def seed(engine, loans=5000) -> None:
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(id=1, email="bench@example.com", hashed_password="x"))
+        session.flush()
+        session.execute(insert(Loan), [
+            {"amount": 1000 + i, "annual_interest_rate": "0.05", "loan_term": 360, "owner_id": 1}
+            for i in range(loans)
+        ])
+        session.commit()
+
+
+def read(engine, queries) -> None:
+    for n in range(queries):
+        with Session(engine) as session:
+            statement = select(Loan).where(Loan.owner_id == 1, Loan.id > n * 7 % 4000).order_by(Loan.id).limit(50)
+            assert len(session.exec(statement).all()) == 50
+
+
+def run(engine, threads, queries) -> float:
+    workers = [threading.Thread(target=read, args=(engine, queries)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * queries / (time.perf_counter() - start)
+
+
+def main(queries=500, max_threads=8):
+    with tempfile.TemporaryDirectory() as directory:
+        engines = {
+            "memory, static": make_engine("sqlite:///file:bench?mode=memory&cache=shared&uri=true"),
+            "file WAL, pooled": make_engine(f"sqlite:///{directory}/bench.db"),
+        }
+        for name, engine in engines.items():
+            seed(engine)
+            threads = 1
+            while threads <= max_threads:
+                rate = run(engine, threads, queries)
+                print(f"{name:17} {threads:2} threads: {rate:8,.0f} queries/s", flush=True)
+                threads *= 2
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine, init_db
+from app.core.schedule_cache import schedule_cache
+from app.main import app
+
+
+LOGIN_DATA = {"username": settings.FIRST_SUPERUSER, "password": settings.FIRST_SUPERUSER_PASSWORD}
+
+
+def benchmarks() -> dict:
+    with Session(engine) as session:
+        init_db(session)
+    client = TestClient(app)
+    token = client.post(f"{settings.API_V1_STR}/login/access-token", data=LOGIN_DATA).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    loans = {term: client.post(f"{settings.API_V1_STR}/loans/", headers=headers, json={"loan_term": term}).json()
+             for term in (360, 1200)}
+    # only ever fetched in windows, served from checkpoints once the first one computed them
+    window_loans = {term: client.post(f"{settings.API_V1_STR}/loans/", headers=headers,
+                                      json={"amount": "123456.78", "loan_term": term}).json()
+                    for term in (360, 1200)}
+
+    def get(url):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+
+    def get_uncached(url):
+        schedule_cache.clear()
+        get(url)
+
+    result = {
+        "POST /login/access-token": lambda: client.post(f"{settings.API_V1_STR}/login/access-token", data=LOGIN_DATA),
+        "GET /loans/": lambda: get(f"{settings.API_V1_STR}/loans/"),
+    }
+    for term, loan in loans.items():
+        url = f"{settings.API_V1_STR}/loans/{loan['id']}"
+        result[f"GET /loans/{{id}}/schedule[{term}]"] = lambda url=url: get(f"{url}/schedule")
+        result[f"GET /loans/{{id}}/schedule[{term}, uncached]"] = lambda url=url: get_uncached(f"{url}/schedule")
+        result[f"GET /loans/{{id}}/summary[{term}, last month]"] = \
+            lambda url=url, term=term: get_uncached(f"{url}/summary?month={term}")
+        etag = client.get(f"{url}/schedule", headers=headers).headers["ETag"]
+        result[f"GET /loans/{{id}}/schedule[{term}, not modified]"] = \
+            lambda url=url, etag=etag: client.get(f"{url}/schedule", headers={**headers, "If-None-Match": etag})
+    for term, loan in window_loans.items():
+        url = f"{settings.API_V1_STR}/loans/{loan['id']}/schedule?start={term - 11}"
+        result[f"GET /loans/{{id}}/schedule[{term}, last 12 months]"] = lambda url=url: get(url)
+    return result
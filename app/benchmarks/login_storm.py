@@ -0,0 +1,85 @@
+"""
+Measure loan summary latency while a storm of logins hits password hashing, once with the
+dedicated bounded executor and once with hashing on the threadpool shared with other routes.
+
+    python -m app.benchmarks.login_storm [requests] [concurrent_logins]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import crud_async
+from app.core.config import settings
+from app.core.db import engine, init_db
+from app.main import app
+
+
+LOGIN_DATA = {"username": settings.FIRST_SUPERUSER, "password": settings.FIRST_SUPERUSER_PASSWORD}
+
+
+async def measure_summaries(client, url, headers, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def login_storm(client, stop, statuses):
+    while not stop.is_set():
+        response = await client.post(f"{settings.API_V1_STR}/login/access-token", data=LOGIN_DATA)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            await asyncio.sleep(float(response.headers["retry-after"]))
+
+
+async def measure_during_storm(client, url, headers, requests, concurrent_logins):
+    stop, statuses = asyncio.Event(), {}
+    storm = [asyncio.create_task(login_storm(client, stop, statuses)) for _ in range(concurrent_logins)]
+    await asyncio.sleep(0.5)
+    p50, p99 = await measure_summaries(client, url, headers, requests)
+    stop.set()
+    await asyncio.gather(*storm)
+    return p50, p99, statuses
+
+
+def report(label, p50, p99, statuses=None):
+    line = f"{label:28} p50 {p50 * 1000:7.2f} ms, p99 {p99 * 1000:7.2f} ms"
+    if statuses is not None:
+        line += f", login responses {statuses}"
+    print(line)
+
+
+async def main(requests=100, concurrent_logins=20):
+    with Session(engine) as session:
+        init_db(session)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        token = (await client.post(f"{settings.API_V1_STR}/login/access-token", data=LOGIN_DATA)).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+        loan = (await client.post(f"{settings.API_V1_STR}/loans/", headers=headers, json={})).json()
+        url = f"{settings.API_V1_STR}/loans/{loan['id']}/summary?month=120"
+
+        report("idle", *await measure_summaries(client, url, headers, requests))
+        report("storm, dedicated executor", *await measure_during_storm(
+            client, url, headers, requests, concurrent_logins))
+
+        dedicated = crud_async.run_password_hashing
+        crud_async.run_password_hashing = run_in_threadpool
+        try:
+            report("storm, shared threadpool", *await measure_during_storm(
+                client, url, headers, requests, concurrent_logins))
+        finally:
+            crud_async.run_password_hashing = dedicated
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*map(int, sys.argv[1:])))
@@ -0,0 +1,44 @@
+"""
+Compare the memory held per cached loan by a schedule stored as a list of row dicts
+against the integer-column Schedule, and the time to build either.
+
+    python -m app.benchmarks.memory
+"""
+import tracemalloc
+from decimal import Decimal
+
+from app.amortization_calculator import calc_amortization_schedule, iter_amortization_schedule
+from app.benchmarks.__main__ import measure
+
+
+TERMS = (360, 1200)
+LOANS = 50
+
+
+def allocated(build) -> int:
+    """
+    Bytes per loan still allocated after building LOANS schedules and keeping them.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(Decimal(100_000 + loan * 1000), Decimal("0.0647")) for loan in range(LOANS)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) // LOANS
+
+
+def main():
+    for term in TERMS:
+        builds = {
+            "list of dicts": lambda amount, rate: list(iter_amortization_schedule(amount, rate, term)),
+            "Schedule": lambda amount, rate: calc_amortization_schedule(amount, rate, term),
+        }
+        for name, build in builds.items():
+            seconds = measure(lambda: build(Decimal("200000.00"), Decimal("0.0647")))
+            print(f"{name + f'[{term}]':24} {allocated(build) / 1024:10.1f} KiB/loan "
+                  f"{seconds * 1e6:10.1f} us", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-request overhead of MetricsMiddleware, calling a trivial FastAPI app directly over ASGI
+with and without it so that client and network costs don't hide the difference, and around
+a no-op ASGI app driven without an event loop to isolate the middleware's own cost.
+
+    python -m app.benchmarks.metrics
+"""
+import asyncio
+
+from fastapi import FastAPI
+
+from app.benchmarks.__main__ import measure
+from app.core.metrics import MetricsMiddleware, RequestMetrics
+
+
+def make_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{id}")
+    def item(id: int):
+        return {"id": id}
+
+    # a realistic number of routes to match the template against
+    for i in range(20):
+        app.get(f"/other/{i}/{{id}}")(item)
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware, metrics=RequestMetrics())
+    return app
+
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+    "scheme": "http", "path": "/items/1", "raw_path": b"/items/1", "root_path": "",
+    "query_string": b"", "headers": [], "client": ("test", 0), "server": ("test", 80),
+}
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def make_request(app, loop):
+    return lambda: loop.run_until_complete(app(dict(SCOPE), receive, send))
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def make_noop_request(app):
+    # the route table is read from scope["app"], as Starlette sets it
+    scope = dict(SCOPE, app=make_app(False))
+
+    def request():
+        try:
+            app(scope, receive, send).send(None)
+        except StopIteration:
+            pass
+    return request
+
+
+def benchmarks() -> dict:
+    loop = asyncio.new_event_loop()
+    return {
+        "ASGI no-op": make_noop_request(noop_app),
+        "ASGI no-op + metrics": make_noop_request(MetricsMiddleware(noop_app, metrics=RequestMetrics())),
+        "ASGI GET /items/{id}": make_request(make_app(False), loop),
+        "ASGI GET /items/{id} + metrics": make_request(make_app(True), loop),
+    }
+
+
+def main():
+    results = {name: measure(fn, repeat=15) for name, fn in benchmarks().items()}
+    for name, seconds in results.items():
+        print(f"{name:40} {seconds * 1e6:8.1f} us")
+    for name in ("ASGI no-op", "ASGI GET /items/{id}"):
+        overhead = results[f"{name} + metrics"] - results[name]
+        print(f"{'overhead on ' + name:40} {overhead * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare encoding a cached schedule with encode_schedule_json against the former response_model
+route, which validated every row into LoanScheduleRowPublic before encoding it.
+
+    python -m app.benchmarks.serialization
+"""
+import asyncio
+from decimal import Decimal
+
+from fastapi import FastAPI, Response
+from pydantic import TypeAdapter
+
+from app.amortization_calculator import calc_amortization_schedule
+from app.api.routes.loans import encode_schedule_json
+from app.benchmarks.__main__ import measure
+from app.benchmarks.metrics import SCOPE, receive, send
+from app.models import LoanScheduleRowPublic
+
+
+TERMS = (360, 1200)
+
+
+def make_app(schedule) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/response-model", response_model=list[LoanScheduleRowPublic])
+    async def response_model():
+        return schedule
+
+    @app.get("/encoded", response_model=list[LoanScheduleRowPublic])
+    async def encoded():
+        return Response(encode_schedule_json(schedule), media_type="application/json")
+
+    return app
+
+
+def make_request(app, loop, path):
+    scope = dict(SCOPE, path=path, raw_path=path.encode())
+    return lambda: loop.run_until_complete(app(dict(scope), receive, send))
+
+
+def benchmarks() -> dict:
+    loop = asyncio.new_event_loop()
+    response_model = TypeAdapter(list[LoanScheduleRowPublic])
+    result = {}
+    for term in TERMS:
+        schedule = calc_amortization_schedule(Decimal("200000.00"), Decimal("0.0647"), term)
+        app = make_app(schedule)
+        result[f"validate + dump_json[{term}]"] = \
+            lambda schedule=schedule: response_model.dump_json(response_model.validate_python(schedule))
+        result[f"encode_schedule_json[{term}]"] = lambda schedule=schedule: encode_schedule_json(schedule)
+        result[f"ASGI GET response_model[{term}]"] = make_request(app, loop, "/response-model")
+        result[f"ASGI GET encoded[{term}]"] = make_request(app, loop, "/encoded")
+    return result
+
+
+def main():
+    for name, fn in benchmarks().items():
+        print(f"{name:40} {measure(fn) * 1e6:10.1f} us", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Import time of the calculator and of the app, and cold start time of the app up to answering
+its first request, each in a fresh interpreter.
+
+    python -m app.benchmarks.startup
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from app.benchmarks.__main__ import measure
+
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Modules that should only be imported once they are needed
+LAZY_MODULES = ("passlib", "bcrypt", "jwt", "numpy")
+
+IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"import": time.perf_counter() - start,
+                  "modules": sorted(set(sys.modules) & set({heavy!r}))}}))
+"""
+
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+from app.main import app
+imported = time.perf_counter()
+with TestClient(app) as client:
+    assert client.get("/api/v1/loans/").status_code == 401
+    started = time.perf_counter()
+print(json.dumps({{"import": imported - start, "cold_start": started - start,
+                  "modules": sorted(set(sys.modules) & set({heavy!r}))}}))
+"""
+
+
+def run_python(code: str, database_url: str | None = None) -> dict:
+    env = dict(os.environ)
+    if database_url is not None:
+        env["DATABASE_URL"] = database_url
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def import_module(module: str, heavy=LAZY_MODULES + ("sqlalchemy", "fastapi"), database_url=None) -> dict:
+    return run_python(IMPORT.format(module=module, heavy=heavy), database_url)
+
+
+def cold_start(database_url: str | None = None) -> dict:
+    return run_python(COLD_START.format(heavy=LAZY_MODULES), database_url)
+
+
+def benchmarks() -> dict:
+    directory = tempfile.mkdtemp()
+    existing = f"sqlite:///{directory}/existing.db"
+    cold_start(existing)
+
+    def cold_start_new():
+        database = Path(directory, "new.db")
+        database.unlink(missing_ok=True)
+        cold_start(f"sqlite:///{database}")
+
+    return {
+        "python -c pass": lambda: subprocess.run([sys.executable, "-c", "pass"], check=True),
+        "import app.amortization_calculator": lambda: import_module("app.amortization_calculator"),
+        "import app.main": lambda: import_module("app.main"),
+        "cold start, new database": cold_start_new,
+        "cold start, existing database": lambda: cold_start(existing),
+    }
+
+
+def main():
+    for name, fn in benchmarks().items():
+        print(f"{name:40} {measure(fn, repeat=3) * 1000:8.1f} ms", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import secrets
+from typing import Literal
 
 from pydantic_settings import BaseSettings #, SettingsConfigDict
 
@@ -11,9 +12,45 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # SQLAlchemy database URL; e.g. sqlite:///loans.db for a file-backed database in WAL mode.
+    # The async engine uses ASYNC_DATABASE_URL, derived from it for SQLite when unset
+    DATABASE_URL: str = "sqlite:///file:loans?mode=memory&cache=shared&uri=true"
+    ASYNC_DATABASE_URL: str | None = None
+    # Connection pool of each engine. In-memory SQLite keeps a single connection per engine instead,
+    # requests take turns on the async one
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
     EMAIL_TEST_USER: str = "test@example.com"
     FIRST_SUPERUSER: str = "admin"
     FIRST_SUPERUSER_PASSWORD: str = "ok"
+    # bcrypt cost factor, existing hashes are rehashed on login when it changes
+    BCRYPT_ROUNDS: int = 12
+    # Dedicated password hashing threads and how many requests may wait for them before 503
+    PASSWORD_HASHING_WORKERS: int = 2
+    PASSWORD_HASHING_QUEUE_LIMIT: int = 32
+    # Maximum number of loans accepted by a single bulk creation request
+    LOAN_BULK_MAX_ITEMS: int = 10000
+    # Schedules shared across loans with identical terms
+    SCHEDULE_CACHE_MAX_ENTRIES: int = 1024
+    SCHEDULE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Windows of uncached schedules are recalculated from balances kept every this many months
+    SCHEDULE_CHECKPOINT_INTERVAL: int = 12
+    # Amortization arithmetic, both engines give identical results and "integer" is faster
+    AMORTIZATION_ENGINE: Literal["integer", "decimal"] = "integer"
+    # Verified access tokens and the users they resolve to
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 60
+    # Store each loan's schedule at creation and serve schedules and summaries from it
+    MATERIALIZE_SCHEDULES: bool = False
+    # Cache-Control of schedule and summary responses. They carry strong ETags, and no-cache lets
+    # browsers and CDNs store them while revalidating every reuse, which checks access to the loan
+    LOAN_RESPONSE_CACHE_CONTROL: str = "public, no-cache"
+    # Per-route request metrics in Prometheus format at /metrics
+    METRICS_ENABLED: bool = True
+    # Superusers may profile a request by sending an X-Profile header, the latest reports are kept
+    REQUEST_PROFILING_ENABLED: bool = True
+    PROFILES_MAX_STORED: int = 32
 
 
 settings = Settings()  # type: ignore
@@ -1,5 +1,8 @@
-from sqlalchemy.pool import StaticPool
-from sqlmodel import Session, create_engine, select
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
 
 from app import crud
 from app.core.config import settings
@@ -7,12 +10,16 @@ from app.models import User, UserCreate, Loan, LoanShare
 
 
 def init_db(session: Session) -> None:
-    from sqlmodel import SQLModel
+    """
+    Create missing tables and the first superuser, only checking for them once both exist.
+    """
+    bind = session.get_bind()
     # This works because the models are already imported and registered from app.models
-    SQLModel.metadata.create_all(engine)
+    if not set(SQLModel.metadata.tables) <= set(inspect(bind).get_table_names()):
+        SQLModel.metadata.create_all(bind)
 
     user = session.exec(
-        select(User).where(User.email == settings.FIRST_SUPERUSER)
+        select(User.id).where(User.email == settings.FIRST_SUPERUSER)
     ).first()
     if not user:
         user_in = UserCreate(
@@ -23,8 +30,73 @@ def init_db(session: Session) -> None:
         user = crud.create_user(session=session, user_create=user_in)
 
 
-# engine = create_engine("sqlite:///database.db")
-engine = create_engine("sqlite://",
-                       connect_args={"check_same_thread": False},
-                       poolclass=StaticPool)
-init_db(Session(engine))
+# Applied to every new connection of a file-backed SQLite database. WAL lets readers run
+# concurrently with each other and with a writer; synchronous=NORMAL only syncs at checkpoints
+# in WAL mode, which can lose the last transactions on power loss but never corrupts the database.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+
+def is_sqlite_memory(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory")
+
+
+def async_database_url(url: str) -> URL:
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        raise ValueError("ASYNC_DATABASE_URL must be set for databases other than SQLite")
+    return url.set(drivername="sqlite+aiosqlite")
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def engine_options(url) -> dict:
+    if is_sqlite_memory(url):
+        # A named, shared-cache in-memory database is visible to both the sync and the async engine.
+        # The sync engine's single static connection keeps it alive for the lifetime of the process,
+        # see make_async_engine for the async one.
+        return {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+    options = {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW,
+               "pool_timeout": settings.DB_POOL_TIMEOUT}
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def make_engine(url: str | URL):
+    engine = create_engine(url, **engine_options(url))
+    if make_url(url).get_backend_name() == "sqlite" and not is_sqlite_memory(url):
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+def make_async_engine(url: str | URL):
+    options = engine_options(url)
+    options.pop("connect_args", None)
+    if options.get("poolclass") is StaticPool:
+        # aiosqlite connections run in a thread of their own, so they are pooled even in memory, but
+        # connections to a shared-cache database lock whole tables without waiting for busy_timeout:
+        # requests take turns on a single connection rather than failing with "database table is locked"
+        options.update(poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0,
+                       pool_timeout=settings.DB_POOL_TIMEOUT)
+    async_engine = create_async_engine(url, **options)
+    if make_url(url).get_backend_name() == "sqlite" and not is_sqlite_memory(url):
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    return async_engine
+
+
+engine = make_engine(settings.DATABASE_URL)
+async_engine = make_async_engine(settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL))
@@ -0,0 +1,136 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from fastapi.routing import iter_route_contexts
+
+
+# Prometheus client default latency buckets, in seconds
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+UNMATCHED_ROUTE = "unmatched"
+
+# Methods clients may make up, like paths, are labelled as one so they add no time series
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH"))
+OTHER_METHOD = "other"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * (n_buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class RequestMetrics:
+    """
+    Request counts, in-flight gauges and latency histograms per method, route template and status.
+
+    Updated from the event loop only, so no locking; each worker process keeps its own.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.in_flight = defaultdict(int)
+        self.histograms = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, status)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(len(self.buckets))
+        histogram.counts[bisect_left(self.buckets, seconds)] += 1
+        histogram.sum += seconds
+        histogram.count += 1
+
+    def clear(self) -> None:
+        self.in_flight.clear()
+        self.histograms.clear()
+
+    def render(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP http_requests_total Total HTTP requests by route template and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), histogram in sorted(self.histograms.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} '
+                         f'{histogram.count}')
+        lines += [
+            "# HELP http_requests_in_flight HTTP requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+        ]
+        for (method, route), value in sorted(self.in_flight.items()):
+            lines.append(f'http_requests_in_flight{{method="{method}",route="{route}"}} {value}')
+        lines += [
+            "# HELP http_request_duration_seconds HTTP request latency by route template and status.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), histogram in sorted(self.histograms.items()):
+            labels = f'method="{method}",route="{route}",status="{status}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), histogram.counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+def route_templates(app) -> list:
+    """
+    The (path regex, path template) of every route, with included router prefixes applied.
+    """
+    return [(route.path_regex, route.path) for route in iter_route_contexts(app.routes)
+            if getattr(route, "path_regex", None) is not None]
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request into RequestMetrics,
+    labelled by route template (e.g. /api/v1/loans/{id}/schedule) rather than path.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+        self.routes = None
+
+    def route_template(self, scope) -> str:
+        if self.routes is None:
+            self.routes = route_templates(scope["app"])
+        path = scope["path"]
+        for path_regex, template in self.routes:
+            if path_regex.match(path):
+                return template
+        return UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"] if scope["method"] in HTTP_METHODS else OTHER_METHOD
+        route = self.route_template(scope)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = self.metrics.in_flight
+        in_flight[method, route] += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight[method, route] -= 1
+            self.metrics.observe(method, route, status, time.perf_counter() - start)
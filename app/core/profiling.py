@@ -0,0 +1,201 @@
+import cProfile
+import pstats
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette import concurrency
+
+from app.core.config import settings
+
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+CATEGORIES = ("amortization_calculator", "sqlalchemy", "pydantic", "other")
+
+
+def category(filename: str, name: str) -> str:
+    """
+    The part of the stack a profiled function belongs to, builtins being classified by their owner.
+    """
+    if filename.endswith("/app/amortization_calculator.py"):
+        return "amortization_calculator"
+    # SQLModel's model construction is pydantic validation, the rest of it wraps SQLAlchemy
+    if ("/pydantic/" in filename or "/pydantic_core/" in filename or "pydantic_core." in name
+            or filename.endswith("/sqlmodel/_compat.py")):
+        return "pydantic"
+    if "/sqlalchemy/" in filename or "/sqlmodel/" in filename or "sqlite3." in name:
+        return "sqlalchemy"
+    return "other"
+
+
+class RequestProfile:
+    """
+    cProfile profilers of one request, one for the event loop thread
+    and one for each call offloaded to a worker thread.
+
+    Up to Python 3.11 profilers are per thread. From 3.12 on they are interpreter-wide and only
+    one can be active, so the event loop thread's profiler covers worker threads by itself.
+    """
+
+    def __init__(self):
+        self.profilers = []
+
+    def profiler(self) -> cProfile.Profile | None:
+        """
+        Start a new profiler, None when another one is active.
+        """
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None
+        self.profilers.append(profiler)
+        return profiler
+
+    def run(self, fn, *args):
+        profiler = self.profiler()
+        if profiler is None:
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            profiler.disable()
+
+    def report(self, top: int = 30) -> dict:
+        stats = pstats.Stats(*self.profilers)
+        breakdown = dict.fromkeys(CATEGORIES, 0.0)
+        functions = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            breakdown[category(filename, name)] += tottime
+            functions.append({
+                "function": pstats.func_std_string((filename, line, name)),
+                "calls": calls,
+                "tottime": tottime,
+                "cumtime": cumtime,
+            })
+        functions.sort(key=lambda f: f["tottime"], reverse=True)
+        return {"profiled_seconds": stats.total_tt, "breakdown": breakdown, "top_functions": functions[:top]}
+
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+
+
+async def run_in_threadpool(fn, *args):
+    """
+    Starlette's run_in_threadpool, profiling the call in the worker thread
+    when the current request is being profiled.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return await concurrency.run_in_threadpool(fn, *args)
+    return await concurrency.run_in_threadpool(profile.run, fn, *args)
+
+
+class ProfileStore:
+    """
+    Thread-safe store of the most recent request profile reports.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, id: str) -> dict | None:
+        with self._lock:
+            return self._entries.get(id)
+
+    def put(self, id: str, report: dict) -> None:
+        with self._lock:
+            self._entries[id] = report
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+profile_store = ProfileStore(settings.PROFILES_MAX_STORED)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests that carry an X-Profile header, for superusers only.
+    The report is stored under the id returned in the X-Profile-Id response header.
+    Requests without the header pass straight through.
+
+    `authorize` is awaited with the request's Authorization header and raises HTTPException
+    when the caller may not profile. Only one request is profiled at a time; since the event loop
+    thread is profiled as a whole, work of concurrent requests may show up in the report.
+    """
+
+    def __init__(self, app, authorize, store: ProfileStore = profile_store):
+        self.app = app
+        self.authorize = authorize
+        self.store = store
+        self._lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        for name, _ in scope["headers"]:
+            if name == PROFILE_HEADER:
+                break
+        else:
+            await self.app(scope, receive, send)
+            return
+        authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+        try:
+            await self.authorize(authorization)
+        except HTTPException as exc:
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+            await response(scope, receive, send)
+            return
+        if not self._lock.acquire(blocking=False):
+            response = JSONResponse({"detail": "Another request is being profiled"}, status_code=409)
+            await response(scope, receive, send)
+            return
+        try:
+            await self.profile(scope, receive, send)
+        finally:
+            self._lock.release()
+
+    async def profile(self, scope, receive, send):
+        id = uuid.uuid4().hex
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, id.encode())]
+            await send(message)
+
+        profile = RequestProfile()
+        start = time.perf_counter()
+        profiler = profile.profiler()
+        if profiler is None:
+            response = JSONResponse({"detail": "Another profiling tool is active"}, status_code=409)
+            await response(scope, receive, send)
+            return
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            wall_seconds = time.perf_counter() - start
+            current_profile.reset(token)
+            report = {"id": id, "method": scope["method"], "path": scope["path"], "status": status,
+                      "wall_seconds": wall_seconds, **profile.report()}
+            self.store.put(id, report)
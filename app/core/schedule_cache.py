@@ -0,0 +1,161 @@
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from decimal import Decimal
+
+from app.amortization_calculator import (
+    Schedule, ScheduleCheckpoints, calc_amortization_schedule, calc_schedule_checkpoints, reamortize_schedule
+)
+from app.core.config import settings
+
+
+def schedule_key(principal_amount, annual_interest_rate, number_of_months, rate_changes=None):
+    """
+    Normalize loan terms so that e.g. 200000 and 200000.00 share a cache entry.
+    Balances carry the amount's exponent once it is finer than a cent, so that is kept.
+    Rate changes of adjustable-rate loans are only part of their keys.
+    """
+    amount = Decimal(principal_amount)
+    key = (amount.normalize(), min(amount.as_tuple().exponent, -2),
+           Decimal(annual_interest_rate).normalize(),
+           int(number_of_months))
+    if rate_changes:
+        key += (tuple((int(month), Decimal(rate).normalize()) for month, rate in sorted(rate_changes.items())),)
+    return key
+
+
+def estimate_schedule_nbytes(schedule) -> int:
+    if isinstance(schedule, ScheduleCheckpoints):
+        return sys.getsizeof(schedule)
+    if isinstance(schedule, Schedule):
+        # with room for the two prefix sum columns it builds on first use
+        return sys.getsizeof(schedule) + 2 * (sys.getsizeof(array('q')) + 8 * (len(schedule) + 1))
+    nbytes = sys.getsizeof(schedule)
+    for row in schedule:
+        nbytes += sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row.values())
+    return nbytes
+
+
+class ScheduleCache:
+    """
+    Thread-safe LRU cache of amortization schedules keyed by normalized loan terms,
+    bounded both by number of entries and by an estimate of their size in bytes.
+    Windows of schedules are served from checkpoints, cached alongside, when the full schedule is not.
+    A rate change of an adjustable-rate loan recalculates only the tail of its cached schedule.
+
+    Cached schedules are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, engine: str = 'integer', checkpoint_interval: int = 12):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.engine = engine
+        self.checkpoint_interval = checkpoint_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, principal_amount, annual_interest_rate, number_of_months, rate_changes=None):
+        return self._get(schedule_key(principal_amount, annual_interest_rate, number_of_months, rate_changes))
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, principal_amount, annual_interest_rate, number_of_months, schedule, rate_changes=None) -> None:
+        self._put(schedule_key(principal_amount, annual_interest_rate, number_of_months, rate_changes), schedule)
+
+    def _put(self, key, schedule) -> None:
+        nbytes = estimate_schedule_nbytes(schedule)
+        if self.max_entries <= 0 or nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = (schedule, nbytes)
+            self.nbytes += nbytes
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+                self.evictions += 1
+
+    def get_schedule(self, principal_amount, annual_interest_rate, number_of_months, rate_changes=None):
+        """
+        Return the cached schedule for the given loan terms, calculating it on a miss.
+        """
+        schedule = self.get(principal_amount, annual_interest_rate, number_of_months, rate_changes)
+        if schedule is None:
+            schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months,
+                                                  self.engine, rate_changes)
+            self.put(principal_amount, annual_interest_rate, number_of_months, schedule, rate_changes)
+        return schedule
+
+    def get_window(self, principal_amount, annual_interest_rate, number_of_months, start, end, rate_changes=None):
+        """
+        Return months start to end of the schedule for the given loan terms: a slice of the
+        cached schedule, or else recalculated from the loan's cached checkpoints.
+        Adjustable-rate loans have no checkpoints, their windows are slices of the full schedule.
+        """
+        schedule = self.get(principal_amount, annual_interest_rate, number_of_months, rate_changes)
+        if schedule is None and self.engine == 'integer' and not rate_changes:
+            key = (*schedule_key(principal_amount, annual_interest_rate, number_of_months), 'checkpoints')
+            checkpoints = self._get(key)
+            if checkpoints is None:
+                checkpoints = calc_schedule_checkpoints(principal_amount, annual_interest_rate, number_of_months,
+                                                        self.checkpoint_interval)
+                if checkpoints is not None:
+                    self._put(key, checkpoints)
+            if checkpoints is not None:
+                return checkpoints.window(start, end)
+        if schedule is None:
+            schedule = self.get_schedule(principal_amount, annual_interest_rate, number_of_months, rate_changes)
+        return schedule[start - 1:end]
+
+    def reamortize(self, principal_amount, annual_interest_rate, number_of_months, old_rate_changes,
+                   rate_changes, month):
+        """
+        Cache the schedule of an adjustable-rate loan after its rate changes in `month`, from old_rate_changes
+        to rate_changes, recalculating only the months from then on of the cached schedule before.
+        Returns the new schedule, or None when the schedule before is not cached.
+        """
+        schedule = self.get(principal_amount, annual_interest_rate, number_of_months, old_rate_changes)
+        if not isinstance(schedule, Schedule) or self.engine != 'integer':
+            return None
+        schedule = reamortize_schedule(schedule, principal_amount, annual_interest_rate, rate_changes, month)
+        self.put(principal_amount, annual_interest_rate, number_of_months, schedule, rate_changes)
+        return schedule
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'nbytes': self.nbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+schedule_cache = ScheduleCache(max_entries=settings.SCHEDULE_CACHE_MAX_ENTRIES,
+                               max_bytes=settings.SCHEDULE_CACHE_MAX_BYTES,
+                               engine=settings.AMORTIZATION_ENGINE,
+                               checkpoint_interval=settings.SCHEDULE_CHECKPOINT_INTERVAL)
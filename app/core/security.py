@@ -1,18 +1,32 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Any
 
-import jwt
-from passlib.context import CryptContext
-
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+@functools.cache
+def get_pwd_context():
+    # passlib is only imported once a password is hashed or verified, keeping it out of startup.
+    # Hashes with any other cost are upgraded (or downgraded) on the next successful login
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+        bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+    )
 
 
 ALGORITHM = "HS256"
 
 
 def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
+    import jwt
     expire = datetime.utcnow() + expires_delta
     to_encode = {"exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
@@ -20,8 +34,56 @@ def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verify a password, also returning a new hash if the stored one uses outdated settings.
+    """
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHashingBusy(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    Thread pool that rejects work instead of queueing it without bound.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, thread_name_prefix: str = ""):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def submit(self, fn, /, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+# bcrypt is deliberately slow, keep it off the threadpool shared with the other routes
+password_hashing_executor = BoundedExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS,
+    max_pending=settings.PASSWORD_HASHING_QUEUE_LIMIT,
+    thread_name_prefix="password-hashing",
+)
+
+
+async def run_password_hashing(fn, /, *args):
+    """
+    Run a password hashing function on the dedicated executor.
+    Raises PasswordHashingBusy when its queue is full.
+    """
+    return await asyncio.wrap_future(password_hashing_executor.submit(fn, *args))
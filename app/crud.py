@@ -1,9 +1,15 @@
+from decimal import Decimal
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlmodel import Session, delete, insert, select
 
-from app.models import User, UserCreate, UserUpdate, Loan, LoanCreate, LoanShare
-from app.core.security import get_password_hash, verify_password
+from app.amortization_calculator import iter_amortization_schedule
+from app.models import (
+    User, UserCreate, UserUpdate, Loan, LoanCreate, LoanShare, LoanScheduleRow, LoanRateChange, LoanRateChangeIn
+)
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_and_update_password
+from app.core.token_cache import token_cache
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -27,6 +33,8 @@ def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
+    if "password" in user_data or "is_active" in user_data:
+        token_cache.invalidate_user(db_user.id)
     return db_user
 
 
@@ -40,19 +48,44 @@ def authenticate(*, session: Session, email: str, password: str) -> User | None:
     db_user = get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    verified, new_hash = verify_and_update_password(password, db_user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        session.commit()
     return db_user
 
 
 def create_loan(*, session: Session, loan_in: LoanCreate, owner_id: int) -> Loan:
     db_item = Loan.model_validate(loan_in, update={"owner_id": owner_id})
     session.add(db_item)
+    if settings.MATERIALIZE_SCHEDULES:
+        session.flush()
+        create_loan_schedule(session=session, loan=db_item)
     session.commit()
     session.refresh(db_item)
     return db_item
 
 
+def create_loans(*, session: Session, loans_in: list[LoanCreate], owner_id: int) -> list[int]:
+    """
+    Insert many loans with a single executemany in one transaction, returning their ids in order.
+    """
+    if not loans_in:
+        return []
+    rows = [loan_in.model_dump() | {"owner_id": owner_id} for loan_in in loans_in]
+    statement = insert(Loan).returning(Loan.id, sort_by_parameter_order=True)
+    ids = session.exec(statement, params=rows).scalars().all()
+    if settings.MATERIALIZE_SCHEDULES:
+        schedule_rows = [row for id, loan_in in zip(ids, loans_in)
+                         for row in loan_schedule_rows(Loan.model_validate(loan_in, update={"id": id}))]
+        session.exec(insert(LoanScheduleRow), params=schedule_rows)
+    session.commit()
+    return ids
+
+
 def create_loan_share(*, session: Session, loan_id: int, user_id: int):
     statement = select(LoanShare).where(LoanShare.loan_id == loan_id, LoanShare.user_id == user_id)
     loan_share = session.exec(statement).first()
@@ -63,3 +96,90 @@ def create_loan_share(*, session: Session, loan_id: int, user_id: int):
     session.commit()
     session.refresh(db_item)
     return db_item
+
+
+def loan_schedule_rows(loan: Loan, rate_changes: dict | None = None,
+                       previous: LoanScheduleRow | None = None) -> list[dict]:
+    """
+    The loan's schedule rows to insert, only those after the `previous` stored row when given,
+    which is followed by a rate change.
+    """
+    rows = []
+    start, balance, aggregate_interest_paid = 1, None, 0
+    if previous is not None:
+        start, balance, aggregate_interest_paid = \
+            previous.month + 1, previous.remaining_balance, previous.aggregate_interest_paid
+    for row in iter_amortization_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term, rate_changes,
+                                          start, balance):
+        aggregate_interest_paid += row['monthly_accrued_interest']
+        rows.append(dict(row, loan_id=loan.id, aggregate_interest_paid=aggregate_interest_paid))
+    return rows
+
+
+def create_loan_schedule(*, session: Session, loan: Loan, rate_changes: dict | None = None) -> None:
+    """
+    Insert the loan's schedule rows, the caller is responsible for committing.
+    """
+    session.execute(insert(LoanScheduleRow), loan_schedule_rows(loan, rate_changes))
+
+
+def get_loan_rate_changes(*, session: Session, loan_id: int) -> dict[int, Decimal]:
+    statement = select(LoanRateChange.month, LoanRateChange.annual_interest_rate) \
+        .where(LoanRateChange.loan_id == loan_id).order_by(LoanRateChange.month)
+    return dict(session.exec(statement).all())
+
+
+def set_loan_rate_change(*, session: Session, loan: Loan, rate_change_in: LoanRateChangeIn) -> dict[int, Decimal]:
+    """
+    Change the loan's rate from a month on, returning all its rate changes.
+    A materialized schedule is recalculated from that month on, from the stored balance the month before.
+    """
+    session.merge(LoanRateChange.model_validate(rate_change_in, update={"loan_id": loan.id}))
+    rate_changes = get_loan_rate_changes(session=session, loan_id=loan.id)
+    month = rate_change_in.month
+    if settings.MATERIALIZE_SCHEDULES:
+        previous = get_loan_schedule_row(session=session, loan_id=loan.id, month=month - 1)
+        if previous is not None or month == 1:
+            session.exec(delete(LoanScheduleRow).where(LoanScheduleRow.loan_id == loan.id,
+                                                       LoanScheduleRow.month >= month))
+            session.execute(insert(LoanScheduleRow), loan_schedule_rows(loan, rate_changes, previous))
+    session.commit()
+    return rate_changes
+
+
+def get_loan_schedule(*, session: Session, loan_id: int, start: int = 1, end: int | None = None) -> list[dict] | None:
+    statement = select(LoanScheduleRow.month, LoanScheduleRow.monthly_payment,
+                       LoanScheduleRow.monthly_accrued_interest, LoanScheduleRow.remaining_balance) \
+        .where(LoanScheduleRow.loan_id == loan_id, LoanScheduleRow.month >= start).order_by(LoanScheduleRow.month)
+    if end is not None:
+        statement = statement.where(LoanScheduleRow.month <= end)
+    rows = [dict(row) for row in session.execute(statement).mappings()]
+    return rows or None
+
+
+def get_loan_schedule_row(*, session: Session, loan_id: int, month: int) -> LoanScheduleRow | None:
+    return session.get(LoanScheduleRow, (loan_id, month))
+
+
+def backfill_loan_schedules(*, session: Session, chunk_size: int = 100) -> int:
+    """
+    Materialize schedules of loans that have none, committing every chunk_size loans.
+    Returns the number of loans backfilled.
+    """
+    has_schedule = select(LoanScheduleRow.loan_id).where(LoanScheduleRow.loan_id == Loan.id).exists()
+    count = 0
+    last_id = 0
+    while True:
+        statement = select(Loan).where(Loan.id > last_id, ~has_schedule).order_by(Loan.id).limit(chunk_size)
+        loans = session.exec(statement).all()
+        if not loans:
+            return count
+        statement = select(LoanRateChange).where(LoanRateChange.loan_id.in_([loan.id for loan in loans]))
+        rate_changes = {}
+        for rate_change in session.exec(statement):
+            rate_changes.setdefault(rate_change.loan_id, {})[rate_change.month] = rate_change.annual_interest_rate
+        for loan in loans:
+            create_loan_schedule(session=session, loan=loan, rate_changes=rate_changes.get(loan.id))
+        last_id = loans[-1].id
+        session.commit()
+        count += len(loans)
@@ -0,0 +1,159 @@
+"""
+AsyncSession counterparts of app.crud, used by the API routes.
+Password hashing is CPU bound and runs on its own bounded executor to keep the event loop
+and the shared threadpool free, see security.run_password_hashing.
+Materialized schedule rows are calculated in the threadpool.
+"""
+from decimal import Decimal
+from typing import Any
+
+from sqlmodel import delete, insert, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.crud import loan_schedule_rows
+from app.models import (
+    User, UserCreate, UserUpdate, Loan, LoanCreate, LoanShare, LoanScheduleRow, LoanRateChange, LoanRateChangeIn
+)
+from app.core.config import settings
+from app.core.profiling import run_in_threadpool
+from app.core.security import get_password_hash, run_password_hashing, verify_and_update_password
+from app.core.token_cache import token_cache
+
+
+async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
+    hashed_password = await run_password_hashing(get_password_hash, user_create.password)
+    db_obj = User.model_validate(user_create, update={"hashed_password": hashed_password})
+    session.add(db_obj)
+    await session.commit()
+    await session.refresh(db_obj)
+    return db_obj
+
+
+async def update_user(*, session: AsyncSession, db_user: User, user_in: UserUpdate) -> Any:
+    user_data = user_in.model_dump(exclude_unset=True)
+    extra_data = {}
+    if "password" in user_data:
+        password = user_data["password"]
+        hashed_password = await run_password_hashing(get_password_hash, password)
+        extra_data["hashed_password"] = hashed_password
+    db_user.sqlmodel_update(user_data, update=extra_data)
+    session.add(db_user)
+    await session.commit()
+    await session.refresh(db_user)
+    if "password" in user_data or "is_active" in user_data:
+        token_cache.invalidate_user(db_user.id)
+    return db_user
+
+
+async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
+    statement = select(User).where(User.email == email)
+    session_user = (await session.exec(statement)).first()
+    return session_user
+
+
+async def authenticate(*, session: AsyncSession, email: str, password: str) -> User | None:
+    db_user = await get_user_by_email(session=session, email=email)
+    if not db_user:
+        return None
+    # end the read transaction so the pooled connection isn't held while hashing
+    await session.commit()
+    verified, new_hash = await run_password_hashing(verify_and_update_password, password, db_user.hashed_password)
+    if not verified:
+        return None
+    if new_hash:
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        await session.commit()
+    return db_user
+
+
+async def create_loan(*, session: AsyncSession, loan_in: LoanCreate, owner_id: int) -> Loan:
+    db_item = Loan.model_validate(loan_in, update={"owner_id": owner_id})
+    session.add(db_item)
+    if settings.MATERIALIZE_SCHEDULES:
+        await session.flush()
+        await create_loan_schedule(session=session, loan=db_item)
+    await session.commit()
+    await session.refresh(db_item)
+    return db_item
+
+
+async def create_loans(*, session: AsyncSession, loans_in: list[LoanCreate], owner_id: int) -> list[int]:
+    """
+    Insert many loans with a single executemany in one transaction, returning their ids in order.
+    """
+    if not loans_in:
+        return []
+    rows = [loan_in.model_dump() | {"owner_id": owner_id} for loan_in in loans_in]
+    statement = insert(Loan).returning(Loan.id, sort_by_parameter_order=True)
+    ids = (await session.exec(statement, params=rows)).scalars().all()
+    if settings.MATERIALIZE_SCHEDULES:
+        schedule_rows = await run_in_threadpool(bulk_loan_schedule_rows, ids, loans_in)
+        await session.exec(insert(LoanScheduleRow), params=schedule_rows)
+    await session.commit()
+    return ids
+
+
+def bulk_loan_schedule_rows(ids: list[int], loans_in: list[LoanCreate]) -> list[dict]:
+    return [row for id, loan_in in zip(ids, loans_in)
+            for row in loan_schedule_rows(Loan.model_validate(loan_in, update={"id": id}))]
+
+
+async def create_loan_share(*, session: AsyncSession, loan_id: int, user_id: int):
+    statement = select(LoanShare).where(LoanShare.loan_id == loan_id, LoanShare.user_id == user_id)
+    loan_share = (await session.exec(statement)).first()
+    if loan_share:
+        return loan_share
+    db_item = LoanShare(loan_id=loan_id, user_id=user_id)
+    session.add(db_item)
+    await session.commit()
+    await session.refresh(db_item)
+    return db_item
+
+
+async def create_loan_schedule(*, session: AsyncSession, loan: Loan) -> None:
+    """
+    Insert the loan's schedule rows, the caller is responsible for committing.
+    """
+    await session.exec(insert(LoanScheduleRow), params=await run_in_threadpool(loan_schedule_rows, loan))
+
+
+async def get_loan_schedule(*, session: AsyncSession, loan_id: int,
+                            start: int = 1, end: int | None = None) -> list[dict] | None:
+    statement = select(LoanScheduleRow.month, LoanScheduleRow.monthly_payment,
+                       LoanScheduleRow.monthly_accrued_interest, LoanScheduleRow.remaining_balance) \
+        .where(LoanScheduleRow.loan_id == loan_id, LoanScheduleRow.month >= start).order_by(LoanScheduleRow.month)
+    if end is not None:
+        statement = statement.where(LoanScheduleRow.month <= end)
+    rows = [dict(row._mapping) for row in await session.exec(statement)]
+    return rows or None
+
+
+async def get_loan_schedule_row(*, session: AsyncSession, loan_id: int, month: int) -> LoanScheduleRow | None:
+    return await session.get(LoanScheduleRow, (loan_id, month))
+
+
+async def get_loan_rate_changes(*, session: AsyncSession, loan_id: int) -> dict[int, Decimal]:
+    statement = select(LoanRateChange.month, LoanRateChange.annual_interest_rate) \
+        .where(LoanRateChange.loan_id == loan_id).order_by(LoanRateChange.month)
+    return dict((await session.exec(statement)).all())
+
+
+async def set_loan_rate_change(*, session: AsyncSession, loan: Loan,
+                               rate_change_in: LoanRateChangeIn) -> dict[int, Decimal]:
+    """
+    Change the loan's rate from a month on, returning all its rate changes.
+    A materialized schedule is recalculated from that month on, from the stored balance the month before.
+    """
+    await session.merge(LoanRateChange.model_validate(rate_change_in, update={"loan_id": loan.id}))
+    rate_changes = await get_loan_rate_changes(session=session, loan_id=loan.id)
+    month = rate_change_in.month
+    if settings.MATERIALIZE_SCHEDULES:
+        previous = await get_loan_schedule_row(session=session, loan_id=loan.id, month=month - 1)
+        if previous is not None or month == 1:
+            await session.exec(delete(LoanScheduleRow).where(LoanScheduleRow.loan_id == loan.id,
+                                                             LoanScheduleRow.month >= month))
+            rows = await run_in_threadpool(loan_schedule_rows, loan, rate_changes, previous)
+            await session.exec(insert(LoanScheduleRow), params=rows)
+    await session.commit()
+    return rate_changes
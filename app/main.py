@@ -1,10 +1,43 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlmodel import Session
+
+from app.api.deps import authorize_profiling
 from app.api.main import api_router
 from app.core.config import settings
+from app.core.db import engine, init_db
+from app.core.metrics import MetricsMiddleware, request_metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.security import PasswordHashingBusy
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with Session(engine) as session:
+        init_db(session)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 
-app = FastAPI()
+@app.exception_handler(PasswordHashingBusy)
+def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, try again later"},
+                        headers={"Retry-After": "1"})
 
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+
+if settings.REQUEST_PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, authorize=authorize_profiling)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(request_metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,5 +1,5 @@
 from decimal import Decimal
-from sqlmodel import Field, Relationship, SQLModel
+from sqlmodel import Field, Index, Relationship, SQLModel
 
 
 # Shared properties
@@ -25,7 +25,8 @@ class UserUpdate(UserBase):
 
 class LoanShare(SQLModel, table=True):
     loan_id: int | None = Field(default=None, foreign_key="loan.id", primary_key=True)
-    user_id: int | None = Field(default=None, foreign_key="user.id", primary_key=True)
+    # loan_id lookups use the primary key, user_id lookups (loans shared with a user) this index
+    user_id: int | None = Field(default=None, foreign_key="user.id", primary_key=True, index=True)
 
 
 # Database model, database table inferred from class name
@@ -52,10 +53,15 @@ class LoanCreate(LoanBase):
 
 
 class Loan(LoanBase, table=True):
+    # keyset pagination of a user's loans walks this index
+    __table_args__ = (Index("ix_loan_owner_id_id", "owner_id", "id"),)
+
     id: int | None = Field(default=None, primary_key=True)
     owner_id: int | None = Field(default=None, foreign_key="user.id", nullable=False)
     owner: User | None = Relationship(back_populates="loans")
     shared_users: list[User] = Relationship(back_populates="shared_loans", link_model=LoanShare)
+    # loaded along with the loan by the API, see deps.get_accessible_loan
+    rate_changes: list["LoanRateChange"] = Relationship(sa_relationship_kwargs={"order_by": "LoanRateChange.month"})
 
 
 # Properties to return via API, id is always required
@@ -66,7 +72,54 @@ class LoanPublic(LoanBase):
 
 class LoansPublic(SQLModel):
     data: list[LoanPublic]
-    count: int
+    # total number of loans, None when not requested
+    count: int | None = None
+    # pass as cursor to fetch the next page, None on the last page
+    next_cursor: str | None = None
+
+
+class LoanBulkError(SQLModel):
+    # position of the rejected item in the request
+    index: int
+    errors: list[dict]
+
+
+class LoansBulkCreated(SQLModel):
+    # ids of the created loans, in request order
+    ids: list[int]
+    errors: list[LoanBulkError] = []
+
+
+# Rate resets of adjustable-rate loans, the annual interest rate from the month on
+class LoanRateChange(SQLModel, table=True):
+    loan_id: int = Field(foreign_key="loan.id", primary_key=True)
+    month: int = Field(primary_key=True)
+    annual_interest_rate: Decimal = Field(ge=0)
+
+
+class LoanRateChangeIn(SQLModel):
+    month: int = Field(gt=0, le=12*100)
+    annual_interest_rate: Decimal = Field(ge=0)
+
+
+class LoanRateChangePublic(LoanRateChangeIn):
+    pass
+
+
+# Materialized schedule, one row per loan month, see Settings.MATERIALIZE_SCHEDULES
+class LoanScheduleRow(SQLModel, table=True):
+    loan_id: int = Field(foreign_key="loan.id", primary_key=True)
+    month: int = Field(primary_key=True)
+    monthly_payment: Decimal = Field(decimal_places=2)
+    monthly_accrued_interest: Decimal = Field(decimal_places=2)
+    remaining_balance: Decimal = Field(decimal_places=2)
+    aggregate_interest_paid: Decimal = Field(decimal_places=2)
+
+
+class LoanScheduleRowPublic(SQLModel):
+    month: int
+    monthly_payment: Decimal
+    remaining_balance: Decimal
 
 
 # JSON payload containing access token
@@ -0,0 +1,298 @@
+"""
+Calculate schedules or summaries of the loans in a CSV or NDJSON file across a process pool.
+
+    python -m app.score_loans loans.csv out/ [--summary-month M] [--workers N] [--chunk-size N]
+                              [--input-format csv|ndjson] [--output-format ndjson|csv]
+
+Loans state every field of LoanCreate, optionally an `id` copied to the output and, in NDJSON,
+`rate_changes` mapping months to annual interest rates. Every --chunk-size loans are written to
+their own file in the output directory, invalid loans and those failing to calculate, e.g. on
+extreme rates, to an .errors.ndjson file alongside.
+Finished chunks are kept when the same run is started again, so an interrupted run resumes.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from decimal import Decimal
+from itertools import islice
+
+from pydantic import ValidationError
+
+from app.amortization_calculator import (
+    ROW_KEYS, Schedule, calc_amortization_schedule, calc_monthly_summary_from_schedule, format_cents
+)
+from app.core.config import settings
+from app.models import LoanCreate, LoanRateChangeIn
+
+
+SUMMARY_KEYS = ('remaining_balance', 'aggregate_interest_paid', 'aggregate_principal_paid')
+# LoanCreate defaults them, input records must state them
+LOAN_KEYS = ('amount', 'annual_interest_rate', 'loan_term')
+MANIFEST = "run.json"
+
+
+def iter_records(path: str, input_format: str):
+    """
+    Loans of the input file, as raw lines for NDJSON (parsed by the workers) and dicts for CSV.
+    """
+    with open(path, newline="" if input_format == "csv" else None) as f:
+        if input_format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            yield from (line for line in f if line.strip())
+
+
+def iter_chunks(records, chunk_size: int):
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        yield chunk
+
+
+def chunk_path(output_dir: str, chunk: int, output_format: str) -> str:
+    return os.path.join(output_dir, f"chunk-{chunk:06d}.{output_format}")
+
+
+def parse_loan(record) -> tuple:
+    """
+    The id, LoanCreate and rate changes of an input record, raising ValidationError or ValueError.
+    """
+    if isinstance(record, str):
+        record = json.loads(record)
+        if not isinstance(record, dict):
+            raise ValueError("Expected a loan object")
+    missing = [key for key in LOAN_KEYS if record.get(key) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    loan = LoanCreate.model_validate(record)
+    rate_changes = {}
+    if not isinstance(record.get("rate_changes") or {}, dict):
+        raise ValueError("Expected rate_changes to map months to rates")
+    for month, rate in (record.get("rate_changes") or {}).items():
+        rate_change = LoanRateChangeIn.model_validate({"month": month, "annual_interest_rate": rate})
+        if rate_change.month > loan.loan_term:
+            raise ValueError("month number exceeds loan term")
+        rate_changes[rate_change.month] = rate_change.annual_interest_rate
+    # an empty CSV cell is no id, unlike 0
+    id = record.get("id")
+    return None if id == "" else id, loan, rate_changes
+
+
+def calc_summaries(loans: list, month: int) -> list[dict | ArithmeticError]:
+    """
+    Summaries of the (id, loan, rate changes) at the month, or their last one, or the error calculating them.
+    Fixed-rate loans are summarized together with the batch engine, one by one should a loan fail.
+    """
+    # numpy is imported on first use, the schedule mode does not need it
+    from app.amortization_batch import calc_monthly_summaries_batch
+    summaries = [None] * len(loans)
+
+    def summarize_batch(fixed):
+        batch = calc_monthly_summaries_batch([loans[k][1].amount for k in fixed],
+                                             [loans[k][1].annual_interest_rate for k in fixed],
+                                             [loans[k][1].loan_term for k in fixed], month)
+        for position, k in enumerate(fixed):
+            summaries[k] = {key: format_cents(int(batch[key][position])) for key in SUMMARY_KEYS}
+
+    fixed = [k for k, (_, _, rate_changes) in enumerate(loans) if not rate_changes]
+    try:
+        if fixed:
+            summarize_batch(fixed)
+    except ArithmeticError:
+        for k in fixed:
+            try:
+                summarize_batch([k])
+            except ArithmeticError as exc:
+                summaries[k] = exc
+    for k, (_, loan, rate_changes) in enumerate(loans):
+        if rate_changes:
+            try:
+                schedule = calc_amortization_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term,
+                                                      settings.AMORTIZATION_ENGINE, rate_changes)
+                summary = calc_monthly_summary_from_schedule(schedule, loan.amount, min(month, loan.loan_term))
+                summaries[k] = {key: format_cents(int(Decimal(summary[key]).scaleb(2))) for key in SUMMARY_KEYS}
+            except ArithmeticError as exc:
+                summaries[k] = exc
+    return summaries
+
+
+def schedule_columns(loan, rate_changes) -> list[list[str]]:
+    schedule = calc_amortization_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term,
+                                          settings.AMORTIZATION_ENGINE, rate_changes)
+    if isinstance(schedule, Schedule):
+        return [schedule.format_column(key) for key in ROW_KEYS]
+    return [[str(row[key]) for row in schedule] for key in ROW_KEYS]
+
+
+def calculation_error(index: int, exc: ArithmeticError) -> dict:
+    # Decimal's errors hold their signals rather than a message
+    return {"index": index, "errors": [{"msg": f"calculation failed: {type(exc).__name__}"}]}
+
+
+def write_results(f, output_format: str, indexes: list[int], loans: list, summary_month: int | None) -> list[dict]:
+    """
+    Write the results of the loans, returning the errors of those failing to calculate.
+    """
+    errors = []
+    if output_format == "csv":
+        writer = csv.writer(f)
+        keys = SUMMARY_KEYS if summary_month is not None else ROW_KEYS
+        writer.writerow(("index", "id", *keys))
+    if summary_month is not None:
+        for index, (id, _, _), summary in zip(indexes, loans, calc_summaries(loans, summary_month)):
+            if isinstance(summary, ArithmeticError):
+                errors.append(calculation_error(index, summary))
+            elif output_format == "csv":
+                writer.writerow((index, "" if id is None else id, *summary.values()))
+            else:
+                f.write(json.dumps({"index": index, **({"id": id} if id is not None else {}), **summary},
+                                   separators=(",", ":")) + "\n")
+        return errors
+    for index, (id, loan, rate_changes) in zip(indexes, loans):
+        try:
+            columns = schedule_columns(loan, rate_changes)
+        except ArithmeticError as exc:
+            errors.append(calculation_error(index, exc))
+            continue
+        if output_format == "csv":
+            id = "" if id is None else id
+            writer.writerows((index, id, *row) for row in zip(*columns))
+        else:
+            rows = ",".join(
+                f'{{"month":{month},"monthly_payment":"{payment}","monthly_accrued_interest":"{interest}",'
+                f'"remaining_balance":"{balance}"}}'
+                for month, payment, interest, balance in zip(*columns)
+            )
+            id = "" if id is None else f',"id":{json.dumps(id)}'
+            f.write(f'{{"index":{index}{id},"schedule":[{rows}]}}\n')
+    return errors
+
+
+def score_chunk(output_dir: str, chunk: int, first_index: int, records: list, output_format: str,
+                summary_month: int | None) -> tuple[int, int, int]:
+    """
+    Write the results of a chunk of loans, returning the chunk, its number of loans and of invalid ones,
+    those failing to calculate included. The chunk's file is renamed into place once complete, which marks
+    the chunk done.
+    """
+    indexes, loans, errors = [], [], []
+    for index, record in enumerate(records, first_index):
+        try:
+            loans.append(parse_loan(record))
+            indexes.append(index)
+        except ValidationError as exc:
+            errors.append({"index": index, "errors": exc.errors(include_url=False, include_context=False)})
+        except ValueError as exc:
+            errors.append({"index": index, "errors": [{"msg": str(exc)}]})
+    path = chunk_path(output_dir, chunk, output_format)
+    with open(path + ".tmp", "w", newline="") as f:
+        errors += write_results(f, output_format, indexes, loans, summary_month)
+    errors.sort(key=lambda error: error["index"])
+    errors_path = os.path.join(output_dir, f"chunk-{chunk:06d}.errors.ndjson")
+    if errors:
+        with open(errors_path, "w") as f:
+            f.writelines(json.dumps(error, default=str, separators=(",", ":")) + "\n" for error in errors)
+    elif os.path.exists(errors_path):
+        os.remove(errors_path)
+    os.replace(path + ".tmp", path)
+    return chunk, len(records), len(errors)
+
+
+def check_manifest(output_dir: str, run: dict) -> None:
+    """
+    Record the run in the output directory, or check a run being resumed there is the same.
+    """
+    path = os.path.join(output_dir, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            if json.load(f) != run:
+                raise ValueError(f"{output_dir} holds the output of a different run, see {MANIFEST}")
+        return
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+
+
+def score_loans(input_path: str, output_dir: str, input_format: str = "csv", output_format: str = "ndjson",
+                summary_month: int | None = None, workers: int = 1, chunk_size: int = 1000, log=None) -> dict:
+    """
+    Score the loans of the input file into chunk files in output_dir, skipping chunks already written.
+    At most two chunks per worker are in flight, bounding memory regardless of the file's size.
+    Returns the number of loans scored in this run, those skipped as done before, invalid ones and loans/sec.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stat = os.stat(input_path)
+    check_manifest(output_dir, {
+        "input": os.path.abspath(input_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+        "input_format": input_format, "output_format": output_format, "summary_month": summary_month,
+        "chunk_size": chunk_size, "engine": settings.AMORTIZATION_ENGINE,
+    })
+    stats = {"loans": 0, "skipped": 0, "invalid": 0}
+    start = time.perf_counter()
+
+    def iter_tasks():
+        records = iter_records(input_path, input_format)
+        for chunk, chunk_records in enumerate(iter_chunks(records, chunk_size)):
+            if os.path.exists(chunk_path(output_dir, chunk, output_format)):
+                stats["skipped"] += len(chunk_records)
+                continue
+            yield output_dir, chunk, chunk * chunk_size, chunk_records, output_format, summary_month
+
+    def done(chunk, count, invalid):
+        stats["loans"] += count
+        stats["invalid"] += invalid
+        if log is not None:
+            elapsed = time.perf_counter() - start
+            print(f"chunk {chunk}: {stats['loans']} loans, {stats['loans'] / elapsed:,.0f} loans/s",
+                  file=log, flush=True)
+
+    tasks = iter_tasks()
+    if workers <= 1:
+        for task in tasks:
+            done(*score_chunk(*task))
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            pending = set()
+            for task in tasks:
+                if len(pending) >= 2 * workers:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done(*future.result())
+                pending.add(executor.submit(score_chunk, *task))
+            for future in wait(pending).done:
+                done(*future.result())
+    elapsed = time.perf_counter() - start
+    return {**stats, "seconds": elapsed, "loans_per_second": stats["loans"] / elapsed if elapsed else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="CSV or NDJSON file of loans")
+    parser.add_argument("output_dir", help="directory of the chunk files, resumed if it holds the same run")
+    parser.add_argument("--input-format", choices=("csv", "ndjson"),
+                        help="default from the input's extension, .csv or else NDJSON")
+    parser.add_argument("--output-format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--summary-month", type=int,
+                        help="write summaries at this month (the last one for shorter loans) instead of schedules")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes, default one per CPU")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="loans per chunk file")
+    args = parser.parse_args(argv)
+    if args.summary_month is not None and args.summary_month <= 0:
+        parser.error("--summary-month must be positive")
+    if args.chunk_size <= 0:
+        parser.error("--chunk-size must be positive")
+    input_format = args.input_format or ("csv" if args.input.lower().endswith(".csv") else "ndjson")
+    try:
+        stats = score_loans(args.input, args.output_dir, input_format, args.output_format, args.summary_month,
+                            args.workers, args.chunk_size, log=sys.stderr)
+    except ValueError as exc:
+        parser.exit(2, f"{parser.prog}: error: {exc}\n")
+    print(f"scored {stats['loans']} loans ({stats['invalid']} invalid) in {stats['seconds']:.2f} s, "
+          f"{stats['loans_per_second']:,.0f} loans/s; {stats['skipped']} loans done before")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
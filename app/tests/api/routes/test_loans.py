@@ -1,11 +1,23 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
+import pytest
+from pydantic import TypeAdapter
 from sqlmodel import Session
 from fastapi.testclient import TestClient
 
+from app import crud, crud_async
+from app.amortization_calculator import calc_amortization_schedule, simulate_extra_payments
+from app.api.routes.loans import LoanSimulation, encode_schedule_json, encode_simulation_json
 from app.core.config import settings
+from app.core.db import async_engine
+from app.core.schedule_cache import schedule_cache
+from app.models import LoanRateChangeIn, LoanScheduleRowPublic
 from app.tests.utils.loan import create_loan
 from app.tests.utils.user import create_random_user, authentication_token_from_email
+from app.tests.utils.utils import count_queries
 
 
 def test_create_loan(client: TestClient, superuser_token_headers: dict[str, str]):
@@ -308,3 +320,592 @@ def test_can_fetch_shared_loan_summary(client, normal_user_token_headers, db):
         headers=authentication_token_from_email(client=client, db=db, email=user.email),
     )
     assert response.status_code == 200
+
+
+def test_fetch_loan_summary_from_cached_schedule(client, superuser_token_headers, db):
+    loan = create_loan(db, amount="123456.78", annual_interest_rate="0.0423", loan_term=15*12)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}/summary?month=100"
+    uncached = client.get(url, headers=superuser_token_headers)
+    response = client.get(f"{settings.API_V1_STR}/loans/{loan.id}/schedule", headers=superuser_token_headers)
+    assert response.status_code == 200
+    cached = client.get(url, headers=superuser_token_headers)
+    assert cached.status_code == 200
+    assert cached.json() == uncached.json()
+
+
+def test_fetch_loan_schedule_ndjson(client, superuser_token_headers, db):
+    loan = create_loan(db, amount="250000.00", annual_interest_rate="0.0599", loan_term=30*12)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}/schedule"
+    expected = client.get(url, headers=superuser_token_headers).json()
+    response = client.get(url, headers={**superuser_token_headers, "Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+
+def test_fetch_loan_schedule_window(client, superuser_token_headers, db):
+    schedule_cache.clear()
+    loan = create_loan(db, amount="250000.00", annual_interest_rate="0.0599", loan_term=30*12)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}/schedule"
+    window = client.get(f"{url}?start=240&end=252", headers=superuser_token_headers)
+    assert window.status_code == 200
+    # recalculated from checkpoints without building the whole schedule
+    assert schedule_cache.get(loan.amount, loan.annual_interest_rate, loan.loan_term) is None
+    schedule = client.get(url, headers=superuser_token_headers).json()
+    assert window.json() == schedule[239:252]
+    assert client.get(f"{url}?start=355", headers=superuser_token_headers).json() == schedule[354:]
+    assert client.get(f"{url}?end=3", headers=superuser_token_headers).json() == schedule[:3]
+    ndjson = client.get(f"{url}?start=240&end=252",
+                        headers={**superuser_token_headers, "Accept": "application/x-ndjson"})
+    assert [json.loads(line) for line in ndjson.text.splitlines()] == schedule[239:252]
+    assert window.headers["ETag"] != client.get(url, headers=superuser_token_headers).headers["ETag"]
+    assert client.get(f"{url}?start=1&end=360", headers=superuser_token_headers).headers["ETag"] == \
+        client.get(url, headers=superuser_token_headers).headers["ETag"]
+
+
+@pytest.mark.parametrize("query", ["start=0", "end=361", "start=20&end=10"])
+def test_fetch_loan_schedule_invalid_window(client, superuser_token_headers, db, query):
+    loan = create_loan(db, amount="250000.00", annual_interest_rate="0.0599", loan_term=30*12)
+    response = client.get(f"{settings.API_V1_STR}/loans/{loan.id}/schedule?{query}", headers=superuser_token_headers)
+    assert response.status_code == 422
+
+
+def test_fetch_loan_schedule_csv(client, superuser_token_headers, db):
+    loan = create_loan(db, amount="1000.00", annual_interest_rate="0", loan_term=3)
+    response = client.get(
+        f"{settings.API_V1_STR}/loans/{loan.id}/schedule",
+        headers={**superuser_token_headers, "Accept": "text/csv"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines() == [
+        "month,monthly_payment,remaining_balance",
+        "1,333.33,666.67",
+        "2,333.33,333.34",
+        "3,333.34,0",
+    ]
+
+
+def test_fetch_loan_schedule_streaming_not_enough_permissions(client, normal_user_token_headers, db):
+    loan = create_loan(db, amount=10, annual_interest_rate=0, loan_term=12)
+    response = client.get(
+        f"{settings.API_V1_STR}/loans/{loan.id}/schedule",
+        headers={**normal_user_token_headers, "Accept": "application/x-ndjson"},
+    )
+    assert response.status_code == 404
+
+
+def test_fetch_portfolio_summary(client, db):
+    owner = create_random_user(db)
+    user = create_random_user(db)
+    loans = [
+        create_loan(db, user=user, amount="200000.00", annual_interest_rate=".0657", loan_term=30*12),
+        create_loan(db, user=user, amount="1000.00", annual_interest_rate="0", loan_term=3),
+        create_loan(db, user=owner, amount="30000.00", annual_interest_rate="0.03", loan_term=48),
+    ]
+    create_loan(db, user=owner, amount="5000.00", annual_interest_rate="0.03", loan_term=12)
+    crud.create_loan_share(session=db, loan_id=loans[2].id, user_id=user.id)
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    response = client.get(f"{settings.API_V1_STR}/loans/portfolio/summary?month=12", headers=headers)
+    assert response.status_code == 200
+    content = response.json()
+    assert content['month'] == 12
+    assert content['count'] == 3
+    assert [r['loan_id'] for r in content['data']] == [loan.id for loan in loans]
+    for row, loan in zip(content['data'], loans):
+        expected = client.get(
+            f"{settings.API_V1_STR}/loans/{loan.id}/summary?month={min(12, loan.loan_term)}", headers=headers
+        ).json()
+        for key, value in expected.items():
+            assert Decimal(row[key]) == Decimal(value)
+    for key in ('remaining_balance', 'aggregate_interest_paid', 'aggregate_principal_paid'):
+        assert Decimal(content[key]) == sum(Decimal(r[key]) for r in content['data'])
+
+
+def test_fetch_portfolio_summary_loan_too_large_for_int64(client, db):
+    user = create_random_user(db)
+    loans = [create_loan(db, user=user, amount="100000000000000000.00", annual_interest_rate="0.05", loan_term=24),
+             create_loan(db, user=user, amount="1000.00", annual_interest_rate="0", loan_term=3)]
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    response = client.get(f"{settings.API_V1_STR}/loans/portfolio/summary?month=12", headers=headers)
+    assert response.status_code == 200
+    for row, loan in zip(response.json()['data'], loans):
+        expected = client.get(
+            f"{settings.API_V1_STR}/loans/{loan.id}/summary?month={min(12, loan.loan_term)}", headers=headers
+        ).json()
+        assert {key: Decimal(row[key]) for key in expected} == {key: Decimal(v) for key, v in expected.items()}
+
+
+def test_fetch_portfolio_summary_no_loans(client, db):
+    user = create_random_user(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/loans/portfolio/summary?month=1",
+        headers=authentication_token_from_email(client=client, email=user.email, db=db),
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content['count'] == 0
+    assert Decimal(content['remaining_balance']) == 0
+
+
+def test_fetch_portfolio_summary_month_zero_is_invalid(client, superuser_token_headers):
+    response = client.get(f"{settings.API_V1_STR}/loans/portfolio/summary?month=0", headers=superuser_token_headers)
+    assert response.status_code == 422
+
+
+def test_fetch_materialized_loan_schedule_and_summary(client, superuser_token_headers, db, monkeypatch):
+    data = {"amount": "500000.00", "annual_interest_rate": "0.07", "loan_term": 30*12}
+    loan = create_loan(db, **data)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}"
+    schedule = client.get(f"{url}/schedule", headers=superuser_token_headers).json()
+    summary = client.get(f"{url}/summary?month=120", headers=superuser_token_headers).json()
+    monkeypatch.setattr(settings, "MATERIALIZE_SCHEDULES", True)
+    crud.backfill_loan_schedules(session=db)
+    materialized_schedule = client.get(f"{url}/schedule", headers=superuser_token_headers).json()
+    materialized_summary = client.get(f"{url}/summary?month=120", headers=superuser_token_headers).json()
+    assert [{k: Decimal(str(v)) for k, v in r.items()} for r in materialized_schedule] == \
+        [{k: Decimal(str(v)) for k, v in r.items()} for r in schedule]
+    assert {k: Decimal(v) for k, v in materialized_summary.items()} == {k: Decimal(v) for k, v in summary.items()}
+    materialized_window = client.get(f"{url}/schedule?start=100&end=110", headers=superuser_token_headers).json()
+    assert materialized_window == materialized_schedule[99:110]
+
+
+def test_concurrent_reads_and_writes(client, superuser_token_headers, db):
+    loan = create_loan(db, amount="30000.00", annual_interest_rate="0.03", loan_term=48)
+    url = f"{settings.API_V1_STR}/loans/"
+
+    def request(k):
+        if k % 2:
+            return client.get(f"{url}{loan.id}/summary?month={k % 48 + 1}", headers=superuser_token_headers)
+        return client.post(url, headers=superuser_token_headers,
+                           json={"amount": "1000.00", "annual_interest_rate": "0.05", "loan_term": 12})
+
+    with ThreadPoolExecutor(32) as executor:
+        responses = list(executor.map(request, range(400)))
+    assert [response.status_code for response in responses] == [200] * 400
+
+
+def test_create_loan_materializes_schedule(client, superuser_token_headers, db, monkeypatch):
+    monkeypatch.setattr(settings, "MATERIALIZE_SCHEDULES", True)
+    data = {"amount": "1000.00", "annual_interest_rate": "0", "loan_term": 3}
+    response = client.post(f"{settings.API_V1_STR}/loans/", headers=superuser_token_headers, json=data)
+    assert response.status_code == 200
+    rows = crud.get_loan_schedule(session=db, loan_id=response.json()["id"])
+    assert [r['remaining_balance'] for r in rows] == [Decimal('666.67'), Decimal('333.34'), 0]
+
+
+def loan_queries(statements):
+    return [s for s in statements if "FROM loan" in s]
+
+
+def test_fetch_shared_loan_queries_do_not_grow_with_shares(client, db):
+    owner = create_random_user(db)
+    loan = create_loan(db, user=owner, amount=1000, annual_interest_rate=0, loan_term=12)
+    user = create_random_user(db)
+    crud.create_loan_share(session=db, loan_id=loan.id, user_id=user.id)
+    headers = authentication_token_from_email(client=client, db=db, email=user.email)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}"
+    with count_queries(async_engine.sync_engine) as few_shares:
+        assert client.get(f"{url}/summary?month=1", headers=headers).status_code == 200
+    for _ in range(20):
+        crud.create_loan_share(session=db, loan_id=loan.id, user_id=create_random_user(db).id)
+    with count_queries(async_engine.sync_engine) as many_shares:
+        assert client.get(f"{url}/summary?month=1", headers=headers).status_code == 200
+    with count_queries(async_engine.sync_engine) as schedule:
+        assert client.get(f"{url}/schedule", headers=headers).status_code == 200
+    # the loan and its access check are a single statement
+    assert len(loan_queries(few_shares)) == len(loan_queries(many_shares)) == len(loan_queries(schedule)) == 1
+    assert len(many_shares) <= 2
+
+
+def test_fetch_loan_not_shared_access_check_is_single_query(client, normal_user_token_headers, db):
+    loan = create_loan(db, amount=10, annual_interest_rate=0, loan_term=12)
+    with count_queries(async_engine.sync_engine) as statements:
+        response = client.get(
+            f"{settings.API_V1_STR}/loans/{loan.id}/schedule",
+            headers=normal_user_token_headers,
+        )
+    assert response.status_code == 404
+    assert len(loan_queries(statements)) == 1
+
+
+def test_fetch_loans_keyset_pagination(client, db):
+    user = create_random_user(db)
+    loans = [create_loan(db, user=user, amount=1, annual_interest_rate=0, loan_term=n) for n in range(1, 6)]
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = client.get(f"{settings.API_V1_STR}/loans/", headers=headers, params=params)
+        assert response.status_code == 200
+        content = response.json()
+        assert content['count'] == 5
+        pages.append([r['id'] for r in content['data']])
+        cursor = content['next_cursor']
+        if cursor is None:
+            break
+    assert pages == [[loans[0].id, loans[1].id], [loans[2].id, loans[3].id], [loans[4].id]]
+
+
+def test_fetch_loans_last_full_page_has_no_cursor(client, db):
+    user = create_random_user(db)
+    for n in range(1, 3):
+        create_loan(db, user=user, amount=1, annual_interest_rate=0, loan_term=n)
+    response = client.get(
+        f"{settings.API_V1_STR}/loans/?limit=2",
+        headers=authentication_token_from_email(client=client, email=user.email, db=db),
+    )
+    assert response.json()['next_cursor'] is None
+
+
+def test_fetch_loans_without_count(client, db):
+    user = create_random_user(db)
+    create_loan(db, user=user, amount=1, annual_interest_rate=0, loan_term=1)
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    with count_queries(async_engine.sync_engine) as statements:
+        response = client.get(f"{settings.API_V1_STR}/loans/?include_count=false", headers=headers)
+    assert response.status_code == 200
+    assert response.json()['count'] is None
+    assert not [s for s in statements if "count(" in s]
+
+
+def test_fetch_loans_invalid_cursor(client, normal_user_token_headers):
+    response = client.get(f"{settings.API_V1_STR}/loans/?cursor=not-a-cursor", headers=normal_user_token_headers)
+    assert response.status_code == 422
+
+
+def test_create_loans_bulk(client, db):
+    user = create_random_user(db)
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    data = [{"amount": "1000.00", "annual_interest_rate": "0.05", "loan_term": n} for n in range(1, 4)]
+    response = client.post(f"{settings.API_V1_STR}/loans/bulk", headers=headers, json=data)
+    assert response.status_code == 200
+    content = response.json()
+    assert content["errors"] == []
+    assert len(content["ids"]) == 3
+    loans = client.get(f"{settings.API_V1_STR}/loans/", headers=headers).json()["data"]
+    assert [(r["id"], r["loan_term"]) for r in loans] == list(zip(content["ids"], [1, 2, 3]))
+
+
+def test_materialized_schedule_rows_are_calculated_off_the_event_loop(client, superuser_token_headers, db,
+                                                                      monkeypatch):
+    monkeypatch.setattr(settings, "MATERIALIZE_SCHEDULES", True)
+    on_event_loop = []
+
+    def loan_schedule_rows(*args):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return crud.loan_schedule_rows(*args)
+
+    monkeypatch.setattr(crud_async, "loan_schedule_rows", loan_schedule_rows)
+    data = {"amount": "1000.00", "annual_interest_rate": "0.05", "loan_term": 12}
+    loan_id = client.post(f"{settings.API_V1_STR}/loans/", headers=superuser_token_headers, json=data).json()["id"]
+    client.post(f"{settings.API_V1_STR}/loans/bulk", headers=superuser_token_headers, json=[data, data])
+    client.post(f"{settings.API_V1_STR}/loans/{loan_id}/rate-changes", headers=superuser_token_headers,
+                json={"month": 6, "annual_interest_rate": "0.06"})
+    assert on_event_loop == [False] * 4
+
+
+def test_create_loans_bulk_ndjson(client, superuser_token_headers):
+    body = '{"amount": "1000.00", "annual_interest_rate": "0", "loan_term": 12}\n' * 2
+    response = client.post(
+        f"{settings.API_V1_STR}/loans/bulk",
+        headers={**superuser_token_headers, "Content-Type": "application/x-ndjson"},
+        content=body,
+    )
+    assert response.status_code == 200
+    assert len(response.json()["ids"]) == 2
+
+
+def test_create_loans_bulk_rejects_invalid_items(client, db):
+    user = create_random_user(db)
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    data = [{"amount": "1000.00", "loan_term": 12}, {"amount": "0.00", "loan_term": 12}]
+    response = client.post(f"{settings.API_V1_STR}/loans/bulk", headers=headers, json=data)
+    assert response.status_code == 422
+    assert [e["index"] for e in response.json()["detail"]] == [1]
+    assert client.get(f"{settings.API_V1_STR}/loans/", headers=headers).json()["count"] == 0
+
+
+def test_create_loans_bulk_reports_invalid_items(client, db):
+    user = create_random_user(db)
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    data = [{"amount": "1000.00", "loan_term": 12}, {"amount": "1.00", "loan_term": 0}, {"amount": "2.00"}]
+    response = client.post(f"{settings.API_V1_STR}/loans/bulk?errors=report", headers=headers, json=data)
+    assert response.status_code == 200
+    content = response.json()
+    assert len(content["ids"]) == 2
+    assert [e["index"] for e in content["errors"]] == [1]
+    assert content["errors"][0]["errors"][0]["loc"] == ["loan_term"]
+
+
+def test_create_loans_bulk_max_items(client, superuser_token_headers, monkeypatch):
+    monkeypatch.setattr(settings, "LOAN_BULK_MAX_ITEMS", 2)
+    response = client.post(f"{settings.API_V1_STR}/loans/bulk", headers=superuser_token_headers, json=[{}] * 3)
+    assert response.status_code == 413
+
+
+def test_create_loans_bulk_malformed(client, superuser_token_headers):
+    response = client.post(
+        f"{settings.API_V1_STR}/loans/bulk",
+        headers={**superuser_token_headers, "Content-Type": "application/json"},
+        content="[{",
+    )
+    assert response.status_code == 422
+
+
+def test_fetch_loan_schedule_etag(client, superuser_token_headers, db):
+    schedule_cache.clear()
+    loan = create_loan(db, amount="250000.00", annual_interest_rate="0.0599", loan_term=30*12)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}/schedule"
+    response = client.get(url, headers={**superuser_token_headers, "If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == settings.LOAN_RESPONSE_CACHE_CONTROL
+    assert response.headers["Vary"] == "Accept"
+    schedule_cache.clear()
+    not_modified = client.get(url, headers={**superuser_token_headers, "If-None-Match": f'"stale", {etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    # answered before anything is calculated
+    assert len(schedule_cache) == 0
+    csv = client.get(url, headers={**superuser_token_headers, "Accept": "text/csv"})
+    assert csv.headers["ETag"] != etag
+    assert client.get(url, headers={**superuser_token_headers, "Accept": "text/csv",
+                                    "If-None-Match": csv.headers["ETag"]}).status_code == 304
+
+
+def test_fetch_loan_schedule_etag_shared_by_equivalent_loans(client, superuser_token_headers, db):
+    url = f"{settings.API_V1_STR}/loans/{{}}/schedule"
+    first = client.get(url.format(create_loan(db, amount="1000", annual_interest_rate="0.05", loan_term=12).id),
+                       headers=superuser_token_headers)
+    second = client.get(url.format(create_loan(db, amount="1000.00", annual_interest_rate="0.050", loan_term=12).id),
+                        headers=superuser_token_headers)
+    other = client.get(url.format(create_loan(db, amount="1000.00", annual_interest_rate="0.05", loan_term=13).id),
+                       headers=superuser_token_headers)
+    assert first.headers["ETag"] == second.headers["ETag"] != other.headers["ETag"]
+    assert first.content == second.content
+
+
+@pytest.mark.parametrize("amount, annual_interest_rate, loan_term, rate_changes", [
+    ("1000.00", "0", 3, {}),
+    ("2259.00", "0", 20, {}),
+    ("500.00", "0.05", 1, {}),
+    ("30000.00", "0.03", 48, {48: "0.05"}),
+    ("200000.00", "0.0657", 360, {61: "0.08"}),
+])
+def test_materialized_responses_are_identical_to_calculated_ones(client, superuser_token_headers, db, monkeypatch,
+                                                                 amount, annual_interest_rate, loan_term,
+                                                                 rate_changes):
+    def create():
+        loan = create_loan(db, amount=amount, annual_interest_rate=annual_interest_rate, loan_term=loan_term)
+        for month, rate in rate_changes.items():
+            crud.set_loan_rate_change(session=db, loan=loan,
+                                      rate_change_in=LoanRateChangeIn(month=month, annual_interest_rate=rate))
+        return loan
+
+    def responses(loan):
+        url = f"{settings.API_V1_STR}/loans/{loan.id}"
+        schedule_cache.clear()
+        return [(response.content, response.headers["ETag"]) for response in (
+            client.get(f"{url}/schedule", headers=superuser_token_headers),
+            client.get(f"{url}/schedule", headers={**superuser_token_headers, "Accept": "text/csv"}),
+            client.get(f"{url}/schedule?start={loan_term}&end={loan_term}", headers=superuser_token_headers),
+            client.get(f"{url}/summary?month={loan_term}", headers=superuser_token_headers),
+            client.get(f"{url}/summary?month={max(1, loan_term - 1)}", headers=superuser_token_headers),
+        )]
+
+    calculated = create()
+    expected = responses(calculated)
+    monkeypatch.setattr(settings, "MATERIALIZE_SCHEDULES", True)
+    assert responses(create()) == expected
+    crud.backfill_loan_schedules(session=db)
+    assert responses(calculated) == expected
+
+
+def test_fetch_loan_summary_etag(client, superuser_token_headers, db):
+    loan = create_loan(db, loan_term=120)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}/summary"
+    response = client.get(f"{url}?month=12", headers=superuser_token_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == settings.LOAN_RESPONSE_CACHE_CONTROL
+    assert client.get(f"{url}?month=12", headers={**superuser_token_headers, "If-None-Match": etag}) \
+        .status_code == 304
+    response = client.get(f"{url}?month=13", headers={**superuser_token_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_fetch_loan_schedule_etag_not_enough_permissions(client, superuser_token_headers,
+                                                         normal_user_token_headers, db):
+    loan = create_loan(db)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}/schedule"
+    etag = client.get(url, headers=superuser_token_headers).headers["ETag"]
+    response = client.get(url, headers={**normal_user_token_headers, "If-None-Match": etag})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("amount,rate,term", [
+    ("1000.00", "0", 3), ("123456.78", "0.0423", 180), ("250000", "0.0599", 1200), ("0.01", "0.99", 7),
+])
+def test_encode_schedule_json_matches_response_model(amount, rate, term):
+    response_model = TypeAdapter(list[LoanScheduleRowPublic])
+    schedule = calc_amortization_schedule(Decimal(amount), Decimal(rate), term)
+    assert encode_schedule_json(schedule) == response_model.dump_json(response_model.validate_python(schedule))
+    stored = [{**row, "remaining_balance": row["remaining_balance"].quantize(Decimal("0.01"))} for row in schedule]
+    assert encode_schedule_json(stored) == response_model.dump_json(response_model.validate_python(stored))
+    assert encode_schedule_json([]) == b"[]"
+
+
+def test_simulate_loan_extra_payments(client, superuser_token_headers, db):
+    loan = create_loan(db, amount="250000.00", annual_interest_rate="0.0599", loan_term=30*12)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}"
+    schedule = client.get(f"{url}/schedule", headers=superuser_token_headers).json()
+    data = {"extra_payments": [{"month": 13, "amount": "10000.00"}, {"month": 13, "amount": "5000.00"}],
+            "recurring_extra_payment": "200.00", "recurring_from_month": 25}
+    response = client.post(f"{url}/simulate", headers=superuser_token_headers, json=data)
+    assert response.status_code == 200
+    simulation = response.json()
+    assert simulation["months_saved"] > 0
+    assert Decimal(simulation["interest_saved"]) > 0
+    assert len(simulation["schedule"]) == 30*12 - simulation["months_saved"]
+    assert simulation["schedule"][:12] == schedule[:12]
+    assert simulation["schedule"][-1]["remaining_balance"] == "0"
+    assert simulation["extra_payments"][0] == {"month": 13, "amount": "15000.00"}
+    # until the monthly payment alone pays off the rest
+    months = [p["month"] for p in simulation["extra_payments"][1:]]
+    assert months == list(range(25, months[-1] + 1))
+    assert months[-1] >= len(simulation["schedule"]) - 1
+
+
+def test_simulate_loan_without_extra_payments(client, superuser_token_headers, db):
+    loan = create_loan(db, amount="1000.00", annual_interest_rate="0.05", loan_term=12)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}"
+    response = client.post(f"{url}/simulate", headers=superuser_token_headers, json={})
+    assert response.status_code == 200
+    assert response.json() == {"months_saved": 0, "interest_saved": "0.00", "extra_payments": [],
+                               "schedule": client.get(f"{url}/schedule", headers=superuser_token_headers).json()}
+
+
+@pytest.mark.parametrize("data", [
+    {"extra_payments": [{"month": 13, "amount": "100.00"}]},
+    {"extra_payments": [{"month": 1, "amount": "0"}]},
+    {"extra_payments": [{"month": 1, "amount": "1.001"}]},
+    {"recurring_extra_payment": "100.00", "recurring_from_month": 13},
+])
+def test_simulate_loan_invalid(client, superuser_token_headers, db, data):
+    loan = create_loan(db, amount="1000.00", annual_interest_rate="0.05", loan_term=12)
+    response = client.post(f"{settings.API_V1_STR}/loans/{loan.id}/simulate", headers=superuser_token_headers,
+                           json=data)
+    assert response.status_code == 422
+
+
+def test_simulate_loan_not_enough_permissions(client, normal_user_token_headers, db):
+    loan = create_loan(db, amount="1000.00", annual_interest_rate="0.05", loan_term=12)
+    response = client.post(f"{settings.API_V1_STR}/loans/{loan.id}/simulate", headers=normal_user_token_headers,
+                           json={})
+    assert response.status_code == 404
+
+
+def test_encode_simulation_json_matches_response_model():
+    response_model = TypeAdapter(LoanSimulation)
+    schedule = calc_amortization_schedule(Decimal("123456.78"), Decimal("0.0423"), 180)
+    simulation = simulate_extra_payments(schedule, Decimal("123456.78"), Decimal("0.0423"),
+                                         {12: Decimal("100000.00"), 14: Decimal("50000.00")})
+    expected = {**simulation, "extra_payments": [{"month": month, "amount": amount}
+                                                 for month, amount in simulation["extra_payments"].items()]}
+    assert encode_simulation_json(simulation) == response_model.dump_json(response_model.validate_python(expected))
+
+
+def test_change_loan_rate(client, superuser_token_headers, db):
+    loan = create_loan(db, amount="200000.00", annual_interest_rate="0.05", loan_term=30*12)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}"
+    etag = client.get(f"{url}/schedule", headers=superuser_token_headers).headers["etag"]
+    for month, rate in [(121, "0.06"), (61, "0.07")]:
+        response = client.post(f"{url}/rate-changes", headers=superuser_token_headers,
+                                json={"month": month, "annual_interest_rate": rate})
+        assert response.status_code == 200
+    rate_changes = {61: Decimal("0.07"), 121: Decimal("0.06")}
+    assert [(r["month"], Decimal(r["annual_interest_rate"])) for r in response.json()] == list(rate_changes.items())
+    assert client.get(f"{url}/rate-changes", headers=superuser_token_headers).json() == response.json()
+    expected = calc_amortization_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term,
+                                          rate_changes=rate_changes)
+    response = client.get(f"{url}/schedule", headers=superuser_token_headers)
+    assert response.headers["etag"] != etag
+    assert response.content == encode_schedule_json(expected)
+    window = client.get(f"{url}/schedule?start=100&end=130", headers=superuser_token_headers)
+    assert window.content == encode_schedule_json(expected[99:130])
+    summary = client.get(f"{url}/summary?month=120", headers=superuser_token_headers).json()
+    assert Decimal(summary["remaining_balance"]) == expected[119]["remaining_balance"]
+    assert Decimal(summary["aggregate_interest_paid"]) == sum(r["monthly_accrued_interest"] for r in expected[:120])
+    data = {"extra_payments": [{"month": 90, "amount": "10000.00"}]}
+    simulation = client.post(f"{url}/simulate", headers=superuser_token_headers, json=data).json()
+    assert simulation["schedule"][:89] == json.loads(encode_schedule_json(expected[:89]))
+    assert simulation["months_saved"] == 0
+    assert Decimal(simulation["interest_saved"]) > 0
+
+
+def test_change_loan_rate_permissions(client, db):
+    owner = create_random_user(db)
+    user = create_random_user(db)
+    loan = create_loan(db, user=owner, amount="1000.00", annual_interest_rate="0.05", loan_term=12)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}/rate-changes"
+    data = {"month": 6, "annual_interest_rate": "0.06"}
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    assert client.post(url, headers=headers, json=data).status_code == 404
+    crud.create_loan_share(session=db, loan_id=loan.id, user_id=user.id)
+    assert client.post(url, headers=headers, json=data).status_code == 403
+    assert client.get(url, headers=headers).json() == []
+    owner_headers = authentication_token_from_email(client=client, email=owner.email, db=db)
+    assert client.post(url, headers=owner_headers, json=data).status_code == 200
+    assert [r["month"] for r in client.get(url, headers=headers).json()] == [6]
+
+
+@pytest.mark.parametrize("data", [
+    {"month": 13, "annual_interest_rate": "0.06"},
+    {"month": 0, "annual_interest_rate": "0.06"},
+    {"month": 6, "annual_interest_rate": "-0.01"},
+])
+def test_change_loan_rate_invalid(client, superuser_token_headers, db, data):
+    loan = create_loan(db, amount="1000.00", annual_interest_rate="0.05", loan_term=12)
+    response = client.post(f"{settings.API_V1_STR}/loans/{loan.id}/rate-changes", headers=superuser_token_headers,
+                           json=data)
+    assert response.status_code == 422
+
+
+def test_change_materialized_loan_rate(client, superuser_token_headers, db, monkeypatch):
+    monkeypatch.setattr(settings, "MATERIALIZE_SCHEDULES", True)
+    loan = create_loan(db, amount="30000.00", annual_interest_rate="0.03", loan_term=48)
+    url = f"{settings.API_V1_STR}/loans/{loan.id}"
+    response = client.post(f"{url}/rate-changes", headers=superuser_token_headers,
+                           json={"month": 25, "annual_interest_rate": "0.05"})
+    assert response.status_code == 200
+    expected = calc_amortization_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term,
+                                          rate_changes={25: Decimal("0.05")})
+    schedule = client.get(f"{url}/schedule", headers=superuser_token_headers).json()
+    assert [Decimal(r["remaining_balance"]) for r in schedule] == [r["remaining_balance"] for r in expected]
+    summary = client.get(f"{url}/summary?month=48", headers=superuser_token_headers).json()
+    assert Decimal(summary["aggregate_interest_paid"]) == sum(r["monthly_accrued_interest"] for r in expected)
+
+
+def test_fetch_portfolio_summary_adjustable_rate_loans(client, db):
+    user = create_random_user(db)
+    loans = [create_loan(db, user=user, amount="200000.00", annual_interest_rate=".0657", loan_term=30*12),
+             create_loan(db, user=user, amount="30000.00", annual_interest_rate="0.03", loan_term=12)]
+    for loan in loans:
+        crud.set_loan_rate_change(session=db, loan=loan,
+                                  rate_change_in=LoanRateChangeIn(month=6, annual_interest_rate="0.08"))
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    content = client.get(f"{settings.API_V1_STR}/loans/portfolio/summary?month=24", headers=headers).json()
+    for row, loan in zip(content['data'], loans):
+        expected = client.get(
+            f"{settings.API_V1_STR}/loans/{loan.id}/summary?month={min(24, loan.loan_term)}", headers=headers
+        ).json()
+        for key, value in expected.items():
+            assert Decimal(row[key]) == Decimal(value)
@@ -0,0 +1,74 @@
+import cProfile
+
+from app.core.config import settings
+from app.tests.core.test_profiling import InterpreterWideProfile
+from app.tests.utils.loan import create_loan
+
+
+def test_profile_request(client, superuser_token_headers, db):
+    loan = create_loan(db, loan_term=120)
+    response = client.get(f"{settings.API_V1_STR}/loans/{loan.id}/schedule",
+                          headers={**superuser_token_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert len(response.json()) == 120
+    id = response.headers["X-Profile-Id"]
+    response = client.get(f"{settings.API_V1_STR}/profiles/{id}", headers=superuser_token_headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["path"] == f"{settings.API_V1_STR}/loans/{loan.id}/schedule"
+    assert report["status"] == 200
+    assert set(report["breakdown"]) == {"amortization_calculator", "sqlalchemy", "pydantic", "other"}
+    assert report["breakdown"]["amortization_calculator"] > 0
+    assert report["top_functions"]
+
+
+def test_profile_request_with_threadpool_call_and_interpreter_wide_profilers(client, superuser_token_headers, db,
+                                                                             monkeypatch):
+    monkeypatch.setattr(cProfile, "Profile", InterpreterWideProfile)
+    loan = create_loan(db, loan_term=120)
+    # the summary is calculated in the threadpool
+    response = client.get(f"{settings.API_V1_STR}/loans/{loan.id}/summary?month=60",
+                          headers={**superuser_token_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    response = client.get(f"{settings.API_V1_STR}/profiles/{response.headers['X-Profile-Id']}",
+                          headers=superuser_token_headers)
+    assert response.json()["status"] == 200
+
+
+def test_profile_request_while_another_profiler_is_active(client, superuser_token_headers, db, monkeypatch):
+    monkeypatch.setattr(cProfile, "Profile", InterpreterWideProfile)
+    loan = create_loan(db, loan_term=12)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        response = client.get(f"{settings.API_V1_STR}/loans/{loan.id}/schedule",
+                              headers={**superuser_token_headers, "X-Profile": "1"})
+    finally:
+        profiler.disable()
+    assert response.status_code == 409
+
+
+def test_profile_request_without_header(client, superuser_token_headers, db):
+    loan = create_loan(db)
+    response = client.get(f"{settings.API_V1_STR}/loans/{loan.id}/schedule", headers=superuser_token_headers)
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_profile_request_not_superuser(client, normal_user_token_headers):
+    response = client.get(f"{settings.API_V1_STR}/loans/", headers={**normal_user_token_headers, "X-Profile": "1"})
+    assert response.status_code == 403
+    assert response.json() == {"detail": "The user doesn't have enough privileges"}
+    response = client.get(f"{settings.API_V1_STR}/loans/", headers={"X-Profile": "1"})
+    assert response.status_code == 401
+
+
+def test_fetch_profile_not_found(client, superuser_token_headers):
+    response = client.get(f"{settings.API_V1_STR}/profiles/nope", headers=superuser_token_headers)
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Profile not found"}
+
+
+def test_fetch_profile_not_superuser(client, normal_user_token_headers):
+    response = client.get(f"{settings.API_V1_STR}/profiles/nope", headers=normal_user_token_headers)
+    assert response.status_code == 403
@@ -1,8 +1,11 @@
 from fastapi.testclient import TestClient
+from passlib.context import CryptContext
 from sqlmodel import Session
 
 from app import crud
 from app.core.config import settings
+from app.models import UserCreate, UserUpdate
+from app.tests.utils.user import authentication_token_from_email, create_random_user
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -22,3 +25,24 @@ def test_create_user_new_email(
     user = crud.get_user_by_email(session=db, email=username)
     assert user
     assert user.email == created_user["email"]
+
+
+def test_deactivating_user_invalidates_cached_token(client: TestClient, db: Session) -> None:
+    user = create_random_user(db)
+    headers = authentication_token_from_email(client=client, email=user.email, db=db)
+    assert client.post(f"{settings.API_V1_STR}/login/test-token", headers=headers).status_code == 200
+    crud.update_user(session=db, db_user=user, user_in=UserUpdate(is_active=False))
+    assert client.post(f"{settings.API_V1_STR}/login/test-token", headers=headers).status_code == 400
+
+
+def test_login_rehashes_password_with_outdated_cost(client: TestClient, db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = crud.create_user(session=db, user_create=UserCreate(email=email, password=password))
+    user.hashed_password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(password)
+    db.add(user)
+    db.commit()
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data={"username": email, "password": password})
+    assert r.status_code == 200
+    db.refresh(user)
+    assert user.hashed_password.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
@@ -7,7 +7,7 @@ from sqlmodel import Session, delete
 from app.core.config import settings
 from app.core.db import engine, init_db
 from app.main import app
-from app.models import User, Loan, LoanShare
+from app.models import User, Loan, LoanShare, LoanRateChange, LoanScheduleRow
 from app.tests.utils.user import authentication_token_from_email
 
 
@@ -16,6 +16,10 @@ def db() -> Generator[Session, None, None]:
     with Session(engine) as session:
         init_db(session)
         yield session
+        statement = delete(LoanScheduleRow)
+        session.execute(statement)
+        statement = delete(LoanRateChange)
+        session.execute(statement)
         statement = delete(Loan)
         session.execute(statement)
         statement = delete(User)
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+
+from app.core.config import settings
+from app.core.db import async_database_url, is_sqlite_memory, make_async_engine, make_engine
+
+
+@pytest.mark.parametrize("url,expected", [
+    ("sqlite://", True),
+    ("sqlite:///:memory:", True),
+    ("sqlite:///file:loans?mode=memory&cache=shared&uri=true", True),
+    ("sqlite:///loans.db", False),
+    ("postgresql://user@localhost/loans", False),
+])
+def test_is_sqlite_memory(url, expected):
+    assert is_sqlite_memory(url) == expected
+
+
+def test_async_database_url():
+    assert async_database_url("sqlite:///loans.db").drivername == "sqlite+aiosqlite"
+    with pytest.raises(ValueError):
+        async_database_url("postgresql://user@localhost/loans")
+
+
+def test_memory_engine_uses_a_single_connection():
+    engine = make_engine("sqlite://")
+    assert isinstance(engine.pool, StaticPool)
+
+
+def test_async_memory_engine_uses_a_single_connection():
+    async_engine = make_async_engine(async_database_url("sqlite:///file:loans?mode=memory&cache=shared&uri=true"))
+    assert isinstance(async_engine.pool, AsyncAdaptedQueuePool)
+    assert (async_engine.pool.size(), async_engine.pool._max_overflow) == (1, 0)
+
+
+def test_file_engine_is_pooled_and_in_wal_mode(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path}/loans.db")
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == settings.DB_POOL_SIZE
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    engine.dispose()
+
+
+def test_async_file_engine_is_in_wal_mode(tmp_path):
+    async_engine = make_async_engine(async_database_url(f"sqlite:///{tmp_path}/loans.db"))
+
+    async def journal_mode():
+        try:
+            async with async_engine.connect() as connection:
+                return (await connection.execute(text("PRAGMA journal_mode"))).scalar()
+        finally:
+            await async_engine.dispose()
+
+    assert asyncio.run(journal_mode()) == "wal"
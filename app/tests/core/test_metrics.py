@@ -0,0 +1,43 @@
+from app.core.config import settings
+from app.core.metrics import RequestMetrics
+from app.tests.utils.loan import create_loan
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = RequestMetrics(buckets=(0.1, 1))
+    metrics.observe("GET", "/items/{id}", 200, 0.05)
+    metrics.observe("GET", "/items/{id}", 200, 0.5)
+    metrics.observe("GET", "/items/{id}", 200, 5)
+    text = metrics.render()
+    labels = 'method="GET",route="/items/{id}",status="200"'
+    assert f'http_requests_total{{{labels}}} 3' in text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.1"}} 1' in text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="1"}} 2' in text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f'http_request_duration_seconds_sum{{{labels}}} 5.55' in text
+    assert f'http_request_duration_seconds_count{{{labels}}} 3' in text
+
+
+def test_metrics_endpoint_labels_by_route_template(client, superuser_token_headers, db):
+    loan = create_loan(db)
+    client.get(f"{settings.API_V1_STR}/loans/{loan.id}/schedule", headers=superuser_token_headers)
+    client.get(f"{settings.API_V1_STR}/loans/999999999/schedule", headers=superuser_token_headers)
+    client.get("/no/such/path")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    route = f'method="GET",route="{settings.API_V1_STR}/loans/{{id}}/schedule"'
+    assert f'http_requests_total{{{route},status="200"}}' in text
+    assert f'http_requests_total{{{route},status="404"}}' in text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in text
+    assert f'http_requests_in_flight{{{route}}} 0' in text
+    assert f"/loans/{loan.id}/" not in text
+
+
+def test_metrics_label_made_up_methods_as_one(client):
+    for method in ("FOO", "BAR", "BAZ"):
+        assert client.request(method, f"{settings.API_V1_STR}/loans/").status_code == 405
+    text = client.get("/metrics").text
+    assert f'http_requests_total{{method="other",route="{settings.API_V1_STR}/loans/",status="405"}} 3' in text
+    assert 'method="FOO"' not in text
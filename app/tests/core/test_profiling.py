@@ -0,0 +1,68 @@
+import cProfile
+from decimal import Decimal
+
+import pytest
+
+from app.amortization_calculator import calc_amortization_schedule
+from app.core.profiling import ProfileStore, RequestProfile, category
+
+
+def test_category():
+    assert category("/src/app/amortization_calculator.py", "calc_monthly_payment") == "amortization_calculator"
+    assert category("/site-packages/sqlalchemy/engine/base.py", "execute") == "sqlalchemy"
+    assert category("~", "<method 'execute' of 'sqlite3.Cursor' objects>") == "sqlalchemy"
+    assert category("/site-packages/sqlmodel/_compat.py", "sqlmodel_init") == "pydantic"
+    assert category("~", "<method 'validate_python' of 'pydantic_core._pydantic_core.SchemaValidator' objects>") \
+        == "pydantic"
+    assert category("/src/app/api/routes/loans.py", "fetch_loan_schedule") == "other"
+
+
+def test_report_merges_profilers():
+    profile = RequestProfile()
+    schedule = profile.run(calc_amortization_schedule, Decimal(1000), Decimal("0.05"), 12)
+    assert len(schedule) == 12
+    profile.run(sorted, [3, 1, 2])
+    report = profile.report(top=5)
+    assert report["breakdown"]["amortization_calculator"] > 0
+    assert sum(report["breakdown"].values()) == pytest.approx(report["profiled_seconds"])
+    assert len(report["top_functions"]) == 5
+    assert any("calc_monthly_payment" in f["function"] for f in profile.report()["top_functions"])
+
+
+class InterpreterWideProfile(cProfile.Profile):
+    """
+    A profiler that, as from Python 3.12 on, cannot be enabled while another one is active.
+    """
+    active = None
+
+    def enable(self, *args, **kwargs):
+        if InterpreterWideProfile.active is not None:
+            raise ValueError("Another profiling tool is already active")
+        super().enable(*args, **kwargs)
+        InterpreterWideProfile.active = self
+
+    def disable(self):
+        super().disable()
+        if InterpreterWideProfile.active is self:
+            InterpreterWideProfile.active = None
+
+
+def test_run_does_not_nest_interpreter_wide_profilers(monkeypatch):
+    monkeypatch.setattr(cProfile, "Profile", InterpreterWideProfile)
+    profile = RequestProfile()
+    outer = profile.profiler()
+    try:
+        assert profile.run(sorted, [3, 1, 2]) == [1, 2, 3]
+    finally:
+        outer.disable()
+    assert profile.profilers == [outer]
+    assert any("sorted" in f["function"] for f in profile.report()["top_functions"])
+
+
+def test_store_keeps_latest():
+    store = ProfileStore(max_entries=2)
+    for id in "abc":
+        store.put(id, {"id": id})
+    assert store.get("a") is None
+    assert store.get("c") == {"id": "c"}
+    assert len(store) == 2
@@ -0,0 +1,100 @@
+from decimal import Decimal
+
+from app.amortization_calculator import calc_amortization_schedule
+from app.core.schedule_cache import ScheduleCache, schedule_key, estimate_schedule_nbytes
+
+
+def test_schedule_key_normalizes_loan_terms():
+    assert schedule_key(200000, '0.05', 360) == schedule_key(Decimal('200000.00'), Decimal('0.0500'), 360)
+    assert schedule_key(200000, '0.05', 360) != schedule_key(200000, '0.05', 361)
+    assert schedule_key('1.000', '0.05', 360) != schedule_key('1.00', '0.05', 360)
+    assert schedule_key(200000, '0.05', 360, {}) == schedule_key(200000, '0.05', 360)
+    assert schedule_key(200000, '0.05', 360, {61: '0.070'}) == schedule_key(200000, '0.05', 360, {61: Decimal('0.07')})
+    assert schedule_key(200000, '0.05', 360, {61: '0.07'}) != schedule_key(200000, '0.05', 360, {62: '0.07'})
+
+
+def test_get_schedule_hit_and_miss():
+    cache = ScheduleCache(max_entries=10, max_bytes=10**9)
+    schedule = cache.get_schedule(Decimal('30000.00'), Decimal('0.03'), 48)
+    assert schedule == calc_amortization_schedule(Decimal('30000.00'), Decimal('0.03'), 48)
+    assert cache.get_schedule(30000, '0.030', 48) is schedule
+    assert cache.stats() == {'entries': 1, 'nbytes': estimate_schedule_nbytes(schedule),
+                             'hits': 1, 'misses': 1, 'evictions': 0}
+
+
+def test_get_does_not_populate():
+    cache = ScheduleCache(max_entries=10, max_bytes=10**9)
+    assert cache.get(1000, 0, 12) is None
+    assert len(cache) == 0
+    assert cache.misses == 1
+
+
+def test_lru_eviction_by_entries():
+    cache = ScheduleCache(max_entries=2, max_bytes=10**9)
+    cache.get_schedule(1000, 0, 1)
+    cache.get_schedule(1000, 0, 2)
+    cache.get_schedule(1000, 0, 1)
+    cache.get_schedule(1000, 0, 3)
+    assert len(cache) == 2
+    assert cache.evictions == 1
+    assert cache.get(1000, 0, 2) is None
+    assert cache.get(1000, 0, 1) is not None
+
+
+def test_eviction_by_byte_budget():
+    nbytes = estimate_schedule_nbytes(calc_amortization_schedule(1000, 0, 12))
+    cache = ScheduleCache(max_entries=100, max_bytes=2*nbytes)
+    for amount in (1000, 2000, 3000):
+        cache.get_schedule(amount, 0, 12)
+    assert len(cache) == 2
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.evictions == 1
+
+
+def test_schedule_larger_than_budget_is_not_cached():
+    cache = ScheduleCache(max_entries=100, max_bytes=1)
+    cache.get_schedule(1000, 0, 12)
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+
+def test_get_window_from_checkpoints():
+    cache = ScheduleCache(max_entries=100, max_bytes=10**6, checkpoint_interval=12)
+    window = cache.get_window(Decimal('200000.00'), Decimal('0.0657'), 360, 100, 130)
+    assert window == calc_amortization_schedule(Decimal('200000.00'), Decimal('0.0657'), 360)[99:130]
+    assert cache.get(Decimal('200000.00'), Decimal('0.0657'), 360) is None
+    assert len(cache) == 1
+
+
+def test_get_window_slices_cached_schedule():
+    cache = ScheduleCache(max_entries=100, max_bytes=10**6)
+    schedule = cache.get_schedule(Decimal('200000.00'), Decimal('0.0657'), 360)
+    window = cache.get_window(Decimal('200000.00'), Decimal('0.0657'), 360, 100, 130)
+    assert window == schedule[99:130]
+    assert len(cache) == 1
+
+
+def test_get_window_decimal_engine_caches_schedule():
+    cache = ScheduleCache(max_entries=100, max_bytes=10**6, engine='decimal')
+    window = cache.get_window(Decimal('200000.00'), Decimal('0.0657'), 360, 100, 130)
+    assert window == cache.get(Decimal('200000.00'), Decimal('0.0657'), 360)[99:130]
+
+
+def test_get_window_adjustable_rate():
+    cache = ScheduleCache(max_entries=100, max_bytes=10**6)
+    rate_changes = {61: Decimal('0.07')}
+    window = cache.get_window(Decimal('200000.00'), Decimal('0.0657'), 360, 100, 130, rate_changes)
+    schedule = calc_amortization_schedule(Decimal('200000.00'), Decimal('0.0657'), 360, rate_changes=rate_changes)
+    assert window == schedule[99:130]
+    assert cache.get(Decimal('200000.00'), Decimal('0.0657'), 360) is None
+
+
+def test_reamortize_recalculates_cached_schedule():
+    cache = ScheduleCache(max_entries=100, max_bytes=10**6)
+    loan = (Decimal('200000.00'), Decimal('0.0657'), 360)
+    rate_changes = {61: Decimal('0.07'), 121: Decimal('0.05')}
+    assert cache.reamortize(*loan, None, {61: Decimal('0.07')}, 61) is None
+    cache.get_schedule(*loan, {61: Decimal('0.07')})
+    schedule = cache.reamortize(*loan, {61: Decimal('0.07')}, rate_changes, 121)
+    assert schedule == calc_amortization_schedule(*loan, rate_changes=rate_changes)
+    assert cache.get(*loan, rate_changes) is schedule
@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from app.core import security
+from app.core.config import settings
+from app.core.security import BoundedExecutor, PasswordHashingBusy, verify_and_update_password
+
+
+def test_verify_and_update_password_rehashes_other_cost():
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    verified, new_hash = verify_and_update_password("secret", old_hash)
+    assert verified
+    assert new_hash.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+    assert verify_and_update_password("secret", new_hash) == (True, None)
+
+
+def test_verify_and_update_password_wrong_password():
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    assert verify_and_update_password("wrong", old_hash) == (False, None)
+
+
+def test_bounded_executor_rejects_when_full():
+    executor = BoundedExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+    running = executor.submit(release.wait)
+    queued = executor.submit(lambda: 42)
+    with pytest.raises(PasswordHashingBusy):
+        executor.submit(lambda: 0)
+    release.set()
+    assert running.result() is True
+    assert queued.result() == 42
+    assert executor.submit(lambda: 1).result() == 1
+
+
+def test_login_returns_503_when_hashing_is_saturated(client, monkeypatch):
+    executor = BoundedExecutor(max_workers=1, max_pending=0)
+    release = threading.Event()
+    executor.submit(release.wait)
+    monkeypatch.setattr(security, "password_hashing_executor", executor)
+    try:
+        response = client.post(f"{settings.API_V1_STR}/login/access-token",
+                               data={"username": settings.FIRST_SUPERUSER, "password": settings.FIRST_SUPERUSER_PASSWORD})
+    finally:
+        release.set()
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
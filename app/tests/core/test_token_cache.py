@@ -0,0 +1,69 @@
+import time
+
+from app.core.token_cache import TokenCache
+from app.models import User
+
+
+def make_user(id=1):
+    return User(id=id, email=f"user{id}@example.com", hashed_password="x")
+
+
+def test_get_put_hit_rate():
+    cache = TokenCache(max_entries=10, ttl=60)
+    assert cache.get("token") is None
+    cache.put("token", make_user())
+    user = cache.get("token")
+    assert user.id == 1
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'evictions': 0, 'hit_rate': 0.5}
+
+
+def test_cached_user_is_a_copy():
+    cache = TokenCache(max_entries=10, ttl=60)
+    user = make_user()
+    cache.put("token", user)
+    assert cache.get("token") is not user
+
+
+def test_ttl_expiry(monkeypatch):
+    cache = TokenCache(max_entries=10, ttl=60)
+    cache.put("token", make_user())
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert cache.get("token") is None
+    assert len(cache) == 0
+
+
+def test_ttl_capped_by_token_expiry(monkeypatch):
+    cache = TokenCache(max_entries=10, ttl=60)
+    cache.put("token", make_user(), exp=time.time() + 5)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+    assert cache.get("token") is None
+
+
+def test_expired_token_is_not_cached():
+    cache = TokenCache(max_entries=10, ttl=60)
+    cache.put("token", make_user(), exp=time.time() - 1)
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = TokenCache(max_entries=2, ttl=60)
+    cache.put("a", make_user(1))
+    cache.put("b", make_user(2))
+    cache.get("a")
+    cache.put("c", make_user(3))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.evictions == 1
+
+
+def test_invalidate_user():
+    cache = TokenCache(max_entries=10, ttl=60)
+    cache.put("a", make_user(1))
+    cache.put("b", make_user(1))
+    cache.put("c", make_user(2))
+    cache.invalidate_user(1)
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
@@ -0,0 +1,100 @@
+import random
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from app.amortization_batch import calc_amortization_schedules_batch, calc_monthly_summaries_batch
+from app.amortization_calculator import calc_amortization_schedule, calc_monthly_summary
+
+
+def _cents(amount):
+    return int(amount * 100)
+
+
+def assert_matches_scalar(amounts, rates, terms):
+    batch = calc_amortization_schedules_batch(amounts, rates, terms)
+    T = max(terms)
+    for k, (P, r, n) in enumerate(zip(amounts, rates, terms)):
+        schedule = calc_amortization_schedule(P, r, n)
+        for key in ('monthly_payment', 'monthly_accrued_interest', 'remaining_balance'):
+            expected = [_cents(row[key]) for row in schedule] + [0] * (T - n)
+            assert batch[key][k].tolist() == expected, (P, r, n, key)
+        assert batch['mask'][k].tolist() == [True] * n + [False] * (T - n)
+
+
+def test_batch_matches_scalar_example():
+    assert_matches_scalar([30000.0], [0.03], [48])
+
+
+def test_batch_matches_scalar_ragged_terms():
+    assert_matches_scalar(
+        [Decimal('200000.00'), Decimal('1.00'), Decimal('500000.00'), Decimal('0.01')],
+        [Decimal('.0657'), Decimal('0'), Decimal('0.07'), Decimal('0.25')],
+        [30*12, 7, 15*12, 12*100],
+    )
+
+
+def test_batch_matches_scalar_half_cent_ties():
+    # 0.06 / 12 = 0.005 exactly, so odd balances accrue exactly half a cent
+    assert_matches_scalar([Decimal('1.00'), Decimal('12345.67')], [Decimal('0.06'), Decimal('0.06')], [12, 24])
+
+
+def test_batch_matches_scalar_random_loans():
+    rng = random.Random(20240602)
+    amounts, rates, terms = [], [], []
+    for _ in range(200):
+        amounts.append(Decimal(rng.randint(1, 100_000_000)) / 100)
+        rates.append(Decimal(rng.choice([0, rng.randint(1, 2500)])) / 10000)
+        terms.append(rng.randint(1, 480))
+    assert_matches_scalar(amounts, rates, terms)
+
+
+def test_batch_empty():
+    batch = calc_amortization_schedules_batch([], [], [])
+    assert batch['remaining_balance'].shape == (0, 0)
+
+
+def test_batch_rejects_fractional_cents():
+    with pytest.raises(ValueError):
+        calc_amortization_schedules_batch([Decimal('1.001')], [0], [12])
+
+
+def test_batch_rejects_mismatched_lengths():
+    with pytest.raises(ValueError):
+        calc_amortization_schedules_batch([1000, 2000], [0], [12])
+
+
+def test_batch_int64_cents():
+    batch = calc_amortization_schedules_batch([1000], [0], [3])
+    assert batch['monthly_payment'].dtype == np.int64
+    assert batch['monthly_payment'].tolist() == [[33333, 33333, 33334]]
+
+
+def test_summaries_batch_matches_scalar():
+    amounts = [Decimal('200000.00'), Decimal('1.00'), Decimal('12345.67'), Decimal('0.01')]
+    rates = [Decimal('.0657'), Decimal('0'), Decimal('0.06'), Decimal('0.25')]
+    terms = [30*12, 7, 24, 12*100]
+    for month in (1, 7, 24, 100, 30*12, 12*100):
+        batch = calc_monthly_summaries_batch(amounts, rates, terms, month)
+        for k, (P, r, n) in enumerate(zip(amounts, rates, terms)):
+            summary = calc_monthly_summary(P, r, n, min(month, n))
+            for key, value in summary.items():
+                assert batch[key][k] == _cents(value), (P, r, n, month, key)
+
+
+def test_summaries_batch_empty():
+    batch = calc_monthly_summaries_batch([], [], [], 12)
+    assert batch['remaining_balance'].tolist() == []
+
+
+def test_batch_calculates_loans_too_large_for_int64_one_by_one():
+    amounts = [Decimal('200000.00'), Decimal('1E+17'), Decimal('0.01')]
+    rates, terms = [Decimal('.0657'), Decimal('0.05'), Decimal('0.25')], [30*12, 24, 12]
+    assert_matches_scalar(amounts, rates, terms)
+    for month in (1, 24, 30*12):
+        batch = calc_monthly_summaries_batch(amounts, rates, terms, month)
+        for k, (P, r, n) in enumerate(zip(amounts, rates, terms)):
+            summary = calc_monthly_summary(P, r, n, min(month, n))
+            for key, value in summary.items():
+                assert batch[key][k] == _cents(value), (P, r, n, month, key)
@@ -1,8 +1,15 @@
+import pickle
+import random
+import sys
 from decimal import Decimal
 
+import pytest
+from fastapi.encoders import jsonable_encoder
 from pytest import approx
 
-from app.amortization_calculator import calc_monthly_payment, calc_amortization_schedule, round_to_nearest_cent, calc_monthly_summary
+from app.amortization_calculator import calc_monthly_payment, calc_amortization_schedule, round_to_nearest_cent, calc_monthly_summary, \
+    iter_amortization_schedule, Schedule, ENGINES, calc_schedule_checkpoints, simulate_extra_payments, \
+    reamortize_schedule
 
 
 def test_round_to_nearest_cent():
@@ -35,3 +42,367 @@ def test_calc_monthly_summary_last_month_principal_fully_paid():
     principal_amount = 30000
     summary = calc_monthly_summary(principal_amount, 0.03, 48, 48)
     assert summary['aggregate_principal_paid'] == principal_amount
+
+
+def _reference_monthly_summary(schedule, principal_amount, month):
+    month_row = schedule[month-1]
+    return {
+        'remaining_balance': month_row['remaining_balance'],
+        'aggregate_principal_paid': principal_amount - month_row['remaining_balance'],
+        'aggregate_interest_paid': sum(r['monthly_accrued_interest'] for r in schedule[:month])
+    }
+
+
+def _random_loans(count, max_term=360, seed=20240601):
+    rng = random.Random(seed)
+    for _ in range(count):
+        amount = Decimal(rng.randint(1, 100_000_000)) / 100
+        annual_interest_rate = Decimal(rng.choice([0, rng.randint(1, 2500)])) / 10000
+        yield amount, annual_interest_rate, rng.randint(1, max_term)
+
+
+@pytest.mark.parametrize('principal_amount, annual_interest_rate, number_of_months', [
+    (30000, 0.03, 48),
+    (30000, 0.0, 48),
+    (Decimal('200000.00'), Decimal('.0657'), 30*12),
+    (Decimal('1.00'), Decimal('0'), 7),
+    (Decimal('0.01'), Decimal('0.25'), 12*100),
+])
+def test_calc_monthly_summary_matches_schedule(principal_amount, annual_interest_rate, number_of_months):
+    schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months)
+    for month in range(1, number_of_months+1):
+        expected = _reference_monthly_summary(schedule, principal_amount, month)
+        summary = calc_monthly_summary(principal_amount, annual_interest_rate, number_of_months, month)
+        assert {k: str(v) for k, v in summary.items()} == {k: str(v) for k, v in expected.items()}
+
+
+def test_calc_monthly_summary_matches_schedule_random_loans():
+    for principal_amount, annual_interest_rate, number_of_months in _random_loans(100):
+        schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months)
+        for month in range(1, number_of_months+1):
+            expected = _reference_monthly_summary(schedule, principal_amount, month)
+            summary = calc_monthly_summary(principal_amount, annual_interest_rate, number_of_months, month)
+            assert {k: str(v) for k, v in summary.items()} == {k: str(v) for k, v in expected.items()}
+
+
+def test_iter_amortization_schedule_matches_schedule():
+    rows = iter_amortization_schedule(Decimal('200000.00'), Decimal('.0657'), 12*100)
+    assert next(rows) == calc_amortization_schedule(Decimal('200000.00'), Decimal('.0657'), 12*100)[0]
+    assert list(iter_amortization_schedule(30000.0, 0.03, 48)) == calc_amortization_schedule(30000.0, 0.03, 48)
+
+
+def test_schedule_matches_rows_random_loans():
+    for principal_amount, annual_interest_rate, number_of_months in _random_loans(200, max_term=1200):
+        rows = list(iter_amortization_schedule(principal_amount, annual_interest_rate, number_of_months))
+        schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months)
+        assert isinstance(schedule, Schedule)
+        assert [{k: str(v) for k, v in row.items()} for row in schedule] == \
+            [{k: str(v) for k, v in row.items()} for row in rows]
+        for key in rows[0]:
+            assert schedule.format_column(key) == [str(row[key]) for row in rows]
+        month = (number_of_months + 1) // 2
+        assert schedule.interest_paid(month) == sum(r['monthly_accrued_interest'] for r in rows[:month])
+        assert schedule.principal_paid(number_of_months) == principal_amount
+
+
+def test_schedule_rows_are_mappings():
+    schedule = calc_amortization_schedule(Decimal('30000.00'), Decimal('0.03'), 48)
+    assert dict(schedule[0]) == {'month': 1, 'monthly_payment': Decimal('664.03'),
+                                 'monthly_accrued_interest': Decimal('75.00'),
+                                 'remaining_balance': Decimal('29410.97')}
+    assert list(schedule[-1]) == ['month', 'monthly_payment', 'monthly_accrued_interest', 'remaining_balance']
+    with pytest.raises(KeyError):
+        schedule[0]['principal']
+    with pytest.raises(IndexError):
+        schedule[48]
+
+
+def test_schedule_slices_share_columns():
+    schedule = calc_amortization_schedule(Decimal('200000.00'), Decimal('.0657'), 360)
+    rows = list(iter_amortization_schedule(Decimal('200000.00'), Decimal('.0657'), 360))
+    window = schedule[100:110]
+    assert isinstance(window, Schedule)
+    assert [row['month'] for row in window] == list(range(101, 111))
+    assert window == rows[100:110]
+    assert schedule[::-2] == rows[::-2]
+    assert window._balances.obj is schedule._balances.obj
+
+
+def test_schedule_keeps_negative_zero_interest():
+    # the balance dips below zero before the last month, accruing -0.00 interest
+    rows = list(iter_amortization_schedule(Decimal('1.97'), Decimal('0.2016'), 50))
+    schedule = calc_amortization_schedule(Decimal('1.97'), Decimal('0.2016'), 50)
+    assert str(rows[-1]['monthly_accrued_interest']) == '-0.00'
+    assert schedule.negative_zero_interest == {50}
+    assert str(schedule[-1]['monthly_accrued_interest']) == '-0.00'
+    assert schedule.format_column('monthly_accrued_interest')[-1] == '-0.00'
+
+
+@pytest.mark.parametrize("principal_amount, annual_interest_rate, number_of_months, rate_changes", [
+    (30000.0, 0.03, 48, None),
+    (Decimal('1.97'), Decimal('0.2016'), 50, None),
+    (Decimal('200000.00'), Decimal('.0657'), 360, {61: Decimal('0.08')}),
+])
+def test_schedule_rows_json_encode_like_row_dicts(principal_amount, annual_interest_rate, number_of_months,
+                                                  rate_changes):
+    schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months,
+                                          rate_changes=rate_changes)
+    rows = list(iter_amortization_schedule(principal_amount, annual_interest_rate, number_of_months, rate_changes))
+    assert isinstance(schedule, Schedule)
+    assert jsonable_encoder([dict(row) for row in schedule]) == jsonable_encoder(rows)
+    assert jsonable_encoder([dict(row) for row in schedule[10:20]]) == jsonable_encoder(rows[10:20])
+
+
+def test_schedule_pickles():
+    schedule = calc_amortization_schedule(Decimal('1.97'), Decimal('0.2016'), 50)
+    for value in (schedule, schedule[10:], schedule[::-3]):
+        unpickled = pickle.loads(pickle.dumps(value))
+        assert isinstance(unpickled, Schedule)
+        assert unpickled == value
+        assert [str(row['remaining_balance']) for row in unpickled] == \
+            [str(row['remaining_balance']) for row in value]
+        assert unpickled.format_column('monthly_accrued_interest') == value.format_column('monthly_accrued_interest')
+    assert pickle.loads(pickle.dumps(schedule))._payments.readonly
+
+
+def test_schedule_falls_back_to_rows_for_sub_cent_amounts():
+    schedule = calc_amortization_schedule(Decimal(0.1), Decimal('0.05'), 12)
+    assert isinstance(schedule, list)
+    assert schedule == list(iter_amortization_schedule(Decimal(0.1), Decimal('0.05'), 12))
+
+
+def test_schedule_is_compact():
+    schedule = calc_amortization_schedule(Decimal('200000.00'), Decimal('.0657'), 1200)
+    rows = list(iter_amortization_schedule(Decimal('200000.00'), Decimal('.0657'), 1200))
+    rows_size = sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(map(sys.getsizeof, row.values())) for row in rows)
+    assert sys.getsizeof(schedule) * 10 < rows_size
+
+
+def _as_strings(schedule):
+    return [{k: str(v) for k, v in row.items()} for row in schedule]
+
+
+def _outcome(fn, *args):
+    # mixing floats and Decimals raises in either engine
+    try:
+        result = fn(*args)
+    except TypeError as exc:
+        return type(exc)
+    if isinstance(result, dict):
+        return {k: str(v) for k, v in result.items()}
+    return _as_strings(result), result.closed, result.negative_zero_interest, result.negative_zero_payments
+
+
+ENGINE_AMOUNTS = [1, 30000, 30000.0, Decimal('0.01'), Decimal('1.50'), Decimal('1.97'), Decimal('99.999'),
+                  Decimal('200000.00'), Decimal('123456.789012'), Decimal('9999999999.99')]
+ENGINE_RATES = [0, 0.03, Decimal('0.0001'), Decimal('0.04'), Decimal('0.0657'), Decimal('0.1234567'),
+                Decimal('0.25'), Decimal('1')]
+ENGINE_TERMS = [1, 2, 13, 360, 1200]
+
+
+@pytest.mark.parametrize('number_of_months', ENGINE_TERMS)
+def test_integer_engine_matches_decimal_engine(number_of_months):
+    for principal_amount in ENGINE_AMOUNTS:
+        for annual_interest_rate in ENGINE_RATES:
+            loan = principal_amount, annual_interest_rate, number_of_months
+            assert _outcome(calc_amortization_schedule, *loan, 'integer') == \
+                _outcome(calc_amortization_schedule, *loan, 'decimal')
+            for month in {1, (number_of_months + 1) // 2, number_of_months}:
+                assert _outcome(calc_monthly_summary, *loan, month, 'integer') == \
+                    _outcome(calc_monthly_summary, *loan, month, 'decimal')
+
+
+# re-amortized from slightly negative balances, some payments round to -0.00
+ENGINE_ADJUSTABLE_RATE_LOANS = [
+    (Decimal('0.06'), Decimal('0.48'), 15, {8: Decimal('0.0997'), 14: Decimal('0.1863'), 15: Decimal('0.0131')}),
+    (Decimal('0.1500'), Decimal('0.2399'), 34, {22: Decimal('0.1062')}),
+    (Decimal('0.16'), Decimal('0.0805'), 24, {19: Decimal('0.2318'), 24: Decimal('0.0197')}),
+    (Decimal('0.25'), Decimal('0.0799'), 36, {5: Decimal('0.0458'), 8: Decimal('0.1752'), 28: Decimal('0.125')}),
+    (Decimal('200000.00'), Decimal('.0657'), 360, {61: Decimal('0.08'), 73: Decimal('0.0725')}),
+]
+
+
+@pytest.mark.parametrize('principal_amount, annual_interest_rate, number_of_months, rate_changes',
+                         ENGINE_ADJUSTABLE_RATE_LOANS)
+def test_integer_engine_matches_decimal_engine_adjustable_rate(principal_amount, annual_interest_rate,
+                                                               number_of_months, rate_changes):
+    loan = principal_amount, annual_interest_rate, number_of_months
+    rows = list(iter_amortization_schedule(*loan, rate_changes))
+    outcome = _outcome(calc_amortization_schedule, *loan, 'integer', rate_changes)
+    assert outcome == _outcome(calc_amortization_schedule, *loan, 'decimal', rate_changes)
+    assert outcome[0] == _as_strings(rows)
+    assert outcome[3] == {row['month'] for row in rows if str(row['monthly_payment']) == '-0.00'}
+    schedule = calc_amortization_schedule(*loan, rate_changes=rate_changes)
+    assert schedule.format_column('monthly_payment') == [str(row['monthly_payment']) for row in rows]
+    month = max(rate_changes)
+    before = calc_amortization_schedule(*loan, rate_changes={m: r for m, r in rate_changes.items() if m != month})
+    assert _outcome(reamortize_schedule, before, *loan[:2], rate_changes, month) == outcome
+
+
+def test_integer_engine_replays_decimal_precision():
+    # 1.50 * (0.04 / 12) is just below half a cent, Decimal rounds it to exactly half a cent first
+    assert str(Decimal('1.50') * (Decimal('0.04') / 12)) == '0.005000000000000000000000000000'
+    schedule = calc_amortization_schedule(Decimal('1.50'), Decimal('0.04'), 2, 'integer')
+    assert str(schedule[0]['monthly_accrued_interest']) == '0.01'
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        calc_amortization_schedule(1000, 0, 12, 'float')
+    with pytest.raises(ValueError):
+        calc_monthly_summary(1000, 0, 12, 1, 'float')
+
+
+@pytest.mark.parametrize('interval', [1, 12, 60])
+def test_schedule_checkpoint_windows_match_schedule(interval):
+    rng = random.Random(interval)
+    for principal_amount, annual_interest_rate, number_of_months in _random_loans(100, max_term=1200):
+        schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months)
+        checkpoints = calc_schedule_checkpoints(principal_amount, annual_interest_rate, number_of_months, interval)
+        for start in {1, rng.randint(1, number_of_months), number_of_months}:
+            end = rng.randint(start, number_of_months)
+            window = checkpoints.window(start, end)
+            assert _as_strings(window) == _as_strings(schedule[start-1:end])
+            assert list(window.months) == list(range(start, end + 1))
+        assert _as_strings(checkpoints.window(1, number_of_months)) == _as_strings(schedule)
+
+
+def test_schedule_checkpoint_window_out_of_range():
+    checkpoints = calc_schedule_checkpoints(Decimal('1000.00'), Decimal('0.05'), 12)
+    for start, end in [(0, 5), (5, 13), (6, 5)]:
+        with pytest.raises(ValueError):
+            checkpoints.window(start, end)
+
+
+def test_schedule_checkpoints_not_calculated_for_sub_cent_amounts():
+    assert calc_schedule_checkpoints(Decimal(0.1), Decimal('0.05'), 12) is None
+
+
+def _reference_extra_payments(principal_amount, annual_interest_rate, number_of_months, extra_payments,
+                              rate_changes=None):
+    A = round_to_nearest_cent(calc_monthly_payment(principal_amount, annual_interest_rate, number_of_months))
+    i = Decimal(annual_interest_rate) / 12
+    balance = Decimal(principal_amount)
+    first = min(extra_payments)
+    rows, made = [], {}
+    for n in range(1, number_of_months+1):
+        if rate_changes and n in rate_changes:
+            A = round_to_nearest_cent(calc_monthly_payment(balance, rate_changes[n], number_of_months - n + 1))
+            i = Decimal(rate_changes[n]) / 12
+        monthly_accrued_interest = round_to_nearest_cent(balance * i)
+        balance -= A - monthly_accrued_interest
+        if n in extra_payments and balance > 0:
+            made[n] = min(extra_payments[n], balance)
+            balance -= made[n]
+        row = {'month': n, 'monthly_payment': A, 'monthly_accrued_interest': monthly_accrued_interest,
+               'remaining_balance': balance}
+        rows.append(row)
+        if n == number_of_months or (n >= first and balance <= 0):
+            if balance != 0:
+                row['monthly_payment'] += balance
+                row['remaining_balance'] = Decimal(0)
+            return rows, made
+
+
+def test_simulate_extra_payments_matches_reference_random_loans():
+    rng = random.Random(20240602)
+    for principal_amount, annual_interest_rate, number_of_months in _random_loans(200, max_term=600):
+        extra_payments = {rng.randint(1, number_of_months): Decimal(rng.randint(1, int(principal_amount * 100))) / 100
+                          for _ in range(rng.choice([1, 3]))}
+        if rng.random() < 0.3:
+            for month in range(rng.randint(1, number_of_months), number_of_months + 1):
+                extra_payments[month] = extra_payments.get(month, 0) + Decimal(rng.randint(1, 100000)) / 100
+        schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months)
+        simulation = simulate_extra_payments(schedule, principal_amount, annual_interest_rate, extra_payments)
+        rows, made = _reference_extra_payments(principal_amount, annual_interest_rate, number_of_months,
+                                               extra_payments)
+        assert _as_strings(simulation['schedule']) == _as_strings(rows)
+        assert simulation['extra_payments'] == made
+        assert simulation['months_saved'] == number_of_months - len(rows)
+        assert simulation['interest_saved'] == \
+            sum(r['monthly_accrued_interest'] for r in schedule) - sum(r['monthly_accrued_interest'] for r in rows)
+
+
+def test_simulate_extra_payments_reuses_schedule_without_extra_payments():
+    schedule = calc_amortization_schedule(Decimal('1000.00'), Decimal('0.05'), 12)
+    simulation = simulate_extra_payments(schedule, Decimal('1000.00'), Decimal('0.05'), {3: Decimal(0)})
+    assert simulation['schedule'] is schedule
+    assert simulation['months_saved'] == 0
+
+
+def test_simulate_extra_payments_invalid():
+    schedule = calc_amortization_schedule(Decimal('1000.00'), Decimal('0.05'), 12)
+    with pytest.raises(ValueError):
+        simulate_extra_payments(schedule, Decimal('1000.00'), Decimal('0.05'), {13: Decimal(1)})
+    with pytest.raises(ValueError):
+        simulate_extra_payments(schedule[1:], Decimal('1000.00'), Decimal('0.05'), {3: Decimal(1)})
+
+
+def _random_rate_changes(rng, number_of_months):
+    return {rng.randint(1, number_of_months): Decimal(rng.choice([0, rng.randint(1, 2500)])) / 10000
+            for _ in range(rng.choice([1, 2, 5]))}
+
+
+def test_adjustable_rate_schedule_matches_decimal_random_loans():
+    rng = random.Random(20240603)
+    for principal_amount, annual_interest_rate, number_of_months in _random_loans(300, max_term=480):
+        rate_changes = _random_rate_changes(rng, number_of_months)
+        rows = list(iter_amortization_schedule(principal_amount, annual_interest_rate, number_of_months,
+                                               rate_changes))
+        for engine in ENGINES:
+            schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months, engine,
+                                                  rate_changes)
+            assert _as_strings(schedule) == _as_strings(rows)
+            assert schedule.negative_zero_interest == \
+                {row['month'] for row in rows if str(row['monthly_accrued_interest']) == '-0.00'}
+
+
+def test_adjustable_rate_schedule_reamortizes_payment():
+    schedule = calc_amortization_schedule(Decimal('100000.00'), Decimal('0.05'), 360, rate_changes={61: Decimal('0.07')})
+    balance = schedule[59]['remaining_balance']
+    assert schedule[59]['monthly_payment'] == round_to_nearest_cent(calc_monthly_payment(100000, Decimal('0.05'), 360))
+    assert schedule[60]['monthly_payment'] == round_to_nearest_cent(calc_monthly_payment(balance, Decimal('0.07'), 300))
+    assert schedule[-1]['remaining_balance'] == 0
+
+
+def test_rate_changes_outside_term():
+    with pytest.raises(ValueError):
+        calc_amortization_schedule(Decimal('1000.00'), Decimal('0.05'), 12, rate_changes={13: Decimal('0.06')})
+
+
+def test_reamortize_schedule_matches_full_recalculation():
+    rng = random.Random(20240604)
+    for principal_amount, annual_interest_rate, number_of_months in _random_loans(200, max_term=480):
+        rate_changes = {}
+        schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months)
+        for month, rate in sorted(_random_rate_changes(rng, number_of_months).items()):
+            rate_changes[month] = rate
+            schedule = reamortize_schedule(schedule, principal_amount, annual_interest_rate, rate_changes, month)
+            expected = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months,
+                                                  'decimal', rate_changes)
+            assert _as_strings(schedule) == _as_strings(expected)
+            assert schedule.negative_zero_interest == expected.negative_zero_interest
+
+
+def test_reamortize_schedule_invalid():
+    schedule = calc_amortization_schedule(Decimal('1000.00'), Decimal('0.05'), 12)
+    with pytest.raises(ValueError):
+        reamortize_schedule(schedule, Decimal('1000.00'), Decimal('0.05'), {3: Decimal('0.06')}, 4)
+    with pytest.raises(ValueError):
+        reamortize_schedule(schedule[1:], Decimal('1000.00'), Decimal('0.05'), {3: Decimal('0.06')}, 3)
+
+
+def test_simulate_extra_payments_adjustable_rate_matches_reference():
+    rng = random.Random(20240605)
+    for principal_amount, annual_interest_rate, number_of_months in _random_loans(200, max_term=480):
+        rate_changes = _random_rate_changes(rng, number_of_months)
+        extra_payments = {rng.randint(1, number_of_months): Decimal(rng.randint(1, int(principal_amount * 100))) / 100
+                          for _ in range(rng.choice([1, 3]))}
+        schedule = calc_amortization_schedule(principal_amount, annual_interest_rate, number_of_months,
+                                              rate_changes=rate_changes)
+        simulation = simulate_extra_payments(schedule, principal_amount, annual_interest_rate, extra_payments,
+                                             rate_changes)
+        rows, made = _reference_extra_payments(principal_amount, annual_interest_rate, number_of_months,
+                                               extra_payments, rate_changes)
+        assert _as_strings(simulation['schedule']) == _as_strings(rows)
+        assert simulation['extra_payments'] == made
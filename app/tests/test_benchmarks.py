@@ -0,0 +1,19 @@
+import json
+
+from app.benchmarks.__main__ import compare, main
+
+
+def test_compare_flags_regressions_over_threshold():
+    baseline = {"a": 1.0, "b": 1.0, "c": 1.0}
+    results = {"a": 1.05, "b": 1.5, "c": 0.5, "new": 1.0}
+    assert compare(results, baseline, threshold=0.1) == ["b"]
+
+
+def test_save_and_compare(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.benchmarks.__main__.run", lambda groups: {"a": 1.0})
+    path = tmp_path / "baseline.json"
+    assert main(["--only", "calculator", "--save", str(path)]) == 0
+    assert json.loads(path.read_text())["results"] == {"a": 1.0}
+    assert main(["--only", "calculator", "--compare", str(path)]) == 0
+    monkeypatch.setattr("app.benchmarks.__main__.run", lambda groups: {"a": 2.0})
+    assert main(["--only", "calculator", "--compare", str(path)]) == 1
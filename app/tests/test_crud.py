@@ -1,8 +1,13 @@
+from decimal import Decimal
+
 from sqlmodel import Session, select
 from fastapi.encoders import jsonable_encoder
 
 from app import crud
-from app.models import User, UserCreate, Loan, LoanCreate, LoanShare
+from app.amortization_calculator import calc_amortization_schedule
+from app.core.config import settings
+from app.core.token_cache import token_cache
+from app.models import User, UserCreate, UserUpdate, Loan, LoanCreate, LoanShare, LoanRateChangeIn
 from app.tests.utils.utils import random_email, random_lower_string
 
 
@@ -105,3 +110,61 @@ def test_create_loan_share_is_idempotent(db):
     statement = select(LoanShare).where(LoanShare.loan_id == loan.id, LoanShare.user_id == user_2.id)
     results = db.exec(statement)
     assert len(results.all()) == 1
+
+
+def test_create_loan_materializes_schedule(db, monkeypatch):
+    monkeypatch.setattr(settings, "MATERIALIZE_SCHEDULES", True)
+    loan_in = LoanCreate(amount='30000.00', annual_interest_rate='0.03', loan_term=48)
+    loan = crud.create_loan(session=db, loan_in=loan_in, owner_id=400)
+    rows = crud.get_loan_schedule(session=db, loan_id=loan.id)
+    expected = calc_amortization_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term)
+    assert rows == expected
+    row = crud.get_loan_schedule_row(session=db, loan_id=loan.id, month=12)
+    assert row.aggregate_interest_paid == sum(r['monthly_accrued_interest'] for r in expected[:12])
+
+
+def test_set_loan_rate_change_recalculates_materialized_tail(db, monkeypatch):
+    monkeypatch.setattr(settings, "MATERIALIZE_SCHEDULES", True)
+    loan_in = LoanCreate(amount='30000.00', annual_interest_rate='0.03', loan_term=48)
+    loan = crud.create_loan(session=db, loan_in=loan_in, owner_id=400)
+    for month, rate in [(25, '0.05'), (13, '0.04')]:
+        rate_changes = crud.set_loan_rate_change(session=db, loan=loan,
+                                                 rate_change_in=LoanRateChangeIn(month=month, annual_interest_rate=rate))
+    assert rate_changes == {13: Decimal('0.04'), 25: Decimal('0.05')}
+    assert crud.get_loan_rate_changes(session=db, loan_id=loan.id) == rate_changes
+    expected = calc_amortization_schedule(loan.amount, loan.annual_interest_rate, loan.loan_term,
+                                          rate_changes=rate_changes)
+    assert crud.get_loan_schedule(session=db, loan_id=loan.id) == expected
+    row = crud.get_loan_schedule_row(session=db, loan_id=loan.id, month=48)
+    assert row.aggregate_interest_paid == sum(r['monthly_accrued_interest'] for r in expected)
+
+
+def test_create_loan_does_not_materialize_schedule_by_default(db):
+    loan_in = LoanCreate(amount='30000.00', annual_interest_rate='0.03', loan_term=48)
+    loan = crud.create_loan(session=db, loan_in=loan_in, owner_id=400)
+    assert crud.get_loan_schedule(session=db, loan_id=loan.id) is None
+
+
+def test_backfill_loan_schedules(db):
+    loan_in = LoanCreate(amount='1000.00', annual_interest_rate='0.05', loan_term=12)
+    loans = [crud.create_loan(session=db, loan_in=loan_in, owner_id=400) for _ in range(5)]
+    assert crud.backfill_loan_schedules(session=db, chunk_size=2) >= 5
+    for loan in loans:
+        assert len(crud.get_loan_schedule(session=db, loan_id=loan.id)) == 12
+    assert crud.backfill_loan_schedules(session=db, chunk_size=2) == 0
+
+
+def test_update_user_invalidates_cached_tokens(db):
+    user = crud.create_user(session=db, user_create=UserCreate(email=random_email(), password=random_lower_string()))
+    token_cache.put("some-token", user)
+    crud.update_user(session=db, db_user=user, user_in=UserUpdate(full_name="Name"))
+    assert token_cache.get("some-token") is not None
+    crud.update_user(session=db, db_user=user, user_in=UserUpdate(is_active=False))
+    assert token_cache.get("some-token") is None
+
+
+def test_create_loans(db):
+    loans_in = [LoanCreate(amount='1000.00', annual_interest_rate='0.05', loan_term=n) for n in (12, 24)]
+    ids = crud.create_loans(session=db, loans_in=loans_in, owner_id=400)
+    assert [db.get(Loan, id).loan_term for id in ids] == [12, 24]
+    assert crud.create_loans(session=db, loans_in=[], owner_id=400) == []
@@ -0,0 +1,142 @@
+import csv
+import json
+import os
+from decimal import Decimal
+
+import pytest
+
+from app.amortization_calculator import calc_amortization_schedule, calc_monthly_summary
+from app.score_loans import main, score_loans
+
+
+LOANS = [
+    {"id": "a", "amount": "200000.00", "annual_interest_rate": "0.0657", "loan_term": "360"},
+    {"id": "b", "amount": "1000.00", "annual_interest_rate": "0", "loan_term": "3"},
+    {"id": "", "amount": "30000.00", "annual_interest_rate": "0.03", "loan_term": "48"},
+    {"id": "d", "amount": "-1", "annual_interest_rate": "0.03", "loan_term": "48"},
+    {"id": "e", "amount": "5000.00", "annual_interest_rate": "0.045", "loan_term": "12"},
+]
+
+
+@pytest.fixture
+def loans_csv(tmp_path):
+    path = tmp_path / "loans.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=LOANS[0])
+        writer.writeheader()
+        writer.writerows(LOANS)
+    return str(path)
+
+
+def read_ndjson(output_dir, errors=False):
+    names = sorted(name for name in os.listdir(output_dir)
+                   if name.endswith(".ndjson") and name.endswith(".errors.ndjson") == errors)
+    return [json.loads(line) for name in names for line in open(os.path.join(output_dir, name))]
+
+
+def test_score_loans_summaries(loans_csv, tmp_path):
+    output_dir = str(tmp_path / "out")
+    stats = score_loans(loans_csv, output_dir, "csv", summary_month=24, chunk_size=2)
+    assert (stats["loans"], stats["invalid"], stats["skipped"]) == (5, 1, 0)
+    results = read_ndjson(output_dir)
+    assert [r["index"] for r in results] == [0, 1, 2, 4]
+    assert [r.get("id") for r in results] == ["a", "b", None, "e"]
+    for result in results:
+        loan = LOANS[result["index"]]
+        term = int(loan["loan_term"])
+        expected = calc_monthly_summary(Decimal(loan["amount"]), Decimal(loan["annual_interest_rate"]), term,
+                                        min(24, term))
+        assert {key: Decimal(value) for key, value in result.items() if key not in ("index", "id")} == expected
+    errors = read_ndjson(output_dir, errors=True)
+    assert [e["index"] for e in errors] == [3]
+    assert errors[0]["errors"][0]["loc"] == ["amount"]
+
+
+def test_score_loans_schedules_with_rate_changes(tmp_path):
+    path = tmp_path / "loans.ndjson"
+    loans = [
+        {"amount": "200000.00", "annual_interest_rate": "0.05", "loan_term": 360, "rate_changes": {"61": "0.07"}},
+        {"amount": "1000.00", "annual_interest_rate": "0.05", "loan_term": 12},
+    ]
+    path.write_text("".join(json.dumps(loan) + "\n" for loan in loans) + "\n[]\n")
+    output_dir = str(tmp_path / "out")
+    assert score_loans(str(path), output_dir, "ndjson")["invalid"] == 1
+    results = read_ndjson(output_dir)
+    for result, loan in zip(results, loans):
+        rate_changes = {int(month): Decimal(rate) for month, rate in loan.get("rate_changes", {}).items()}
+        schedule = calc_amortization_schedule(Decimal(loan["amount"]), Decimal(loan["annual_interest_rate"]),
+                                              loan["loan_term"], rate_changes=rate_changes)
+        assert result["schedule"] == [{key: str(value) if key != "month" else value for key, value in row.items()}
+                                      for row in schedule]
+
+
+def test_score_loans_requires_loan_fields(tmp_path):
+    path = tmp_path / "loans.csv"
+    path.write_text("id,amount,loan_term\na,1000.00,12\n")
+    output_dir = str(tmp_path / "csv")
+    assert score_loans(str(path), output_dir, "csv", summary_month=12)["invalid"] == 1
+    assert read_ndjson(output_dir, errors=True) == [{"index": 0, "errors": [{"msg": "Missing annual_interest_rate"}]}]
+
+    path = tmp_path / "loans.ndjson"
+    path.write_text('{}\n{"id": 0, "amount": "1000.00", "annual_interest_rate": "0", "loan_term": 4}\n')
+    output_dir = str(tmp_path / "ndjson")
+    assert score_loans(str(path), output_dir, "ndjson", summary_month=12)["invalid"] == 1
+    assert read_ndjson(output_dir, errors=True)[0]["errors"] == \
+        [{"msg": "Missing amount, annual_interest_rate, loan_term"}]
+    assert [(r["index"], r["id"]) for r in read_ndjson(output_dir)] == [(1, 0)]
+
+
+@pytest.mark.parametrize("summary_month", [12, None])
+def test_score_loans_reports_calculation_errors(tmp_path, summary_month):
+    path = tmp_path / "loans.ndjson"
+    # valid loans whose rates overflow the calculation
+    loans = [
+        {"amount": "1000.00", "annual_interest_rate": "0.05", "loan_term": 12},
+        {"amount": "200000.00", "annual_interest_rate": "1e100", "loan_term": 1200},
+        {"amount": "200000.00", "annual_interest_rate": "0.05", "loan_term": 1200, "rate_changes": {"2": "1e100"}},
+        {"amount": "2000.00", "annual_interest_rate": "0", "loan_term": 24},
+    ]
+    path.write_text("".join(json.dumps(loan) + "\n" for loan in loans))
+    output_dir = str(tmp_path / "out")
+    stats = score_loans(str(path), output_dir, "ndjson", summary_month=summary_month)
+    assert (stats["loans"], stats["invalid"]) == (4, 2)
+    assert [r["index"] for r in read_ndjson(output_dir)] == [0, 3]
+    errors = read_ndjson(output_dir, errors=True)
+    assert [e["index"] for e in errors] == [1, 2]
+    assert errors[0]["errors"][0]["msg"].startswith("calculation failed")
+
+
+def test_score_loans_csv_output(loans_csv, tmp_path):
+    output_dir = str(tmp_path / "out")
+    score_loans(loans_csv, output_dir, "csv", "csv", chunk_size=10)
+    with open(os.path.join(output_dir, "chunk-000000.csv"), newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 360 + 3 + 48 + 12
+    assert rows[360] == {"index": "1", "id": "b", "month": "1", "monthly_payment": "333.33",
+                         "monthly_accrued_interest": "0.00", "remaining_balance": "666.67"}
+
+
+def test_score_loans_resumes(loans_csv, tmp_path):
+    output_dir = str(tmp_path / "out")
+    score_loans(loans_csv, output_dir, "csv", summary_month=12, chunk_size=2)
+    results = read_ndjson(output_dir)
+    os.remove(os.path.join(output_dir, "chunk-000001.ndjson"))
+    stats = score_loans(loans_csv, output_dir, "csv", summary_month=12, chunk_size=2)
+    assert (stats["loans"], stats["skipped"]) == (2, 3)
+    assert read_ndjson(output_dir) == results
+    with pytest.raises(ValueError):
+        score_loans(loans_csv, output_dir, "csv", summary_month=13, chunk_size=2)
+
+
+def test_score_loans_process_pool(loans_csv, tmp_path):
+    score_loans(loans_csv, str(tmp_path / "serial"), "csv", summary_month=12, chunk_size=1)
+    stats = score_loans(loans_csv, str(tmp_path / "pool"), "csv", summary_month=12, workers=2, chunk_size=1)
+    assert stats["loans"] == 5
+    assert read_ndjson(str(tmp_path / "pool")) == read_ndjson(str(tmp_path / "serial"))
+
+
+def test_main(loans_csv, tmp_path, capsys):
+    assert main([loans_csv, str(tmp_path / "out"), "--summary-month", "1", "--workers", "1"]) == 0
+    assert "scored 5 loans (1 invalid)" in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        main([loans_csv, str(tmp_path / "out"), "--summary-month", "2", "--workers", "1"])
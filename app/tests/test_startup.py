@@ -0,0 +1,23 @@
+from app.benchmarks.startup import LAZY_MODULES, cold_start, import_module
+
+
+def test_calculator_import_is_light():
+    result = import_module("app.amortization_calculator")
+    assert result["modules"] == []
+
+
+def test_app_import_has_no_side_effects(tmp_path):
+    database = tmp_path / "loans.db"
+    result = import_module("app.main", heavy=LAZY_MODULES, database_url=f"sqlite:///{database}")
+    assert result["modules"] == []
+    assert not database.exists()
+
+
+def test_cold_start_skips_existing_schema_and_superuser(tmp_path):
+    database_url = f"sqlite:///{tmp_path}/loans.db"
+    first = cold_start(database_url)
+    assert "passlib" in first["modules"]
+    second = cold_start(database_url)
+    # nothing is hashed when the superuser already exists
+    assert second["modules"] == []
+    assert second["cold_start"] < 10
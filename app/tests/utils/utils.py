@@ -1,5 +1,9 @@
 import random
 import string
+from collections.abc import Generator
+from contextlib import contextmanager
+
+from sqlalchemy import Engine, event
 
 
 def random_lower_string() -> str:
@@ -8,3 +12,20 @@ def random_lower_string() -> str:
 
 def random_email() -> str:
     return f"{random_lower_string()}@{random_lower_string()}.com"
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Generator[list[str], None, None]:
+    """
+    Collect the SQL statements executed on the given engine within the block.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)